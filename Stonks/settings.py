@@ -40,10 +40,11 @@ INSTALLED_APPS = [
     # Third party apps
     'crispy_forms',
     # My apps
-    'analyzer',
+    'analyzer.apps.AnalyzerConfig',
 ]
 
 MIDDLEWARE = [
+    'analyzer.timing.server_timing_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,9 +82,75 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Tests store stock histories from many threads at once (see 'analyzer.batch'),
+        # which a shared in-memory database fails at, instead of waiting for its turn
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+# Primary keys of the models, as in the existing migrations
+DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
+
+
+# Cache https://docs.djangoproject.com/en/3.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Least recently used entries are culled when MAX_ENTRIES is reached
+    'analysis': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'analysis',
+        'OPTIONS': {
+            'MAX_ENTRIES': 256,
+        },
+    },
+}
+
+# Cache alias and timeouts (in seconds) for analysis results.
+# Analyses of date ranges in the past never change, ranges including today can.
+ANALYSIS_CACHE = 'analysis'
+ANALYSIS_CACHE_TIMEOUT_HISTORICAL = 60 * 60 * 24
+ANALYSIS_CACHE_TIMEOUT_CURRENT = 60
+
+# How long (in seconds) browsers and other HTTP caches can keep search results. Results of date ranges
+# ending before today in New York, where trading days end hours after here, are revalidated with their
+# ETag and Last-Modified headers after that. See 'cache.is_historical'.
+SEARCH_MAX_AGE_HISTORICAL = 60 * 60 * 24 * 7
+SEARCH_MAX_AGE_CURRENT = 60
+
+# Batch analysis of many stocks: most stocks per batch, concurrent fetches
+# and analysis processes (None = number of processors)
+BATCH_MAX_STOCKS = 500
+BATCH_FETCH_WORKERS = 8
+BATCH_ANALYSIS_WORKERS = None
+
+# Bulk import of stock history CSV files: most files per zip archive, and their total size in bytes
+BULK_IMPORT_MAX_FILES = 1000
+BULK_IMPORT_MAX_SIZE = 500 * 2 ** 20
+
+# Concurrent identical Nasdaq API calls are made only once per process. To also coalesce them
+# between processes, set to a cache alias shared by the processes (not a local memory cache).
+# Waiting for another process is given up after the timeout (in seconds).
+FETCH_COALESCE_CACHE = None
+FETCH_COALESCE_TIMEOUT = 60
+
+# Number of stocks whose stock history is kept in memory for searches within it (0 = none).
+# The widest range searched is kept for each stock, see 'analyzer.rangecache'.
+HISTORY_CACHE_SYMBOLS = 32
+
+# Keep stock histories in the compact representation while analyzing them (int32 dates and prices,
+# downcast volumes), which halves their memory use. See 'utils.compact_stock_data'.
+COMPACT_STOCK_DATA = True
+
+# Number of rows rendered with the page for each analysis table, the rest are loaded on demand
+ANALYSIS_TABLE_PAGE_SIZE = 10
+
+# Time the stages of requests (Nasdaq API call, parsing, analyses, ...) for the Server-Timing
+# header and the percentiles at /metrics/ (for staff only). When off, stages are not timed at all.
+STAGE_TIMING = True
+
 
 # Password validation https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -136,3 +203,17 @@ def nasdaq_historical(stock_symbol, start_date, end_date):
 
 
 NASDAQ_HISTORICAL_API_URL = nasdaq_historical
+
+# Seconds to wait for connecting to the Nasdaq API, and between bytes of its response
+NASDAQ_CONNECT_TIMEOUT = 5
+NASDAQ_READ_TIMEOUT = 30
+
+# Connections kept open to the Nasdaq API, and retries of failed calls with exponential backoff
+# (0, 2 * backoff, 4 * backoff, ... seconds between retries)
+NASDAQ_POOL_SIZE = 10
+NASDAQ_RETRIES = 2
+NASDAQ_RETRY_BACKOFF = 0.5
+
+# Stop calling the Nasdaq API after this many consecutive failed calls, until the reset timeout (in seconds)
+NASDAQ_CIRCUIT_FAILURES = 5
+NASDAQ_CIRCUIT_RESET_TIMEOUT = 30
@@ -0,0 +1,189 @@
+"""Registry of analyses run on stock data, see 'run'.
+
+Analyses declare the intermediates they need by name, e.g. closing prices,
+formatted dates or price changes. Each intermediate is computed at most once
+per run and shared by all analyses, so they don't each copy the stock data
+or format the dates again. Intermediates are read-only for the same reason.
+
+Register new analyses and intermediates with the 'analysis' and 'intermediate'
+decorators. The options given to 'run' (e.g. 'dateformat') and the stock data
+itself ('data') can also be required by name, as can the intermediates themselves
+('intermediates'), for analyses that only need some of them in some cases.
+"""
+
+from typing import Any, Callable, Dict, Iterable, NamedTuple, Tuple
+from django.utils.translation import gettext as _
+
+from . import timing
+from . import utils
+from .lazy import LazyModule
+
+# Imported on first use, see 'analyzer.lazy'
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+
+
+__all__ = [
+    "ANALYSES",
+    "INTERMEDIATES",
+    "Intermediates",
+    "analysis",
+    "intermediate",
+    "run",
+]
+
+
+class Computation(NamedTuple):
+    function: Callable[..., Any]
+    requires: Tuple[str, ...]
+
+
+ANALYSES: Dict[str, Computation] = {}
+INTERMEDIATES: Dict[str, Computation] = {}
+
+
+def analysis(name: str, requires: Iterable[str]):
+    """Register the decorated function as an analysis. It is called with the required values as arguments."""
+
+    def decorator(function):
+        ANALYSES[name] = Computation(function, tuple(requires))
+        return function
+
+    return decorator
+
+
+def intermediate(name: str, requires: Iterable[str]):
+    """Register the decorated function as an intermediate. It is called with the required values as arguments."""
+
+    def decorator(function):
+        INTERMEDIATES[name] = Computation(function, tuple(requires))
+        return function
+
+    return decorator
+
+
+class Intermediates:
+    """Stock data, options and the intermediates computed from them, by name.
+    Intermediates are computed when first needed.
+    """
+
+    def __init__(self, data: "pd.DataFrame", **options):
+        self._values: Dict[str, Any] = {"data": data, "intermediates": self, **options}
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self._values:
+            try:
+                computation = INTERMEDIATES[name]
+            except KeyError:
+                raise KeyError(f"Unknown intermediate '{name}'") from None
+
+            self._values[name] = computation.function(*(self[required] for required in computation.requires))
+
+        return self._values[name]
+
+
+def run(data: "pd.DataFrame", names: Iterable[str] = None, **options) -> Dict[str, Any]:
+    """Run the named analyses (default: all) on formatted stock data (see 'utils.format_stock_data').
+    Options are the values analyses can require besides intermediates: 'dateformat' (default: dates as is),
+    'moving_average' (default: 'utils.DEFAULT_MOVING_AVERAGE') and 'limit' for the most rows of ranking tables
+    (default: all rows).
+    """
+
+    if names is None:
+        names = ANALYSES
+
+    defaults = {"dateformat": None, "moving_average": utils.DEFAULT_MOVING_AVERAGE, "limit": None}
+    intermediates = Intermediates(data, **{**defaults, **options})
+
+    results = {}
+    for name in names:
+        computation = ANALYSES[name]
+
+        # Includes the intermediates computed first for this analysis
+        with timing.stage(name):
+            results[name] = computation.function(*(intermediates[required] for required in computation.requires))
+
+    return results
+
+
+def _read_only(values: "np.ndarray") -> "np.ndarray":
+    # A view, so that writes through it fail instead of changing the data shared by all analyses
+    view = values.view()
+    view.flags.writeable = False
+    return view
+
+
+@intermediate("dates", requires=["data"])
+def dates(data: "pd.DataFrame") -> "np.ndarray":
+    return _read_only(utils.stock_dates(data))
+
+
+@intermediate("close", requires=["data"])
+def close(data: "pd.DataFrame") -> "np.ndarray":
+    return _read_only(data["Close/Last"].to_numpy())
+
+
+@intermediate("open", requires=["data"])
+def opening(data: "pd.DataFrame") -> "np.ndarray":
+    return _read_only(data["Open"].to_numpy())
+
+
+@intermediate("high", requires=["data"])
+def high(data: "pd.DataFrame") -> "np.ndarray":
+    return _read_only(data["High"].to_numpy())
+
+
+@intermediate("low", requires=["data"])
+def low(data: "pd.DataFrame") -> "np.ndarray":
+    return _read_only(data["Low"].to_numpy())
+
+
+@intermediate("volume", requires=["data"])
+def volume(data: "pd.DataFrame") -> "np.ndarray":
+    return _read_only(data["Volume"].to_numpy())
+
+
+@intermediate("formatted_dates", requires=["dates", "dateformat"])
+def formatted_dates(dates: "np.ndarray", dateformat: str) -> "np.ndarray":
+    """Dates formatted with the 'dateformat' option, as is if it is None."""
+    return _read_only(utils.format_dates(dates, dateformat))
+
+
+@intermediate("price_range", requires=["high", "low"])
+def price_range(high: "np.ndarray", low: "np.ndarray") -> "np.ndarray":
+    """Difference between the highest and lowest price of each day in ticks."""
+    return _read_only(utils.price_range(high, low))
+
+
+@intermediate("opening_price_change", requires=["close", "open", "moving_average"])
+def opening_price_change(close: "np.ndarray", opening: "np.ndarray", moving_average: str) -> "np.ndarray":
+    """Change (%) from the 'moving_average' option of closing prices to the opening price."""
+    return _read_only(utils.opening_price_change(close, opening, moving_average))
+
+
+@analysis("longest_bullish", requires=["close"])
+def longest_bullish(close: "np.ndarray") -> int:
+    """Days in the longest bullish (upward) trend, see 'utils.longest_bullish_streak'."""
+    return int(utils.bullish_streaks([close]).streak[0])
+
+
+@analysis("history_by_volume", requires=["intermediates", "volume", "price_range", "limit"])
+def history_by_volume(intermediates: "Intermediates", volume: "np.ndarray", price_range: "np.ndarray",
+                      limit: int = None) -> "pd.DataFrame":
+    """See 'utils.history_by_volume_and_price_delta'. Only the top 'limit' rows are sorted and
+    have their dates formatted if given, otherwise the shared formatted dates are used.
+    """
+
+    if limit is None:
+        return utils.history_by_volume_table(intermediates["formatted_dates"], volume, price_range)
+
+    table = utils.history_by_volume_table(intermediates["dates"], volume, price_range, limit)
+    table[_("Date")] = utils.format_dates(table[_("Date")].to_numpy(), intermediates["dateformat"])
+
+    return table
+
+
+@analysis("best_opening_price", requires=["formatted_dates", "opening_price_change"])
+def best_opening_price(formatted_dates: "np.ndarray", opening_price_change: "np.ndarray") -> "pd.DataFrame":
+    """See 'utils.best_opening_price_compared_to_moving_average'."""
+    return utils.best_opening_price_table(formatted_dates, opening_price_change)
@@ -5,3 +5,9 @@ from django.apps import AppConfig
 
 class AnalyzerConfig(AppConfig):
     name = 'analyzer'
+
+    def ready(self):
+        from .symbols import stock_symbols
+
+        # Load once at process start instead of on the first autocomplete request
+        stock_symbols.load()
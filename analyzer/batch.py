@@ -0,0 +1,137 @@
+"""Analyze many stocks at once.
+
+Stock histories are fetched concurrently in a bounded thread pool, and
+analyzed in a pool of processes, since the analyses are CPU-bound.
+Errors are reported per stock instead of aborting the whole batch.
+"""
+
+import datetime
+import multiprocessing
+import threading
+import django
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+from django import db
+from django.conf import settings
+from django.utils import translation
+
+from . import store
+from . import utils
+from .lazy import LazyModule
+
+# Imported on first use, see 'analyzer.lazy'
+pd = LazyModule("pandas")
+
+
+_analysis_pool: Optional["ProcessPoolExecutor"] = None
+_analysis_pool_lock = threading.Lock()
+
+
+def analyze_stocks(stock_symbols: List[str], start_date: "datetime.date", end_date: datetime.date = None,
+                   dateformat: str = "%d.%m.%Y", moving_average: str = utils.DEFAULT_MOVING_AVERAGE,
+                   language: str = None, limit: int = None) -> Dict[str, dict]:
+    """Analyze the stock history of each stock over the same date range (see 'IndexView.analyze_stock_data').
+    Stocks that could not be fetched or analyzed get a dict with an 'error' message instead.
+    Analysis column names are in the given language, or in the active language if not given.
+    """
+
+    if language is None:
+        language = translation.get_language()
+
+    results = {}
+
+    with ThreadPoolExecutor(max_workers=settings.BATCH_FETCH_WORKERS) as fetch_pool:
+        fetches = {
+            fetch_pool.submit(_fetch, stock_symbol, start_date, end_date): stock_symbol
+            for stock_symbol in stock_symbols
+        }
+
+        # Analyze each history as soon as it has been fetched
+        analyses = {}
+        for future in as_completed(fetches):
+            stock_symbol = fetches[future]
+
+            try:
+                data = future.result()
+            # Like in analyzing, one stock that fails to load should not fail the whole batch
+            except Exception as error:  # noqa
+                results[stock_symbol] = {"error": str(error)}
+                continue
+
+            future = submit_analysis(data, language, dateformat, moving_average, limit)
+            analyses[future] = stock_symbol
+
+    for future in as_completed(analyses):
+        stock_symbol = analyses[future]
+
+        try:
+            results[stock_symbol] = future.result()
+        except BrokenProcessPool as error:
+            _reset_analysis_pool()
+            results[stock_symbol] = {"error": str(error)}
+        # One stock with unexpected data should not fail the whole batch
+        except Exception as error:  # noqa
+            results[stock_symbol] = {"error": str(error)}
+
+    # In the order of the given stocks
+    return {stock_symbol: results[stock_symbol] for stock_symbol in stock_symbols}
+
+
+def analysis_pool() -> "ProcessPoolExecutor":
+    """Process pool for analyses, started on first use and shared by all batches."""
+
+    global _analysis_pool
+
+    with _analysis_pool_lock:
+        if _analysis_pool is None:
+            _analysis_pool = new_process_pool(settings.BATCH_ANALYSIS_WORKERS)
+
+        return _analysis_pool
+
+
+def new_process_pool(max_workers: Optional[int]) -> "ProcessPoolExecutor":
+    """Process pool with Django set up in the workers (None = number of processors)."""
+
+    # Forking a threaded server process is unsafe, so start fresh interpreters instead
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=django.setup,
+    )
+
+
+def _reset_analysis_pool() -> None:
+    global _analysis_pool
+
+    with _analysis_pool_lock:
+        if _analysis_pool is not None:
+            _analysis_pool.shutdown(wait=False)
+            _analysis_pool = None
+
+
+def submit_analysis(data: "pd.DataFrame", language: str, dateformat: str, moving_average: str, limit: int = None):
+    """Analyze stock data in the analysis process pool. Returns a future for the analysis."""
+
+    try:
+        return analysis_pool().submit(_analyze, data, language, dateformat, moving_average, limit)
+    except BrokenProcessPool:
+        _reset_analysis_pool()
+        return analysis_pool().submit(_analyze, data, language, dateformat, moving_average, limit)
+
+
+def _fetch(stock_symbol: str, start_date: "datetime.date", end_date: Optional["datetime.date"]) -> "pd.DataFrame":
+    try:
+        return store.stock_history(stock_symbol, start_date, end_date, compact=settings.COMPACT_STOCK_DATA)
+    finally:
+        # Each thread has its own database connection
+        db.connection.close()
+
+
+def _analyze(data: "pd.DataFrame", language: str, dateformat: str, moving_average: str, limit: int = None) -> dict:
+    # Runs in an analysis process
+    from .views import IndexView
+
+    with translation.override(language):
+        return IndexView.analyze_stock_data(data, dateformat=dateformat, moving_average=moving_average, limit=limit)
@@ -0,0 +1 @@
+"""Benchmarks for the stock data pipeline. Run with 'python manage.py benchmark'."""
@@ -0,0 +1,47 @@
+"""Synthetic stock histories for benchmarking."""
+
+import datetime
+import numpy as np
+import pandas as pd
+
+from analyzer import prices
+
+
+HEADER = "Date, Close/Last, Volume, Open, High, Low"
+
+# Dates wrap around after this many days, since pandas timestamps only reach to year 2262
+MAX_DAYS = 60_000
+
+
+def synthetic_history(rows: int, seed: int = 0) -> "pd.DataFrame":
+    """Random walk stock history with the columns of a Nasdaq CSV, newest date first, as strings."""
+
+    rng = np.random.default_rng(seed)
+
+    days = np.arange(rows)[::-1] % MAX_DAYS
+    dates = pd.Timestamp(datetime.date(2021, 1, 20)) - pd.to_timedelta(days, unit="D")
+
+    close = np.maximum(np.cumsum(rng.normal(0, 0.5, rows)) + 100, 1)
+    opening = close * rng.uniform(0.97, 1.03, rows)
+    high = np.maximum(close, opening) * rng.uniform(1, 1.02, rows)
+    low = np.minimum(close, opening) * rng.uniform(0.98, 1, rows)
+
+    def dollars(values):
+        return "$" + pd.Series(np.round(values, prices.PRICE_DECIMALS)).astype(str)
+
+    return pd.DataFrame({
+        "Date": dates.strftime("%m/%d/%Y"),
+        "Close/Last": dollars(close),
+        "Volume": rng.integers(10_000_000, 500_000_000, rows).astype(str),
+        "Open": dollars(opening),
+        "High": dollars(high),
+        "Low": dollars(low),
+    })[::-1].reset_index(drop=True)
+
+
+def synthetic_history_csv(rows: int, seed: int = 0) -> str:
+    """Random walk stock history in the format of HistoricalQuotes.csv."""
+
+    data = synthetic_history(rows, seed)
+    lines = data["Date"].str.cat([data[column] for column in data.columns[1:]], sep=", ")
+    return HEADER + "\n" + "\n".join(lines) + "\n"
@@ -0,0 +1,93 @@
+"""Memory use of each stage of the stock data pipeline, from parsing to rendering the index view.
+
+Each stage is run under 'tracemalloc', which reports the peak of the memory allocated
+during the stage (including temporaries freed before it ended), and the size of what
+the stage produced and later stages keep in memory, e.g. the formatted stock data.
+"""
+
+import functools
+import io
+import tracemalloc
+
+from typing import Any, List, NamedTuple
+from django.test import RequestFactory
+
+from analyzer import analyses
+from analyzer import utils
+from analyzer.views import IndexView
+from .data import synthetic_history_csv
+
+
+class StageMemory(NamedTuple):
+    stage: str
+    peak_bytes: int
+    """Most memory allocated at once during the stage."""
+    retained_bytes: int
+    """Size of the result of the stage."""
+
+
+def memory_profile(rows: int, compact: bool = True, moving_average: str = utils.DEFAULT_MOVING_AVERAGE,
+                   dateformat: str = "%d.%m.%Y") -> List[StageMemory]:
+    """Memory use of the pipeline stages for a synthetic history of the given size, in the order they are run.
+    With 'compact', the stock data is analyzed in its compact representation (see 'utils.compact_stock_data').
+    """
+
+    body = synthetic_history_csv(rows)
+    stages = []
+
+    def measure(stage, func):
+        result, peak = _traced(func)
+        stages.append(StageMemory(stage, peak, _size(result)))
+        return result
+
+    tracemalloc.start()
+    try:
+        raw = measure("parse", lambda: utils.read_stock_csv(io.StringIO(body)))
+        data = measure("format", functools.partial(utils.format_stock_data, raw))
+        # Not kept after formatting, so later stages are measured without it
+        del raw
+
+        if compact:
+            data = measure("compact", lambda: utils.compact_stock_data(data))
+
+        analysis = {}
+        for name in analyses.ANALYSES:
+            analysis.update(measure(name, lambda: analyses.run(
+                data, [name], dateformat=dateformat, moving_average=moving_average
+            )))
+        analysis["moving_average"] = moving_average
+
+        measure("render", lambda: _render_index_view(analysis))
+    finally:
+        tracemalloc.stop()
+
+    return stages
+
+
+def _traced(func):
+    tracemalloc.reset_peak()
+    before, _ = tracemalloc.get_traced_memory()
+
+    result = func()
+
+    _, peak = tracemalloc.get_traced_memory()
+    return result, peak - before
+
+
+def _size(value: Any) -> int:
+    if hasattr(value, "memory_usage"):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, dict):
+        return sum(_size(item) for item in value.values())
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    return 0
+
+
+def _render_index_view(analysis: dict) -> bytes:
+    view = IndexView()
+    view.setup(RequestFactory().get("/"))
+
+    # As if the analysis was cached, so that only the first page of each table is rendered
+    context = view.get_context_data(data=analysis, analysis_id="memory-report")
+    return view.render_to_response(context).content
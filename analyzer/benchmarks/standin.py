@@ -0,0 +1,67 @@
+"""Local stand-in for the Nasdaq historical API, for benchmarks and tests."""
+
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+__all__ = [
+    "NasdaqStandIn",
+]
+
+
+class _NasdaqRequestHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):  # noqa
+        self.server.requests.append(self.path)
+        time.sleep(self.server.delay)
+        body = self.server.body.encode()
+
+        if len(self.server.requests) <= self.server.failures:
+            self.send_response(503)
+        else:
+            self.send_response(self.server.status)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+        try:
+            self.wfile.write(body)
+        except ConnectionError:
+            pass  # the client timed out already
+
+    def log_message(self, format, *args):  # noqa
+        pass  # keep test and benchmark output clean
+
+
+class NasdaqStandIn:
+    """Serve a fixed CSV body from a background thread. Use as a context manager.
+    'url' can be used in place of 'settings.NASDAQ_HISTORICAL_API_URL'.
+    Responses are delayed by 'delay' seconds, e.g. for testing timeouts,
+    and the first 'failures' requests get a '503 Service Unavailable' response.
+    """
+
+    def __init__(self, body: str = "", status: int = 200, delay: float = 0, failures: int = 0):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _NasdaqRequestHandler)
+        self.server.body = body
+        self.server.status = status
+        self.server.delay = delay
+        self.server.failures = failures
+        self.server.requests = []
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def requests(self) -> list:
+        return self.server.requests
+
+    def url(self, stock_symbol, start_date, end_date):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/api/v1/historical/{stock_symbol}/stocks/{start_date}/{end_date}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.server.shutdown()
+        self.server.server_close()
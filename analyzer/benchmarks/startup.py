@@ -0,0 +1,75 @@
+"""Import time breakdown of starting the app, as a worker process would.
+
+The app is started in a fresh interpreter with 'python -X importtime', so that
+modules already imported by the current process don't hide their cost.
+"""
+
+import os
+import re
+import subprocess
+import sys
+
+from typing import List, NamedTuple, Tuple
+from django.conf import settings
+
+
+# Dependencies that should only be imported when they are used, see 'analyzer.lazy'
+HEAVY_MODULES = ["numpy", "pandas", "requests", "httpx"]
+
+# Loads what a worker needs for its first request: apps, URLs (and so views) and template tags
+STARTUP_SCRIPT = """
+import importlib, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+from django.conf import settings
+from django.template import engines
+importlib.import_module(settings.ROOT_URLCONF)
+for engine in engines.all():
+    engine.engine.template_libraries
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+print(time.perf_counter() - start)
+"""
+
+# e.g. "import time:       466 |      36260 |       numpy.__config__"
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+class ImportTime(NamedTuple):
+    module: str
+    self_seconds: float
+    cumulative_seconds: float
+    depth: int
+
+
+def startup_import_times(modules: List[str] = ()) -> Tuple[List[ImportTime], float]:
+    """Import times of the modules imported when starting the app and then importing the given modules,
+    in the order the imports finished. Also returns the total startup time in seconds.
+    """
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT, *modules],
+        cwd=settings.BASE_DIR,
+        env=os.environ.copy(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    return parse_import_times(result.stderr), float(result.stdout.strip().splitlines()[-1])
+
+
+def parse_import_times(output: str) -> List[ImportTime]:
+    """Parse the output of 'python -X importtime'. Other lines are ignored."""
+
+    times = []
+    for line in output.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match is None:
+            continue
+
+        self_us, cumulative_us, indent, module = match.groups()
+        times.append(ImportTime(module, int(self_us) / 1e6, int(cumulative_us) / 1e6, (len(indent) - 1) // 2))
+
+    return times
@@ -0,0 +1,128 @@
+"""Benchmark suite for the stock data pipeline, from parsing to rendering the index view.
+
+Each benchmark is timed on synthetic histories of the given sizes, and the best time
+of the repeats is compared to stored baselines to catch performance regressions.
+Timings depend on the machine: the stored baselines were recorded on one development
+machine and are only illustrative elsewhere, so save new baselines before comparing on another one.
+"""
+
+import datetime
+import io
+import json
+import time
+
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple
+from django.core.cache import caches
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, override_settings
+
+from analyzer import utils
+from analyzer.views import IndexView
+from .data import synthetic_history_csv
+from .standin import NasdaqStandIn
+
+
+BASELINES_FILE = Path(__file__).resolve().parent / "baselines.json"
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+# Relative slowdown from the baseline that counts as a regression
+DEFAULT_THRESHOLD = 0.25
+
+
+class Regression(NamedTuple):
+    benchmark: str
+    rows: int
+    seconds: float
+    baseline: float
+
+
+def run(sizes: Iterable[int] = DEFAULT_SIZES, repeat: int = 3,
+        report: Callable[[str, int, float], None] = None) -> Dict[str, Dict[str, float]]:
+    """Run all benchmarks on each size. Returns the best time in seconds by benchmark and size."""
+
+    results = {}
+
+    for rows in sizes:
+        for name, seconds in _run_size(rows, repeat):
+            results.setdefault(name, {})[str(rows)] = seconds
+            if report is not None:
+                report(name, rows, seconds)
+
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baselines: Dict[str, Dict[str, float]],
+            threshold: float = DEFAULT_THRESHOLD) -> List[Regression]:
+    """Benchmarks that were slower than their baseline by more than the threshold."""
+
+    return [
+        Regression(name, int(rows), seconds, baselines[name][rows])
+        for name, timings in results.items()
+        for rows, seconds in timings.items()
+        if rows in baselines.get(name, {}) and seconds > baselines[name][rows] * (1 + threshold)
+    ]
+
+
+def load_baselines(path: Path = BASELINES_FILE) -> Dict[str, Dict[str, float]]:
+    if not path.exists():
+        return {}
+
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_baselines(results: Dict[str, Dict[str, float]], path: Path = BASELINES_FILE) -> None:
+    """Save results as baselines, keeping existing baselines for benchmarks and sizes not in results."""
+
+    baselines = load_baselines(path)
+    for name, timings in results.items():
+        baselines.setdefault(name, {}).update(timings)
+
+    with open(path, "w") as f:
+        json.dump(baselines, f, indent=4, sort_keys=True)
+        f.write("\n")
+
+
+def _best_time(func: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _run_size(rows: int, repeat: int):
+    body = synthetic_history_csv(rows)
+    raw = utils.read_stock_csv(io.StringIO(body))
+    data = utils.format_stock_data(raw)
+
+    yield "stock_data_from_csv", _best_time(lambda: utils.stock_data_from_csv(io.StringIO(body)), repeat)
+    yield "format_stock_data", _best_time(lambda: utils.format_stock_data(raw), repeat)
+
+    with NasdaqStandIn(body=body) as server, override_settings(NASDAQ_HISTORICAL_API_URL=server.url):
+        yield "fetch_stock_history", _best_time(
+            lambda: utils.fetch_stock_history("BENCH", datetime.date(2000, 1, 1), datetime.date(2021, 1, 20)),
+            repeat,
+        )
+
+    yield "longest_bullish_streak", _best_time(lambda: utils.longest_bullish_streak(data), repeat)
+    yield "history_by_volume_and_price_delta", _best_time(
+        lambda: utils.history_by_volume_and_price_delta(data, "%d.%m.%Y"), repeat
+    )
+    yield "best_opening_price_compared_to_moving_average", _best_time(
+        lambda: utils.best_opening_price_compared_to_moving_average(data, "%d.%m.%Y"), repeat
+    )
+    yield "index_view", _best_time(lambda: _render_index_view(body), repeat)
+
+
+def _render_index_view(body: str) -> None:
+    # Analyze every time instead of using a cached result
+    caches[settings.ANALYSIS_CACHE].clear()
+
+    file = SimpleUploadedFile("HistoricalQuotes.csv", body.encode(), content_type="text/csv")
+    request = RequestFactory().post("/", {"file": file})
+    IndexView.as_view()(request).render()
@@ -0,0 +1,188 @@
+"""Import many stock history CSV files to the local store at once.
+
+Files are read and formatted in a pool of processes, one file per task, so that
+all cores are used. Each history is written to the store (see 'analyzer.store')
+by this process as soon as it has been formatted, since the database is written
+from a single thread. Errors are reported per file instead of aborting the import.
+
+Imported histories replace the stored daily bars of their dates, and bump the version
+of their stock history, so that histories and analyses cached before the import are
+not served anymore, see 'store.import_stock_history'. Browsers and other HTTP caches
+may still show search results for up to 'SEARCH_MAX_AGE_HISTORICAL' seconds.
+"""
+
+import io
+import time
+import zipfile
+
+from concurrent.futures import Executor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from django.conf import settings
+from django.utils import translation
+from django.utils.translation import gettext as _
+
+from . import batch
+from . import models
+from . import store
+from . import utils
+from .lazy import LazyModule
+
+# Imported on first use, see 'analyzer.lazy'
+pd = LazyModule("pandas")
+
+
+__all__ = [
+    "ImportResult",
+    "import_directory",
+    "import_files",
+    "import_zip",
+    "symbol_from_filename",
+]
+
+# Path of a file, or the contents of a file e.g. in a zip archive
+Source = Union[str, bytes]
+
+
+class ImportResult(NamedTuple):
+    name: str
+    symbol: str
+    rows: int = 0
+    parse_seconds: float = 0.0
+    """Time to read and format the file in a worker process."""
+    store_seconds: float = 0.0
+    """Time to write the history to the store."""
+    error: Optional[str] = None
+
+
+def symbol_from_filename(name: str) -> str:
+    """Stock symbol of a file named after it, e.g. 'aapl.csv' -> 'AAPL'."""
+    return Path(name).stem.strip().upper()
+
+
+def import_directory(directory: Union[str, "Path"], pattern: str = "*.csv", workers: int = None) -> List[ImportResult]:
+    """Import the CSV files matching the pattern in a directory, see 'import_files'."""
+
+    paths = sorted(path for path in Path(directory).glob(pattern) if path.is_file())
+    return import_files(((path.name, str(path)) for path in paths), workers)
+
+
+def import_zip(file, workers: int = None) -> List[ImportResult]:
+    """Import the CSV files in a zip archive (a path or a file object), see 'import_files'.
+    Raises ValueError if the file is not a zip archive, or has too many or too large files
+    (see the 'BULK_IMPORT_MAX_FILES' and 'BULK_IMPORT_MAX_SIZE' settings).
+    """
+
+    try:
+        archive = zipfile.ZipFile(file)
+    except zipfile.BadZipFile:
+        raise ValueError(_("File is not a zip archive."))
+
+    with archive:
+        members = [
+            member for member in archive.infolist()
+            if not member.is_dir() and member.filename.lower().endswith(".csv")
+            # Metadata of archives created on macOS
+            and not member.filename.startswith("__MACOSX/")
+        ]
+
+        if len(members) > settings.BULK_IMPORT_MAX_FILES:
+            raise ValueError(_("Give at most %(count)s files.") % {"count": settings.BULK_IMPORT_MAX_FILES})
+        if sum(member.file_size for member in members) > settings.BULK_IMPORT_MAX_SIZE:
+            raise ValueError(_("Files are too large to import at once."))
+
+        files = [(member.filename, archive.read(member)) for member in members]
+
+    return import_files(files, workers)
+
+
+def import_files(files: Iterable[Tuple[str, Source]], workers: int = None) -> List[ImportResult]:
+    """Import stock history CSV files, given as (name, source) pairs, to the local store.
+    Files are named after their stock symbol, see 'symbol_from_filename', and files of too long
+    symbols get an error. Files are read in the analysis process pool (see 'batch.analysis_pool'),
+    or in a pool of 'workers' processes.
+    Returns a result for each file, in the given order.
+    """
+
+    if workers is None:
+        return _import_files(files, batch.analysis_pool())
+
+    with batch.new_process_pool(workers) as pool:
+        return _import_files(files, pool)
+
+
+def _import_files(files: Iterable[Tuple[str, Source]], pool: "Executor") -> List[ImportResult]:
+    names = []
+    parses = {}
+
+    language = translation.get_language()
+
+    max_symbol_length = models.DailyBar._meta.get_field("symbol").max_length
+    too_long = []
+
+    for index, (name, source) in enumerate(files):
+        names.append(name)
+
+        # Histories of symbols that don't fit the store could never be searched
+        if len(symbol_from_filename(name)) > max_symbol_length:
+            too_long.append(index)
+        else:
+            parses[pool.submit(_parse, source, language)] = index
+
+    results: List[Optional[ImportResult]] = [None] * len(names)
+
+    for index in too_long:
+        results[index] = ImportResult(
+            names[index], symbol_from_filename(names[index]),
+            error=_("Stock symbols can be at most %(count)s characters long.") % {"count": max_symbol_length},
+        )
+
+    # Store each history as soon as it has been formatted
+    for future in as_completed(parses):
+        index = parses[future]
+        name = names[index]
+        symbol = symbol_from_filename(name)
+
+        try:
+            data, parse_seconds, error = future.result()
+        except BrokenProcessPool as error:
+            if pool is batch._analysis_pool:
+                batch._reset_analysis_pool()
+            results[index] = ImportResult(name, symbol, error=str(error))
+            continue
+
+        if error is not None:
+            results[index] = ImportResult(name, symbol, parse_seconds=parse_seconds, error=error)
+            continue
+
+        start = time.perf_counter()
+        try:
+            store.import_stock_history(symbol, data)
+        # One file that fails to store should not fail the whole import
+        except Exception as error:  # noqa
+            results[index] = ImportResult(name, symbol, parse_seconds=parse_seconds, error=str(error))
+            continue
+
+        results[index] = ImportResult(name, symbol, len(data.index), parse_seconds, time.perf_counter() - start)
+
+    return results
+
+
+def _parse(source: Source, language: str) -> Tuple[Optional["pd.DataFrame"], float, Optional[str]]:
+    # Runs in a worker process. Returns the formatted history, the time taken and an error message.
+    start = time.perf_counter()
+
+    try:
+        with translation.override(language):
+            data = utils.stock_data_from_csv(io.BytesIO(source) if isinstance(source, bytes) else source)
+            if data.empty:
+                raise utils.FetchError(_("File has no stock data."))
+            if data["Date"].duplicated().any():
+                raise utils.FetchError(_("File has more than one row for the same date."))
+    # One file with unexpected data should not fail the whole import
+    except Exception as error:  # noqa
+        return None, time.perf_counter() - start, str(error)
+
+    return data, time.perf_counter() - start, None
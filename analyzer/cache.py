@@ -0,0 +1,145 @@
+"""Cache for analysis results, on top of Django's cache framework.
+
+The backend is selected with the 'ANALYSIS_CACHE' setting, which names
+one of the aliases in 'CACHES'. Entries are keyed on normalized search
+form inputs, or on a content hash for uploaded CSV files. The hash part
+of a key is the analysis id, which can be used to refer to a cached
+analysis in URLs.
+"""
+
+import datetime
+import hashlib
+
+from typing import Awaitable, Callable, Optional
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.uploadedfile import UploadedFile
+from django.utils import timezone
+from django.utils.http import quote_etag
+from django.utils.translation import get_language
+
+from . import utils
+
+
+# Bump when analysis results change, so that old cached results are not used
+ANALYSIS_VERSION = 3
+
+KEY_PREFIX = "analysis:"
+
+
+def search_key(stock_symbol: str, start_date: "datetime.date", end_date: datetime.date = None, **options) -> str:
+    """Cache key for analysis of a stock history search. Missing end date means today.
+    Options are any other inputs that change the analysis, e.g. the moving average used.
+    """
+
+    if end_date is None:
+        end_date = utils.market_today()
+
+    options = "".join(f":{key}={value}" for key, value in sorted(options.items()))
+
+    return _key(f"{stock_symbol.strip().upper()}:{start_date.isoformat()}:{end_date.isoformat()}{options}")
+
+
+def file_key(file: Optional["UploadedFile"]) -> Optional[str]:
+    """Cache key for analysis of an uploaded CSV file, based on a hash of its contents."""
+
+    if file is None:
+        return None
+
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+
+    # Rewind for reading the data
+    file.seek(0)
+
+    return _key(f"csv:{digest.hexdigest()}")
+
+
+def is_historical(end_date: Optional["datetime.date"]) -> bool:
+    """Does a search end before today in New York (see 'utils.market_today'), so that its analysis never changes.
+    Missing end date means today.
+    """
+    return end_date is not None and end_date < utils.market_today()
+
+
+def search_timeout(end_date: Optional["datetime.date"]) -> int:
+    """How long analysis of a search can be cached. Missing end date means today."""
+
+    if is_historical(end_date):
+        return settings.ANALYSIS_CACHE_TIMEOUT_HISTORICAL
+    return settings.ANALYSIS_CACHE_TIMEOUT_CURRENT
+
+
+def search_etag(key: str) -> str:
+    """Entity tag for the analysis of a search with the given cache key. The key is derived from the
+    search inputs, the version of the stock history, the language and ANALYSIS_VERSION, so it only
+    changes when the analysis can. Only valid for historical searches (see 'is_historical'),
+    since others change during the day.
+    """
+    return quote_etag(analysis_id(key))
+
+
+def search_last_modified(end_date: "datetime.date", imported: Optional["datetime.datetime"] = None) -> int:
+    """When the analysis of a historical search (see 'is_historical') last changed, as a timestamp:
+    at the end of its last day in New York, after which its daily bars are final, or when its stock
+    history was last imported (see 'store.import_stock_history'), if later.
+    """
+
+    day_after = datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min)
+    last_modified = timezone.make_aware(day_after, utils.MARKET_TIME_ZONE)
+
+    if imported is not None:
+        last_modified = max(last_modified, imported)
+
+    return int(last_modified.timestamp())
+
+
+def cached_analysis(key: Optional[str], analyze: Callable[[], dict], timeout: int) -> dict:
+    """Get analysis from the cache, or analyze and cache it if not found.
+    Errors raised by 'analyze' are not cached.
+    """
+
+    if key is None:
+        return analyze()
+
+    return caches[settings.ANALYSIS_CACHE].get_or_set(key, analyze, timeout)
+
+
+async def cached_analysis_async(key: Optional[str], analyze: Callable[[], Awaitable[dict]], timeout: int) -> dict:
+    """Like 'cached_analysis', for analyzing in a coroutine."""
+
+    if key is None:
+        return await analyze()
+
+    analyses = caches[settings.ANALYSIS_CACHE]
+
+    # Cache backends may block on the network
+    analysis = await sync_to_async(analyses.get, thread_sensitive=False)(key)
+    if analysis is None:
+        analysis = await analyze()
+        await sync_to_async(analyses.set, thread_sensitive=False)(key, analysis, timeout)
+
+    return analysis
+
+
+def analysis_id(key: Optional[str]) -> Optional[str]:
+    """Id of the analysis cached with the given key."""
+
+    if key is None:
+        return None
+
+    return key[len(KEY_PREFIX):]
+
+
+def get_analysis(analysis_id: str) -> Optional[dict]:
+    """Get analysis from the cache by its id. None if not cached (anymore)."""
+    return caches[settings.ANALYSIS_CACHE].get(KEY_PREFIX + analysis_id)
+
+
+def _key(identifier: str) -> str:
+    # Column names of the analyses are translated, so results depend on the active language.
+    # Hashed so that keys have a fixed length and their ids are safe to use in URLs.
+    digest = hashlib.sha256(f"{ANALYSIS_VERSION}:{get_language()}:{identifier}".encode()).hexdigest()
+    return KEY_PREFIX + digest
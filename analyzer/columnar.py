@@ -0,0 +1,170 @@
+"""Stock histories in a fixed-width columnar binary file format.
+
+A file has a 16 byte header (magic, format version and number of rows), followed
+by the columns one after another: closing, opening, high and low prices as int64
+ticks (see 'analyzer.prices'), volume as int64 and dates as int32 days since
+1970-01-01. Files are opened with memory mapping, so reading one does not parse
+or copy anything, and the columns can be analyzed directly (see 'ColumnarHistory.analyze').
+"""
+
+import os
+import struct
+import tempfile
+
+from pathlib import Path
+from typing import Any, Dict, Iterable, Union
+
+from . import analyses
+from . import utils
+from .lazy import LazyModule
+
+# Imported on first use, see 'analyzer.lazy'
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+
+
+__all__ = [
+    "ColumnarHistory",
+    "MISSING_VOLUME",
+    "read_history",
+    "write_history",
+]
+
+# Magic, format version, reserved and number of rows, little-endian
+HEADER = struct.Struct("<4sHHQ")
+MAGIC = b"STNK"
+VERSION = 1
+
+# Price columns, stored as one contiguous block
+PRICE_COLUMNS = ["Close/Last", "Open", "High", "Low"]
+
+# Stands for a missing volume, since int64 has no NaN
+MISSING_VOLUME = -2 ** 63
+
+
+class ColumnarHistory:
+    """Memory mapped stock history file, in ascending date order. Columns are read-only arrays:
+    'dates' as int32 days since 1970-01-01, 'close', 'open', 'high' and 'low' as int64 ticks,
+    and 'volume' as int64 with 'MISSING_VOLUME' for missing volumes.
+    """
+
+    def __init__(self, path: Union[str, "os.PathLike"]):
+        self.path = Path(path)
+
+        raw = np.memmap(self.path, dtype=np.uint8, mode="r")
+
+        try:
+            magic, version, _, rows = HEADER.unpack(raw[:HEADER.size].tobytes())
+        except struct.error:
+            raise ValueError(f"'{self.path}' is not a stock history file.") from None
+
+        if magic != MAGIC:
+            raise ValueError(f"'{self.path}' is not a stock history file.")
+        if version != VERSION:
+            raise ValueError(f"'{self.path}' has unsupported format version {version}.")
+        if len(raw) != HEADER.size + rows * (8 * len(PRICE_COLUMNS) + 8 + 4):
+            raise ValueError(f"'{self.path}' is truncated.")
+
+        self.rows = rows
+
+        offset = HEADER.size
+        self.prices = raw[offset:offset + 8 * len(PRICE_COLUMNS) * rows].view("<i8")
+        self.prices = self.prices.reshape(len(PRICE_COLUMNS), rows)
+        self.close, self.open, self.high, self.low = self.prices
+
+        offset += self.prices.nbytes
+        self.volume = raw[offset:offset + 8 * rows].view("<i8")
+
+        offset += self.volume.nbytes
+        self.dates = raw[offset:offset + 4 * rows].view("<i4")
+
+    def __len__(self):
+        return self.rows
+
+    def intermediates(self) -> Dict[str, "np.ndarray"]:
+        """Columns as the intermediates of 'analyzer.analyses'.
+        Prices are not copied, and neither are volumes if none are missing.
+        """
+
+        volume = self.volume
+        missing = volume == MISSING_VOLUME
+        if missing.any():
+            volume = volume.astype(np.float64)
+            volume[missing] = np.nan
+
+        return {
+            "dates": self.dates.astype("datetime64[D]"),
+            "close": self.close,
+            "open": self.open,
+            "high": self.high,
+            "low": self.low,
+            "volume": volume,
+        }
+
+    def analyze(self, names: Iterable[str] = None, **options) -> Dict[str, Any]:
+        """Run analyses on the columns, see 'analyses.run'. Analyses requiring the DataFrame
+        of the history (the 'data' intermediate) are not supported, use 'to_frame' for those.
+        """
+
+        return analyses.run(None, names, **self.intermediates(), **options)
+
+    def to_frame(self) -> "pd.DataFrame":
+        """History as formatted stock data (see 'utils.format_stock_data'). The columns are copied."""
+
+        intermediates = self.intermediates()
+
+        return pd.DataFrame({
+            "Date": pd.to_datetime(intermediates["dates"]),
+            "Close/Last": self.close,
+            "Volume": intermediates["volume"],
+            "Open": self.open,
+            "High": self.high,
+            "Low": self.low,
+        })
+
+
+def read_history(path: Union[str, "os.PathLike"]) -> "ColumnarHistory":
+    """Open a stock history file written with 'write_history'. Raises ValueError if it is not one."""
+    return ColumnarHistory(path)
+
+
+def write_history(path: Union[str, "os.PathLike"], data: "pd.DataFrame") -> None:
+    """Write formatted stock data (e.g. from 'utils.fetch_stock_history' or 'utils.stock_data_from_csv')
+    to a stock history file. The file is replaced atomically, so readers never see a partial file.
+    """
+
+    path = Path(path)
+    data = data.sort_values(by="Date") if not data["Date"].is_monotonic_increasing else data
+
+    days = utils.stock_dates(data).astype("datetime64[D]").astype(np.int64)
+    if len(days) and (days.min() < np.iinfo(np.int32).min or days.max() > np.iinfo(np.int32).max):
+        raise ValueError("Dates are out of range.")
+
+    volume = data["Volume"]
+    missing = volume.isna().to_numpy()
+    volume = volume.fillna(0).to_numpy(dtype=np.int64)
+    volume[missing] = MISSING_VOLUME
+
+    fd, temporary = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(HEADER.pack(MAGIC, VERSION, 0, len(days)))
+            for column in PRICE_COLUMNS:
+                data[column].to_numpy(dtype="<i8").tofile(file)
+            volume.astype("<i8").tofile(file)
+            days.astype("<i4").tofile(file)
+
+        # Temporary files are only readable by their owner, which would keep other users from mapping the history
+        os.chmod(temporary, _new_file_mode())
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def _new_file_mode() -> int:
+    # Mode of files created with the current umask, which can only be read by setting it
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
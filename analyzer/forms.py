@@ -1,10 +1,13 @@
 """Create your forms here"""
 
 from django import forms
+from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Layout, Div, HTML
 
+from . import utils
+
 
 class SearchForm(forms.Form):
     """Form to search for stock data."""
@@ -35,6 +38,12 @@ class SearchForm(forms.Form):
         ),
         required=False
     )
+    moving_average = forms.ChoiceField(
+        label=_("Moving Average"),
+        choices=[(name, name) for name in utils.MOVING_AVERAGES],
+        initial=utils.DEFAULT_MOVING_AVERAGE,
+        required=False
+    )
 
     helper = FormHelper()
     helper.form_method = 'GET'
@@ -70,7 +79,54 @@ class SearchForm(forms.Form):
             ),
             css_class="row"
         ),
+        Div(
+            Div(
+                "moving_average",
+                css_class="col-sm"
+            ),
+            css_class="row"
+        ),
         HTML(
             f'<button type="submit" class="btn btn-success btn-block mt-3">{_("Search")}</button>'
         )
-    )
\ No newline at end of file
+    )
+
+
+class BatchSearchForm(forms.Form):
+    """Form to search for stock data of many stocks at once."""
+
+    stock_symbols = forms.CharField(
+        label=_("Stocks"),
+        help_text=_("Comma separated list of stock symbols."),
+        required=True
+    )
+    start_date = forms.DateField(
+        label=_("Start Date"),
+        required=True
+    )
+    end_date = forms.DateField(
+        label=_("End Date (optional)"),
+        required=False
+    )
+    moving_average = forms.ChoiceField(
+        label=_("Moving Average"),
+        choices=[(name, name) for name in utils.MOVING_AVERAGES],
+        required=False
+    )
+
+    def clean_stock_symbols(self):
+        # Remove duplicates but keep order
+        stock_symbols = list(dict.fromkeys(
+            symbol.strip().upper() for symbol in self.cleaned_data["stock_symbols"].split(",") if symbol.strip()
+        ))
+
+        if not stock_symbols:
+            raise forms.ValidationError(_("Give at least one stock symbol."))
+        if len(stock_symbols) > settings.BATCH_MAX_STOCKS:
+            raise forms.ValidationError(
+                _("Give at most %(count)s stock symbols.") % {"count": settings.BATCH_MAX_STOCKS}
+            )
+        if any(len(symbol) > 10 for symbol in stock_symbols):
+            raise forms.ValidationError(_("Stock symbols can be at most 10 characters long."))
+
+        return stock_symbols
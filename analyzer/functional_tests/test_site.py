@@ -134,7 +134,7 @@ class TestSiteFunctionality(StaticLiveServerTestCase_Chrome):
 
         self.assertURLEqual(
             self.browser.current_url,
-            self.live_server_url + f"/?stock_symbol={stock}&start_date={start_date}&end_date="
+            self.live_server_url + f"/?stock_symbol={stock}&start_date={start_date}&end_date=&moving_average=SMA5"
         )
 
     def test_search_start_date_to_end_date(self):
@@ -176,6 +176,7 @@ class TestSiteFunctionality(StaticLiveServerTestCase_Chrome):
         self.assertURLEqual(
             self.browser.current_url,
             self.live_server_url + f"/?stock_symbol={stock}&start_date={start_date}&end_date={end_date}"
+                                   f"&moving_average=SMA5"
         )
 
     def test_analyze_from_csv(self):
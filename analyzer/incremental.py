@@ -0,0 +1,254 @@
+"""Analyses of stock histories that are updated one trading day at a time.
+
+Instead of rerunning the batch analyses of 'analyzer.utils' over the whole history
+when a new day arrives, the analyzers here keep state that is updated per appended
+day: a running streak, a rolling window of closing prices and sorted indices for
+the rankings. Their results are identical to those of the batch analyses.
+
+Appending a day takes constant time. The sort keys of the days appended since the
+results were last read are sorted into the rankings when they are read again, in
+O(n + k log k) time for n ranked and k appended days, see '_SortedKeys'.
+
+Analyzer state is plain Python objects, so it can be persisted with 'dumps' and
+restored with 'loads', e.g. in a cache or a file, and then updated further.
+"""
+
+import math
+import pickle
+
+from collections import deque
+from typing import Any, Dict, List
+
+from . import utils
+from .lazy import LazyModule
+
+# Imported on first use, see 'analyzer.lazy'
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+
+
+__all__ = [
+    "IncrementalAnalysis",
+    "LongestBullishStreak",
+    "OpeningPriceRanking",
+    "VolumeRanking",
+    "dumps",
+    "loads",
+]
+
+
+class _SortedKeys:
+    """Sort keys in ascending order. Added keys are only sorted in when the keys are read."""
+
+    def __init__(self):
+        self._sorted: List[tuple] = []
+        self._added: List[tuple] = []
+
+    def __len__(self):
+        return len(self._sorted) + len(self._added)
+
+    def add(self, key: tuple) -> None:
+        self._added.append(key)
+
+    def keys(self) -> List[tuple]:
+        if self._added:
+            # Timsort merges the two sorted runs in linear time
+            self._added.sort()
+            self._sorted.extend(self._added)
+            self._sorted.sort()
+            self._added = []
+
+        return self._sorted
+
+
+class LongestBullishStreak:
+    """Days in the longest bullish (upward) trend, see 'utils.longest_bullish_streak'."""
+
+    def __init__(self):
+        self.days = 0
+        self.last_close = None
+        # Consecutive days the closing price has risen, up to the last day
+        self.rising = 0
+        # Longest streak so far, the earliest one of equally long streaks. Streak 0 and indices -1 without
+        # an upward day, like in 'utils.bullish_streaks'.
+        self.streak = 0
+        self.start = -1
+        self.end = -1
+
+    def append(self, close: int) -> None:
+        if self.last_close is not None and close > self.last_close:
+            self.rising += 1
+        else:
+            self.rising = 0
+
+        if self.rising and self.rising + 1 > self.streak:
+            self.streak = self.rising + 1
+            self.start = self.days - self.rising
+            self.end = self.days
+
+        self.last_close = close
+        self.days += 1
+
+    def result(self) -> int:
+        return self.streak
+
+
+class VolumeRanking:
+    """Days ordered by volume and price change, see 'utils.history_by_volume_and_price_delta'."""
+
+    def __init__(self):
+        self.dates: List[Any] = []
+        self.volume: List[float] = []
+        self.price_range: List[int] = []
+        # Sort keys (volume, price range, index) of the days in ranking order
+        self._keys = _SortedKeys()
+
+    def append(self, date: Any, volume: float, high: int, low: int) -> None:
+        index = len(self.dates)
+        # Like 'utils.price_range'
+        price_range = abs(high - low)
+
+        # Same keys as 'utils._volume_and_price_change_order', missing volumes last
+        volume_key = -float(volume) if not _is_missing(volume) else math.inf
+        self._keys.add((volume_key, -price_range, index))
+
+        self.dates.append(date)
+        self.volume.append(volume if not _is_missing(volume) else math.nan)
+        self.price_range.append(price_range)
+
+    def result(self, dateformat: str = None, limit: int = None) -> "pd.DataFrame":
+        keys = self._keys.keys()
+        keys = keys if limit is None else keys[:max(limit, 0)]
+        order = np.fromiter((key[-1] for key in keys), dtype=np.int64, count=len(keys))
+
+        return utils.history_by_volume_table(
+            utils.format_dates(_dates_array(self.dates), dateformat),
+            np.array(self.volume),
+            np.array(self.price_range, dtype=np.int64),
+            order=order,
+        )
+
+
+class OpeningPriceRanking:
+    """Days ordered by the opening price compared to a simple moving average of closing prices,
+    see 'utils.best_opening_price_compared_to_moving_average'. Exponential moving averages are
+    not supported, since the rounding of their results depends on the whole history.
+    """
+
+    def __init__(self, moving_average: str = utils.DEFAULT_MOVING_AVERAGE):
+        kind, window = utils._parse_moving_average(moving_average)
+        if kind != "SMA":
+            raise ValueError(f"Moving average '{moving_average}' can not be updated incrementally")
+
+        self.moving_average = moving_average
+        self.window = window
+        self.dates: List[Any] = []
+        self.price_change: List[float] = []
+        # Last closing prices and their sum, which is exact for ticks
+        self._closes = deque(maxlen=window)
+        self._sum = 0
+        # Sort keys (price change, index) of the days with a price change in ranking order,
+        # the others are ranked last
+        self._keys = _SortedKeys()
+        self._missing: List[int] = []
+
+    def append(self, date: Any, close: int, opening: int) -> None:
+        index = len(self.dates)
+
+        if len(self._closes) == self.window:
+            self._sum -= self._closes[0]
+        self._closes.append(close)
+        self._sum += close
+
+        if len(self._closes) == self.window:
+            # Computed like in 'utils.opening_price_change', so the rounding is the same
+            change = float(np.round(np.float64(100 * (self.window * opening - self._sum)) / np.float64(self._sum), 2))
+        else:
+            change = math.nan
+
+        if math.isnan(change):
+            self._missing.append(index)
+        else:
+            self._keys.add((-change, index))
+
+        self.dates.append(date)
+        self.price_change.append(change)
+
+    def result(self, dateformat: str = None) -> "pd.DataFrame":
+        keys = self._keys.keys()
+        order = np.fromiter((key[-1] for key in keys), dtype=np.int64, count=len(keys))
+        order = np.concatenate((order, np.array(self._missing, dtype=np.int64)))
+
+        return utils.best_opening_price_table(
+            utils.format_dates(_dates_array(self.dates), dateformat),
+            np.array(self.price_change, dtype=np.float64),
+            order=order,
+        )
+
+
+class IncrementalAnalysis:
+    """All analyses of 'IndexView.analyze_stock_data', updated one day at a time.
+    Days must be appended in ascending date order.
+    """
+
+    def __init__(self, moving_average: str = utils.DEFAULT_MOVING_AVERAGE):
+        self.moving_average = moving_average
+        self.last_date = None
+        self.bullish = LongestBullishStreak()
+        self.volume = VolumeRanking()
+        self.opening = OpeningPriceRanking(moving_average)
+
+    def __len__(self):
+        return self.bullish.days
+
+    def append(self, date: Any, close: int, volume: float, opening: int, high: int, low: int) -> None:
+        """Append a day of formatted stock data (see 'utils.format_stock_data'), prices in ticks."""
+
+        date = np.datetime64(date, "ns")
+        if self.last_date is not None and date <= self.last_date:
+            raise ValueError(f"Days must be appended in ascending date order, {date} is not after {self.last_date}")
+
+        self.bullish.append(close)
+        self.volume.append(date, volume, high, low)
+        self.opening.append(date, close, opening)
+        self.last_date = date
+
+    def extend(self, data: "pd.DataFrame") -> None:
+        """Append all days of formatted stock data (see 'utils.format_stock_data'), in either representation."""
+
+        if not data["Date"].is_monotonic_increasing:
+            data = data.sort_values(by="Date")
+
+        for date, close, volume, opening, high, low in zip(
+            utils.stock_dates(data), data["Close/Last"].tolist(), data["Volume"].tolist(),
+            data["Open"].tolist(), data["High"].tolist(), data["Low"].tolist(),
+        ):
+            self.append(date, close, volume, opening, high, low)
+
+    def result(self, dateformat: str = None) -> Dict[str, Any]:
+        """Results like those of 'IndexView.analyze_stock_data'."""
+
+        return {
+            "longest_bullish": self.bullish.result(),
+            "history_by_volume": self.volume.result(dateformat),
+            "best_opening_price": self.opening.result(dateformat),
+            "moving_average": self.moving_average,
+        }
+
+
+def dumps(state: Any) -> bytes:
+    """Serialize analyzer state for persisting it."""
+    return pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def loads(data: bytes) -> Any:
+    """Restore analyzer state serialized with 'dumps'. Only load data from trusted sources."""
+    return pickle.loads(data)
+
+
+def _is_missing(volume: float) -> bool:
+    return volume is None or (isinstance(volume, float) and math.isnan(volume))
+
+
+def _dates_array(dates: List[Any]) -> "np.ndarray":
+    return np.array(dates, dtype="datetime64[ns]")
@@ -0,0 +1,43 @@
+"""Deferred imports of heavy dependencies.
+
+Importing pandas and numpy takes a good part of a second, which every
+management command, worker start and autoreload would pay, even if no
+analysis is run. Modules of the app import them with 'LazyModule' instead,
+so they are imported when an analysis actually uses them.
+"""
+
+import importlib
+
+from types import ModuleType
+from typing import Optional
+
+
+__all__ = [
+    "LazyModule",
+]
+
+
+class LazyModule:
+    """Stand-in for a module, which imports it on first attribute access, e.g. 'pd = LazyModule("pandas")'.
+    Imports go through the import system, so the module is imported only once, even between threads.
+    Attributes are kept on the stand-in when first accessed, so later accesses are plain attribute
+    lookups, which is why attributes later replaced on the module are not seen through it.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._loaded: Optional["ModuleType"] = None
+
+    def __getattr__(self, attr: str):
+        # Only called for attributes not kept on the stand-in yet
+        value = getattr(self._module(), attr)
+        self.__dict__[attr] = value
+        return value
+
+    def __repr__(self):
+        return f"<lazy module '{self._name}'>"
+
+    def _module(self) -> "ModuleType":
+        if self._loaded is None:
+            self._loaded = importlib.import_module(self._name)
+        return self._loaded
@@ -0,0 +1,52 @@
+"""Analyze many stocks from the command line."""
+
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analyzer import batch
+from analyzer import serialization
+from analyzer import utils
+
+
+class Command(BaseCommand):
+    help = "Analyze the stock history of many stocks over the same date range, and output the results as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("stock_symbols", nargs="+", help="Stock symbols to analyze.")
+        parser.add_argument("--start-date", required=True, type=datetime.date.fromisoformat, help="YYYY-MM-DD")
+        parser.add_argument("--end-date", type=datetime.date.fromisoformat, help="YYYY-MM-DD, default: today")
+        parser.add_argument("--moving-average", default=utils.DEFAULT_MOVING_AVERAGE, choices=utils.MOVING_AVERAGES)
+        parser.add_argument("--output", help="File to write the results to, default: standard output.")
+
+    def handle(self, *args, **options):
+        stock_symbols = list(dict.fromkeys(symbol.upper() for symbol in options["stock_symbols"]))
+
+        analyses = batch.analyze_stocks(
+            stock_symbols,
+            start_date=options["start_date"],
+            end_date=options["end_date"],
+            dateformat="%Y-%m-%d",
+            moving_average=options["moving_average"],
+            language="en",
+        )
+
+        results = {
+            stock_symbol: analysis if "error" in analysis else serialization.analysis_json(analysis)
+            for stock_symbol, analysis in analyses.items()
+        }
+
+        output = serialization.dumps({"results": results}).decode()
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
+
+        failed = [stock_symbol for stock_symbol, analysis in analyses.items() if "error" in analysis]
+        for stock_symbol in failed:
+            self.stderr.write(f"{stock_symbol}: {analyses[stock_symbol]['error']}")
+
+        if len(failed) == len(stock_symbols):
+            raise CommandError("No stocks could be analyzed.")
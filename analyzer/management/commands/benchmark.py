@@ -0,0 +1,53 @@
+"""Benchmark the stock data pipeline from the command line."""
+
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analyzer.benchmarks import suite
+
+
+class Command(BaseCommand):
+    help = (
+        "Time parsing, formatting, fetching, analyzing and rendering synthetic stock histories, "
+        "and compare the times to stored baselines."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", nargs="+", type=int, default=suite.DEFAULT_SIZES,
+            help="Rows in the synthetic histories, e.g. 1000 10000000.",
+        )
+        parser.add_argument("--repeat", type=int, default=3, help="Times to run each benchmark, best is used.")
+        parser.add_argument(
+            "--threshold", type=float, default=suite.DEFAULT_THRESHOLD,
+            help="Relative slowdown from the baseline that counts as a regression.",
+        )
+        parser.add_argument("--baselines", type=Path, default=suite.BASELINES_FILE, help="Baselines JSON file.")
+        parser.add_argument("--save-baselines", action="store_true", help="Save the results as the new baselines.")
+
+    def handle(self, *args, **options):
+        baselines = suite.load_baselines(options["baselines"])
+
+        def report(name, rows, seconds):
+            baseline = baselines.get(name, {}).get(str(rows))
+            change = f"{(seconds / baseline - 1) * 100:+.1f}%" if baseline else "no baseline"
+            self.stdout.write(f"{name:<48}{rows:>10} rows {seconds * 1000:>12.2f} ms  ({change})")
+
+        results = suite.run(options["sizes"], options["repeat"], report=report)
+
+        if options["save_baselines"]:
+            suite.save_baselines(results, options["baselines"])
+            self.stdout.write(self.style.SUCCESS(f"Baselines saved to {options['baselines']}"))
+            return
+
+        regressions = suite.compare(results, baselines, options["threshold"])
+
+        for regression in regressions:
+            self.stderr.write(
+                f"{regression.benchmark} ({regression.rows} rows): {regression.seconds * 1000:.2f} ms, "
+                f"baseline {regression.baseline * 1000:.2f} ms"
+            )
+
+        if regressions:
+            raise CommandError(f"{len(regressions)} benchmarks regressed by more than {options['threshold']:.0%}.")
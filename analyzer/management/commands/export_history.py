@@ -0,0 +1,41 @@
+"""Write stock histories to columnar binary files from the command line."""
+
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analyzer import columnar
+from analyzer import store
+from analyzer import utils
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the stock history of a stock, or of a CSV file, to a columnar binary file "
+        "that can be memory mapped for analysis without parsing (see 'analyzer.columnar')."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="File to write the stock history to.")
+        parser.add_argument("--csv", help="CSV file in the Nasdaq format to read the stock history from.")
+        parser.add_argument("--stock-symbol", help="Stock to fetch the stock history of, instead of a CSV file.")
+        parser.add_argument("--start-date", type=datetime.date.fromisoformat, help="YYYY-MM-DD")
+        parser.add_argument("--end-date", type=datetime.date.fromisoformat, help="YYYY-MM-DD, default: today")
+
+    def handle(self, *args, **options):
+        if (options["csv"] is None) == (options["stock_symbol"] is None):
+            raise CommandError("Give either --csv or --stock-symbol.")
+
+        try:
+            if options["csv"] is not None:
+                data = utils.stock_data_from_csv(options["csv"])
+            else:
+                if options["start_date"] is None:
+                    raise CommandError("--start-date is required with --stock-symbol.")
+                data = store.stock_history(options["stock_symbol"], options["start_date"], options["end_date"])
+        except utils.FetchError as error:
+            raise CommandError(error)
+
+        columnar.write_history(options["output"], data)
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(data.index)} days to {options['output']}"))
@@ -0,0 +1,40 @@
+"""Import stock history CSV files from a directory to the local store."""
+
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analyzer import bulk_import
+
+
+class Command(BaseCommand):
+    help = (
+        "Import the stock history CSV files in a directory to the local store, each named after "
+        "its stock symbol (e.g. AAPL.csv). Files are read in parallel, one process per core."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory", type=Path, help="Directory of CSV files.")
+        parser.add_argument("--pattern", default="*.csv", help="Files to import in the directory.")
+        parser.add_argument("--workers", type=int, help="Processes reading files (default: number of processors).")
+
+    def handle(self, *args, **options):
+        if not options["directory"].is_dir():
+            raise CommandError(f"'{options['directory']}' is not a directory.")
+
+        results = bulk_import.import_directory(options["directory"], options["pattern"], options["workers"])
+
+        for result in results:
+            if result.error is not None:
+                self.stderr.write(f"{result.name:<32}{result.symbol:<10} {result.error}")
+            else:
+                self.stdout.write(
+                    f"{result.name:<32}{result.symbol:<10}{result.rows:>10} rows"
+                    f"{result.parse_seconds * 1000:>10.1f} ms parse{result.store_seconds * 1000:>10.1f} ms store"
+                )
+
+        failed = sum(result.error is not None for result in results)
+        self.stdout.write(f"Imported {len(results) - failed} of {len(results)} files.")
+
+        if failed:
+            raise CommandError(f"{failed} files could not be imported.")
@@ -0,0 +1,32 @@
+"""Report the memory use of the stock data pipeline from the command line."""
+
+from django.core.management.base import BaseCommand
+
+from analyzer.benchmarks import memory
+
+MIB = 2 ** 20
+
+
+class Command(BaseCommand):
+    help = (
+        "Parse, format, analyze and render a synthetic stock history, "
+        "and report the peak and retained memory of each stage."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000, help="Rows in the synthetic history.")
+        parser.add_argument(
+            "--no-compact", action="store_false", dest="compact",
+            help="Analyze the stock data without converting it to the compact representation.",
+        )
+
+    def handle(self, *args, **options):
+        rows = options["rows"]
+        stages = memory.memory_profile(rows, compact=options["compact"])
+
+        self.stdout.write(f"{'stage':<24}{'peak':>12}{'retained':>12}{'per row':>12}")
+        for stage in stages:
+            self.stdout.write(
+                f"{stage.stage:<24}{stage.peak_bytes / MIB:>8.2f} MiB{stage.retained_bytes / MIB:>8.2f} MiB"
+                f"{stage.retained_bytes / max(rows, 1):>8.1f} B"
+            )
@@ -0,0 +1,46 @@
+"""Report where the time goes when the app starts."""
+
+from django.core.management.base import BaseCommand
+
+from analyzer.benchmarks import startup
+
+
+class Command(BaseCommand):
+    help = (
+        "Start the app in a fresh interpreter with 'python -X importtime', "
+        "and report the slowest imports and which heavy dependencies were imported."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=20, help="Number of slowest imports to show.")
+        parser.add_argument(
+            "--import", nargs="+", default=[], dest="modules", metavar="MODULE",
+            help="Modules to import after starting, e.g. analyzer.utils.",
+        )
+
+    def handle(self, *args, **options):
+        times, total = startup.startup_import_times(options["modules"])
+
+        self.stdout.write(f"Startup took {total * 1000:.1f} ms")
+        self.stdout.write(f"Imports took {self.imports_total(times) * 1000:.1f} ms, including those of the interpreter")
+        self.stdout.write(f"\n{'cumulative':>12}{'self':>12}  module")
+
+        slowest = sorted(times, key=lambda time: time.cumulative_seconds, reverse=True)[:options["limit"]]
+        for time in slowest:
+            self.stdout.write(
+                f"{time.cumulative_seconds * 1000:>9.1f} ms{time.self_seconds * 1000:>9.1f} ms  "
+                f"{'  ' * time.depth}{time.module}"
+            )
+
+        imported = {time.module for time in times}
+        self.stdout.write("")
+        for module in startup.HEAVY_MODULES:
+            if module in imported:
+                self.stdout.write(self.style.WARNING(f"{module} is imported at startup"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{module} is not imported at startup"))
+
+    @staticmethod
+    def imports_total(times) -> float:
+        # Imports at the top level include the time of the imports nested in them
+        return sum(time.cumulative_seconds for time in times if time.depth == 0)
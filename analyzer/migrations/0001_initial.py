@@ -0,0 +1,46 @@
+# Generated by Django 3.1.7 on 2026-10-17 04:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBar',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=10)),
+                ('date', models.DateField()),
+                ('close', models.BigIntegerField()),
+                ('volume', models.BigIntegerField(null=True)),
+                ('open', models.BigIntegerField()),
+                ('high', models.BigIntegerField()),
+                ('low', models.BigIntegerField()),
+            ],
+            options={
+                'ordering': ['symbol', 'date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='FetchedRange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(db_index=True, max_length=10)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+            ],
+            options={
+                'ordering': ['symbol', 'start_date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailybar',
+            constraint=models.UniqueConstraint(fields=('symbol', 'date'), name='unique_daily_bar'),
+        ),
+    ]
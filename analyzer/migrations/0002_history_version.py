@@ -0,0 +1,25 @@
+# Generated by Django 3.2.25 on 2026-10-17 05:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analyzer', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoryVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=10, unique=True)),
+                ('generation', models.PositiveIntegerField(default=0)),
+                ('modified', models.DateTimeField(null=True)),
+            ],
+            options={
+                'ordering': ['symbol'],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+"""Create your models here."""
+
+from django.db import models
+
+
+class DailyBar(models.Model):
+    """One trading day of a stock, as fetched from the Nasdaq API.
+    Prices are fixed-point ticks, see 'analyzer.prices'.
+    """
+
+    symbol = models.CharField(max_length=10)
+    date = models.DateField()
+    close = models.BigIntegerField()
+    volume = models.BigIntegerField(null=True)
+    open = models.BigIntegerField()
+    high = models.BigIntegerField()
+    low = models.BigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["symbol", "date"], name="unique_daily_bar"),
+        ]
+        ordering = ["symbol", "date"]
+
+    def __str__(self):
+        return f"{self.symbol} {self.date}"
+
+
+class FetchedRange(models.Model):
+    """Date range (both ends included) for which all daily bars of a stock have been stored.
+    Days without a DailyBar inside a fetched range were not trading days.
+    """
+
+    symbol = models.CharField(max_length=10, db_index=True)
+    start_date = models.DateField()
+    end_date = models.DateField()
+
+    class Meta:
+        ordering = ["symbol", "start_date"]
+
+    def __str__(self):
+        return f"{self.symbol} {self.start_date} - {self.end_date}"
+
+
+class HistoryVersion(models.Model):
+    """Version of the stored daily bars of a stock, bumped when they are replaced by an import.
+    Histories and analyses cached from the store are only valid for the version they were made from.
+    """
+
+    symbol = models.CharField(max_length=10, unique=True)
+    generation = models.PositiveIntegerField(default=0)
+    modified = models.DateTimeField(null=True)
+
+    class Meta:
+        ordering = ["symbol"]
+
+    def __str__(self):
+        return f"{self.symbol} {self.generation}"
@@ -0,0 +1,183 @@
+"""Connections to the Nasdaq API.
+
+API calls share a pooled session, which retries failed calls with backoff.
+Calls from coroutines share a client per event loop, and are retried the same way.
+When the API keeps failing, 'circuit_breaker' stops calling it for a while,
+so that requests fail fast instead of each waiting for the timeouts.
+"""
+
+import asyncio
+import threading
+import time
+import weakref
+
+from typing import Optional
+from django.conf import settings
+
+from .lazy import LazyModule
+
+# Imported on first use, see 'analyzer.lazy'
+httpx = LazyModule("httpx")
+requests = LazyModule("requests")
+urllib3 = LazyModule("urllib3")
+
+
+__all__ = [
+    "CircuitBreaker",
+    "async_client",
+    "circuit_breaker",
+    "get_async",
+    "session",
+]
+
+# Responses worth retrying: the API is overloaded or temporarily down
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+
+_session: Optional["requests.Session"] = None
+_session_lock = threading.Lock()
+
+
+def session() -> "requests.Session":
+    """Session for Nasdaq API calls, created on first use and shared by all threads."""
+
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            retry = urllib3.util.retry.Retry(
+                total=settings.NASDAQ_RETRIES,
+                backoff_factor=settings.NASDAQ_RETRY_BACKOFF,
+                status_forcelist=RETRY_STATUSES,
+            )
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=settings.NASDAQ_POOL_SIZE, max_retries=retry)
+
+            _session = requests.Session()
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+
+        return _session
+
+
+def _reset_session() -> None:
+    global _session
+
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = \
+    weakref.WeakKeyDictionary()
+
+
+def async_client() -> "httpx.AsyncClient":
+    """Client for Nasdaq API calls from coroutines, created on first use in each event loop and shared
+    by its coroutines. Clients can't be shared between event loops, so under WSGI, where each request
+    to an async view runs in its own event loop, a client is only shared within a request.
+    """
+
+    loop = asyncio.get_running_loop()
+
+    with _session_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = _async_clients[loop] = httpx.AsyncClient(
+                timeout=httpx.Timeout(settings.NASDAQ_READ_TIMEOUT, connect=settings.NASDAQ_CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=settings.NASDAQ_POOL_SIZE),
+            )
+
+        return client
+
+
+async def get_async(url: str, headers: dict = None) -> "httpx.Response":
+    """GET from the Nasdaq API with the client of the running event loop (see 'async_client').
+    Failed connections and error responses are retried with backoff like in 'session'.
+    Returns the last response, also if it is an error response.
+    """
+
+    client = async_client()
+
+    for attempt in range(settings.NASDAQ_RETRIES + 1):
+        if attempt > 0:
+            await asyncio.sleep(settings.NASDAQ_RETRY_BACKOFF * 2 ** (attempt - 1))
+
+        last = attempt == settings.NASDAQ_RETRIES
+
+        try:
+            response = await client.get(url, headers=headers)
+        except httpx.TransportError:
+            if last:
+                raise
+            continue
+
+        if last or response.status_code not in RETRY_STATUSES:
+            return response
+
+
+class CircuitBreaker:
+    """Stop calling a failing service after 'failures' consecutive failures. After 'reset_timeout'
+    seconds, let one call through: if it succeeds, calls are allowed again, otherwise wait again.
+    """
+
+    def __init__(self, failures: int, reset_timeout: float):
+        self.failures = failures
+        self.reset_timeout = reset_timeout
+        self._failed = 0
+        self._opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        """Whether a call can be made now."""
+
+        with self._lock:
+            if self._opened_at is None:
+                return True
+
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+
+            # Trial call, others wait for its outcome until the next timeout
+            self._opened_at = time.monotonic()
+            return True
+
+    def success(self) -> None:
+        with self._lock:
+            self._failed = 0
+            self._opened_at = None
+
+    def failure(self) -> None:
+        with self._lock:
+            self._failed += 1
+            if self._failed >= self.failures:
+                self._opened_at = time.monotonic()
+
+
+_circuit_breaker: Optional["CircuitBreaker"] = None
+_circuit_breaker_lock = threading.Lock()
+
+
+def circuit_breaker() -> "CircuitBreaker":
+    """Circuit breaker for Nasdaq API calls, shared by all threads."""
+
+    global _circuit_breaker
+
+    with _circuit_breaker_lock:
+        if _circuit_breaker is None:
+            _circuit_breaker = CircuitBreaker(
+                failures=settings.NASDAQ_CIRCUIT_FAILURES,
+                reset_timeout=settings.NASDAQ_CIRCUIT_RESET_TIMEOUT,
+            )
+
+        return _circuit_breaker
+
+
+def _reset_circuit_breaker() -> None:
+    global _circuit_breaker
+
+    with _circuit_breaker_lock:
+        _circuit_breaker = None
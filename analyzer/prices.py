@@ -0,0 +1,54 @@
+"""Fixed-point price representation.
+
+Prices are kept as int64 counts of ten-thousandths of a dollar (ticks),
+so that all arithmetic on them is exact and can be done by NumPy instead
+of going through per-cell Decimal objects.
+"""
+
+from .lazy import LazyModule
+
+# Imported on first use, see 'analyzer.lazy'
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+
+
+PRICE_DECIMALS = 4
+PRICE_SCALE = 10 ** PRICE_DECIMALS
+
+PRICE_COLUMNS = ["Open", "Close/Last", "High", "Low"]
+
+
+def to_price_ticks(values: "pd.Series") -> "pd.Series":
+    """Convert dollar amounts ($xx.yy) to int64 ticks.
+    Raises ValueError if a value is missing, is not a dollar amount,
+    or has more than PRICE_DECIMALS decimals.
+    """
+
+    if values.isna().any():
+        raise ValueError(f"Missing value in column '{values.name}'")
+
+    if not pd.api.types.is_numeric_dtype(values):
+        try:
+            # Fast path for the Nasdaq format, e.g. '$132.03'
+            values = pd.to_numeric(values.str.lstrip("$"))
+        except ValueError:
+            values = pd.to_numeric(values.str.replace(r"[^\d.]", "", regex=True))
+
+        # Values without any digits are parsed to NaN from empty strings
+        if values.isna().any():
+            raise ValueError(f"Value in column '{values.name}' is not a dollar amount")
+
+    scaled = values.to_numpy(dtype=np.float64) * PRICE_SCALE
+    ticks = np.rint(scaled)
+
+    # A float parsed from a decimal string is off by far less than this from the exact value,
+    # while an additional decimal would leave at least a tenth of a tick.
+    if (np.abs(scaled - ticks) > 1e-3).any():
+        raise ValueError(f"Prices in column '{values.name}' have more than {PRICE_DECIMALS} decimals")
+
+    return pd.Series(ticks.astype(np.int64), index=values.index, name=values.name)
+
+
+def to_dollars(ticks: "pd.Series") -> "pd.Series":
+    """Convert int64 ticks back to dollars for display."""
+    return ticks / PRICE_SCALE
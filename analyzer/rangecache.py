@@ -0,0 +1,151 @@
+"""Per-symbol cache of formatted stock histories, serving date ranges by slicing a cached wider range.
+
+Users typically search a stock for a range and then for shorter ranges within it,
+e.g. 1Y, then 6M and then 1M with the buttons of 'SearchForm'. The cache keeps the
+widest range loaded for each symbol, answers ranges within it by slicing, and loads
+only the edges of ranges extending past it, extending the cached range with them.
+
+Only final daily bars, up to the 'final_until' date given when loading, are cached.
+A cached range is only used for the version of the history it was loaded for.
+"""
+
+import datetime
+import threading
+
+from collections import OrderedDict
+from typing import Callable, List, NamedTuple, Optional
+
+from . import utils
+from .lazy import LazyModule
+
+# Imported on first use, see 'analyzer.lazy'
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+
+
+__all__ = [
+    "RangeCache",
+]
+
+ONE_DAY = datetime.timedelta(days=1)
+
+# Loads formatted stock history of a symbol from start to end date, both included
+Loader = Callable[[str, "datetime.date", "datetime.date"], "pd.DataFrame"]
+
+
+class CachedRange(NamedTuple):
+    start_date: "datetime.date"
+    end_date: "datetime.date"
+    data: "pd.DataFrame"
+    version: int = 0
+
+
+class RangeCache:
+    """Least recently used formatted stock histories of at most 'max_symbols' symbols, one range per symbol.
+    Cached histories are never modified, histories returned from the cache are copies.
+    """
+
+    def __init__(self, max_symbols: int):
+        self.max_symbols = max_symbols
+        self._ranges: "OrderedDict[str, CachedRange]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ranges)
+
+    def get(self, symbol: str) -> Optional["CachedRange"]:
+        """Cached range of the symbol, if any."""
+
+        with self._lock:
+            cached = self._ranges.get(symbol)
+            if cached is not None:
+                self._ranges.move_to_end(symbol)
+            return cached
+
+    def put(self, symbol: str, start_date: "datetime.date", end_date: "datetime.date", data: "pd.DataFrame",
+            version: int = 0) -> None:
+        """Cache the history of the symbol from start to end date, replacing its cached range."""
+
+        if self.max_symbols <= 0:
+            return
+
+        with self._lock:
+            self._ranges[symbol] = CachedRange(start_date, end_date, data, version)
+            self._ranges.move_to_end(symbol)
+
+            while len(self._ranges) > self.max_symbols:
+                self._ranges.popitem(last=False)
+
+    def discard(self, symbol: str, start_date: "datetime.date", end_date: "datetime.date") -> None:
+        """Forget the cached range of the symbol, if it overlaps the range from start to end date."""
+
+        with self._lock:
+            cached = self._ranges.get(symbol)
+            if cached is not None and start_date <= cached.end_date and end_date >= cached.start_date:
+                del self._ranges[symbol]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ranges.clear()
+
+    def history(self, symbol: str, start_date: "datetime.date", end_date: "datetime.date", load: Loader,
+                final_until: "datetime.date", version: int = 0) -> "pd.DataFrame":
+        """Formatted stock history of the symbol from start to end date, both included.
+        Dates not in the cached range are loaded with 'load', and the cached range is extended
+        with those up to 'final_until' (included), or replaced if they don't overlap it.
+        A cached range of another version of the history is replaced.
+        """
+
+        cached = self.get(symbol)
+        if cached is not None and cached.version != version:
+            cached = None
+
+        # Dates next to the cached range extend it as well as overlapping dates do
+        if cached is None or start_date > cached.end_date + ONE_DAY or end_date < cached.start_date - ONE_DAY:
+            data = load(symbol, start_date, end_date)
+
+            cache_end = min(end_date, final_until)
+            if start_date <= cache_end and (cached is None or _days(start_date, cache_end) > _days(*cached[:2])):
+                self.put(symbol, start_date, cache_end, _concat([_between(data, start_date, cache_end)]), version)
+
+            return data
+
+        before = load(symbol, start_date, cached.start_date - ONE_DAY) if start_date < cached.start_date else None
+        after = load(symbol, cached.end_date + ONE_DAY, end_date) if end_date > cached.end_date else None
+        middle = _between(cached.data, max(start_date, cached.start_date), min(end_date, cached.end_date))
+
+        if before is not None or (after is not None and cached.end_date < final_until):
+            cache_end = min(max(end_date, cached.end_date), final_until)
+            extended = _concat([before, cached.data, _between(after, cached.end_date + ONE_DAY, cache_end)])
+            self.put(symbol, min(start_date, cached.start_date), cache_end, extended, version)
+
+        return _concat([before, middle, after])
+
+
+def _days(start_date: "datetime.date", end_date: "datetime.date") -> int:
+    return (end_date - start_date).days + 1
+
+
+def _between(data: Optional["pd.DataFrame"], start_date: "datetime.date", end_date: "datetime.date") \
+        -> Optional["pd.DataFrame"]:
+    # Rows from start to end date of history in ascending date order, a view of the data
+    if data is None:
+        return None
+
+    dates = utils.stock_dates(data)
+    start, end = np.searchsorted(dates, [np.datetime64(start_date), np.datetime64(end_date + ONE_DAY)])
+    return data.iloc[start:end]
+
+
+def _concat(parts: List[Optional["pd.DataFrame"]]) -> "pd.DataFrame":
+    parts = [part for part in parts if part is not None and not part.empty] or \
+            [next(part for part in parts if part is not None).iloc[:0]]
+
+    data = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0].reset_index(drop=True)
+
+    # Some volumes are missing in a part, but not necessarily in the rows served from it
+    volume = data["Volume"]
+    if volume.dtype.kind == "f" and not volume.isna().any():
+        data["Volume"] = volume.astype(np.int64)
+
+    return data
@@ -0,0 +1,75 @@
+"""Fast JSON serialization for analysis results.
+
+Uses orjson if it is installed, which serializes NumPy arrays directly.
+Otherwise falls back to the standard library json module.
+"""
+
+import json
+
+from typing import Iterable
+
+from .lazy import LazyModule
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# Imported on first use, see 'analyzer.lazy'
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+
+
+# Parts of an analysis (see 'IndexView.analyze_stock_data') that can be selected for serialization
+ANALYSIS_FIELDS = ["longest_bullish", "history_by_volume", "best_opening_price"]
+
+
+def analysis_json(analysis: dict, fields: Iterable[str] = None, limit: int = None) -> dict:
+    """Selected fields of an analysis (default: all) with tables as columnar arrays
+    of at most 'limit' rows. The moving average used is always included.
+    """
+
+    if fields is None:
+        fields = ANALYSIS_FIELDS
+
+    result = {"moving_average": analysis["moving_average"]}
+
+    for field in fields:
+        value = analysis[field]
+        if isinstance(value, pd.DataFrame):
+            value = columnar(value.head(limit) if limit is not None else value)
+        result[field] = value
+
+    return result
+
+
+def columnar(table: "pd.DataFrame") -> dict:
+    """Table as column names and an array of values for each column, instead of a list of rows."""
+
+    return {
+        "columns": list(table.columns),
+        "data": {column: _column_values(table[column]) for column in table.columns},
+    }
+
+
+def dumps(data) -> bytes:
+    """Serialize to JSON. NaN values are serialized as null."""
+
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY)
+
+    return json.dumps(data, default=_default, allow_nan=False).encode()
+
+
+def _column_values(values: "pd.Series"):
+    # orjson serializes numeric arrays without going through python objects
+    if orjson is not None and values.dtype.kind in "iuf":
+        return np.ascontiguousarray(values.to_numpy())
+
+    return values.astype(object).where(values.notna(), None).tolist()
+
+
+def _default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,191 @@
+"""Coalesce concurrent identical calls, e.g. fetches of the same stock history.
+
+'SingleFlight' runs a call once for all callers in this process that ask for
+the same key at the same time, and gives them all the same result (or error).
+'across_processes' does the same for processes sharing a cache, by holding a
+lock in the cache while calling, and passing the result through the cache to
+the processes that waited for the call. It is not a cache of results: calls
+made after the call has finished are made again.
+Results are shared, so they should not be modified in place.
+"""
+
+import asyncio
+import threading
+import time
+import uuid
+
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+
+__all__ = [
+    "SingleFlight",
+    "across_processes",
+    "across_processes_async",
+]
+
+# Seconds between checks for a result from another process
+POLL_INTERVAL = 0.05
+
+# Seconds a result is kept in the shared cache for the processes waiting for it. Results are stored
+# under the lock token of the call, which only the waiting processes know, so no later call gets it.
+RESULT_TIMEOUT = 5
+
+LOCK_PREFIX = "singleflight:lock:"
+RESULT_PREFIX = "singleflight:result:"
+
+
+class SingleFlight:
+    """Process local coalescing of calls with the same key, for threads and coroutines alike."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, "Future"] = {}
+        self._lock = threading.Lock()
+
+    def call(self, key: Hashable, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Call 'func', or wait for the result of the call already in flight for the key."""
+
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as error:
+            self._finish(key, future, error=error)
+            raise
+
+        self._finish(key, future, result=result)
+        return result
+
+    async def call_async(self, key: Hashable, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Like 'call', for coroutine functions. Calls can be shared between event loops and threads."""
+
+        future, leader = self._join(key)
+        if not leader:
+            # Shielded, so that a cancelled waiter does not cancel the call for the others
+            return await asyncio.shield(asyncio.wrap_future(future))
+
+        try:
+            result = await func(*args, **kwargs)
+        except BaseException as error:
+            self._finish(key, future, error=error)
+            raise
+
+        self._finish(key, future, result=result)
+        return result
+
+    def _join(self, key: Hashable) -> Tuple["Future", bool]:
+        # Future for the call of the key, and whether the caller should make the call
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+
+            future = self._calls[key] = Future()
+            return future, True
+
+    def _finish(self, key: Hashable, future: "Future", result: Any = None, error: BaseException = None) -> None:
+        with self._lock:
+            del self._calls[key]
+
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+
+def across_processes(key: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Call 'func' in only one of the processes sharing the 'FETCH_COALESCE_CACHE' cache
+    at a time for the key, the others get its result from the cache when it is done.
+    If the call fails, one of the waiting processes makes it instead.
+    Without 'FETCH_COALESCE_CACHE', just calls 'func'.
+    """
+
+    shared = _shared_cache()
+    if shared is None:
+        return func(*args, **kwargs)
+
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + settings.FETCH_COALESCE_TIMEOUT
+    # Token of the call waited for
+    holder = None
+
+    while True:
+        result = shared.get(_result_key(key, holder)) if holder is not None else None
+        if result is not None:
+            return result
+
+        if shared.add(LOCK_PREFIX + key, token, settings.FETCH_COALESCE_TIMEOUT):
+            break
+
+        holder = shared.get(LOCK_PREFIX + key) or holder
+
+        # The lock holder has most likely died, don't wait for it forever
+        if time.monotonic() > deadline:
+            return func(*args, **kwargs)
+
+        time.sleep(POLL_INTERVAL)
+
+    try:
+        result = func(*args, **kwargs)
+        shared.set(_result_key(key, token), result, RESULT_TIMEOUT)
+        return result
+    finally:
+        _release(shared, key, token)
+
+
+async def across_processes_async(key: str, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+    """Like 'across_processes', for coroutine functions."""
+
+    shared = _shared_cache()
+    if shared is None:
+        return await func(*args, **kwargs)
+
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + settings.FETCH_COALESCE_TIMEOUT
+    holder = None
+
+    # Cache backends may block on the network
+    add = sync_to_async(shared.add, thread_sensitive=False)
+    get = sync_to_async(shared.get, thread_sensitive=False)
+
+    while True:
+        result = await get(_result_key(key, holder)) if holder is not None else None
+        if result is not None:
+            return result
+
+        if await add(LOCK_PREFIX + key, token, settings.FETCH_COALESCE_TIMEOUT):
+            break
+
+        holder = await get(LOCK_PREFIX + key) or holder
+
+        if time.monotonic() > deadline:
+            return await func(*args, **kwargs)
+
+        await asyncio.sleep(POLL_INTERVAL)
+
+    try:
+        result = await func(*args, **kwargs)
+        await sync_to_async(shared.set, thread_sensitive=False)(_result_key(key, token), result, RESULT_TIMEOUT)
+        return result
+    finally:
+        await sync_to_async(_release, thread_sensitive=False)(shared, key, token)
+
+
+def _shared_cache():
+    alias: Optional[str] = settings.FETCH_COALESCE_CACHE
+    return caches[alias] if alias is not None else None
+
+
+def _result_key(key: str, token: str) -> str:
+    return f"{RESULT_PREFIX}{key}:{token}"
+
+
+def _release(shared, key: str, token: str) -> None:
+    # Only if the lock was not timed out and taken by another process meanwhile
+    if shared.get(LOCK_PREFIX + key) == token:
+        shared.delete(LOCK_PREFIX + key)
@@ -72,8 +72,45 @@ document.querySelector("#csv-upload").ondragleave = function () {
     return false
 }
 
+let append_table_rows = function (target, url, offset) {
+    // The url can have the search query of the analysis
+    url = new URL(url, window.location.href)
+    url.searchParams.set("offset", offset)
+
+    fetch(url)
+        .then(response => response.json()).then(function (result) {
+            if (result.error !== undefined) {
+                alert_box.innerHTML = result.error
+                setTimeout(() => { alert_box.remove() }, 3000)
+                document.querySelector(target).appendChild(alert_box)
+                return
+            }
+
+            let tbody = document.querySelector(target + " tbody")
+            result.data.forEach((row, i) => {
+                let tr = document.createElement("tr")
+                let th = document.createElement("th")
+                th.scope = "row"
+                th.textContent = result.offset + i
+                tr.appendChild(th)
+
+                row.forEach(value => {
+                    let td = document.createElement("td")
+                    td.textContent = value === null ? "nan" : value
+                    tr.appendChild(td)
+                })
+                tbody.appendChild(tr)
+            })
+        });
+}
+
 document.querySelectorAll("button[data-toggle='expand-table']").forEach(btn => {
     btn.onclick = function () {
+        // Only the first rows are rendered with the page, load the rest
+        if (btn.dataset.url !== undefined) {
+            append_table_rows(btn.dataset.target, btn.dataset.url, btn.dataset.offset)
+        }
+
         document.querySelector(btn.dataset.target).style.maxHeight = "initial"
         document.querySelector(btn.dataset.target + " .fader").remove()
         document.querySelector(btn.dataset.target + " .btn-expand").remove()
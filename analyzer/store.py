@@ -0,0 +1,288 @@
+"""Local store for fetched stock histories.
+
+Daily bars of past days never change, so they are kept in the database and
+only the date ranges that have not been fetched before are requested from
+the Nasdaq API. Recently loaded histories are also kept in memory, so that
+searches within them don't load them again, see 'history_cache'.
+
+Imported histories (see 'import_stock_history') replace stored daily bars, so each
+import bumps the version of the stock history (see 'history_version'). Histories
+and analyses cached from the store are keyed on it, also in other processes.
+"""
+
+import asyncio
+import datetime
+import threading
+
+from typing import List, Optional, Tuple
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction, IntegrityError
+from django.db.models import F
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from . import models
+from . import rangecache
+from . import timing
+from . import utils
+from .lazy import LazyModule
+
+# Imported on first use, see 'analyzer.lazy'
+pd = LazyModule("pandas")
+
+
+# Formatted stock data column -> DailyBar field
+COLUMNS = {
+    "Date": "date",
+    "Close/Last": "close",
+    "Volume": "volume",
+    "Open": "open",
+    "High": "high",
+    "Low": "low",
+}
+
+ONE_DAY = datetime.timedelta(days=1)
+
+# Most days between consecutive trading days of a complete history, e.g. from a Friday to
+# the Tuesday after a holiday. Imported histories with longer gaps are missing trading days.
+MAX_TRADING_DAY_GAP = 4
+
+
+def stock_history(stock_symbol: str, start_date: "datetime.date", end_date: datetime.date = None,
+                  compact: bool = False) -> "pd.DataFrame":
+    """Get formatted stock history like 'utils.fetch_stock_history', but serve the already fetched
+    parts of the date range from the local store and only fetch the missing date ranges.
+    With 'compact', the history is in the compact representation (see 'utils.compact_stock_data').
+    """
+
+    symbol = stock_symbol.upper()
+    today = utils.market_today()
+
+    if end_date is None or end_date > today:
+        end_date = today
+
+    for gap_start, gap_end in missing_ranges(symbol, start_date, end_date):
+        try:
+            data = utils.fetch_stock_history(symbol, gap_start, gap_end)
+        except utils.NoStockDataError:
+            data = None  # e.g. a weekend, or dates before the stock was listed
+
+        save_stock_history(symbol, data, gap_start, gap_end)
+
+    with timing.stage("store"):
+        data = _load_stock_history(symbol, start_date, end_date, compact)
+
+    if data.empty:
+        raise utils.NoStockDataError(_(f"No stock data for stock '{stock_symbol}'."))
+
+    return data
+
+
+async def stock_history_async(stock_symbol: str, start_date: "datetime.date",
+                              end_date: datetime.date = None, compact: bool = False) -> "pd.DataFrame":
+    """Like 'stock_history', but fetches the missing date ranges concurrently without blocking the event loop."""
+
+    symbol = stock_symbol.upper()
+    today = utils.market_today()
+
+    if end_date is None or end_date > today:
+        end_date = today
+
+    # The database is only used synchronously, from a single thread
+    gaps = await sync_to_async(missing_ranges)(symbol, start_date, end_date)
+    fetched = await asyncio.gather(*(_fetch_gap_async(symbol, gap_start, gap_end) for gap_start, gap_end in gaps))
+
+    for (gap_start, gap_end), data in zip(gaps, fetched):
+        await sync_to_async(save_stock_history)(symbol, data, gap_start, gap_end)
+
+    with timing.stage("store"):
+        data = await sync_to_async(_load_stock_history)(symbol, start_date, end_date, compact)
+
+    if data.empty:
+        raise utils.NoStockDataError(_(f"No stock data for stock '{stock_symbol}'."))
+
+    return data
+
+
+async def _fetch_gap_async(symbol: str, gap_start: "datetime.date", gap_end: "datetime.date") \
+        -> Optional["pd.DataFrame"]:
+    try:
+        return await utils.fetch_stock_history_async(symbol, gap_start, gap_end)
+    except utils.NoStockDataError:
+        return None
+
+
+def missing_ranges(symbol: str, start_date: "datetime.date", end_date: "datetime.date") \
+        -> List[Tuple["datetime.date", "datetime.date"]]:
+    """Date ranges (both ends included) between start and end date that have not been fetched yet."""
+
+    fetched_ranges = models.FetchedRange.objects.filter(
+        symbol=symbol,
+        start_date__lte=end_date,
+        end_date__gte=start_date,
+    ).order_by("start_date")
+
+    gaps = []
+    current = start_date
+
+    for fetched in fetched_ranges:
+        if fetched.start_date > current:
+            gaps.append((current, fetched.start_date - ONE_DAY))
+        current = max(current, fetched.end_date + ONE_DAY)
+
+    if current <= end_date:
+        gaps.append((current, end_date))
+
+    return gaps
+
+
+def save_stock_history(symbol: str, data: Optional["pd.DataFrame"], start_date: "datetime.date",
+                       end_date: "datetime.date") -> None:
+    """Replace the stored daily bars between start and end date with the given formatted stock data,
+    and mark the range as fetched. Today in New York (see 'utils.market_today') is never marked as fetched,
+    since its bar can still change.
+    """
+
+    bars = []
+    if data is not None:
+        dates = data["Date"].dt.date
+        bars = _daily_bars(symbol, data[(dates >= start_date) & (dates <= end_date)])
+
+    try:
+        _replace_daily_bars(symbol, bars, start_date, end_date)
+    # A concurrent request stored the same range first
+    except IntegrityError:
+        pass
+
+
+def import_stock_history(symbol: str, data: "pd.DataFrame") -> None:
+    """Replace the stored daily bars of the dates of imported formatted stock data, in ascending date order.
+    Only runs of consecutive trading days are marked as fetched (see 'MAX_TRADING_DAY_GAP'), so that
+    days missing from the data are still fetched from the Nasdaq API. Bumps the version of the history.
+    Raises IntegrityError e.g. if the data has repeated dates, and then stores nothing.
+    """
+
+    dates = data["Date"].dt.date.tolist()
+    bars = _daily_bars(symbol, data)
+
+    with transaction.atomic():
+        run_start = 0
+        for index in range(1, len(dates) + 1):
+            if index == len(dates) or (dates[index] - dates[index - 1]).days > MAX_TRADING_DAY_GAP:
+                _replace_daily_bars(symbol, bars[run_start:index], dates[run_start], dates[index - 1])
+                run_start = index
+
+        version, _created = models.HistoryVersion.objects.get_or_create(symbol=symbol)
+        models.HistoryVersion.objects.filter(pk=version.pk).update(
+            generation=F("generation") + 1, modified=timezone.now()
+        )
+
+
+def history_version(stock_symbol: str) -> "models.HistoryVersion":
+    """Version of the stored history of a stock, generation 0 if it has never been imported."""
+
+    symbol = stock_symbol.strip().upper()
+    version = models.HistoryVersion.objects.filter(symbol=symbol).first()
+    return version if version is not None else models.HistoryVersion(symbol=symbol)
+
+
+def load_stock_history(symbol: str, start_date: "datetime.date", end_date: "datetime.date",
+                       compact: bool = False) -> "pd.DataFrame":
+    """Load stored daily bars as formatted stock data (see 'utils.format_stock_data'),
+    in the compact representation if 'compact' (see 'utils.compact_stock_data').
+    """
+
+    rows = models.DailyBar.objects.filter(
+        symbol=symbol,
+        date__range=(start_date, end_date),
+    ).order_by("date").values_list(*COLUMNS.values())
+
+    data = pd.DataFrame.from_records(rows, columns=list(COLUMNS))
+    data["Date"] = pd.to_datetime(data["Date"])
+    data["Volume"] = pd.to_numeric(data["Volume"])
+
+    return utils.compact_stock_data(data) if compact else data
+
+
+_history_cache: Optional["rangecache.RangeCache"] = None
+_history_cache_lock = threading.Lock()
+
+
+def history_cache() -> "rangecache.RangeCache":
+    """Cache of loaded stock histories, shared by all threads, see 'analyzer.rangecache'."""
+
+    global _history_cache
+
+    with _history_cache_lock:
+        if _history_cache is None:
+            _history_cache = rangecache.RangeCache(max_symbols=settings.HISTORY_CACHE_SYMBOLS)
+
+        return _history_cache
+
+
+def _reset_history_cache() -> None:
+    global _history_cache
+
+    with _history_cache_lock:
+        _history_cache = None
+
+
+def _load_stock_history(symbol: str, start_date: "datetime.date", end_date: "datetime.date",
+                        compact: bool) -> "pd.DataFrame":
+    # Stored daily bars before today in New York are final, since they are never fetched again
+    final_until = utils.market_today() - ONE_DAY
+    version = history_version(symbol).generation
+    data = history_cache().history(symbol, start_date, end_date, load_stock_history, final_until, version)
+
+    return utils.compact_stock_data(data) if compact else data
+
+
+def _daily_bars(symbol: str, data: "pd.DataFrame") -> List["models.DailyBar"]:
+    return [
+        models.DailyBar(symbol=symbol, date=date, close=close, volume=volume, open=opening, high=high, low=low)
+        for date, close, volume, opening, high, low in zip(
+            data["Date"].dt.date,
+            data["Close/Last"].tolist(),
+            [None if pd.isna(volume) else int(volume) for volume in data["Volume"]],
+            data["Open"].tolist(),
+            data["High"].tolist(),
+            data["Low"].tolist(),
+        )
+    ]
+
+
+def _replace_daily_bars(symbol: str, bars: List["models.DailyBar"], start_date: "datetime.date",
+                        end_date: "datetime.date") -> None:
+    # Today in New York is never marked as fetched, since its bar can still change
+    fetched_until = min(end_date, utils.market_today() - ONE_DAY)
+
+    with transaction.atomic():
+        models.DailyBar.objects.filter(symbol=symbol, date__range=(start_date, end_date)).delete()
+        models.DailyBar.objects.bulk_create(bars)
+
+        if start_date <= fetched_until:
+            models.FetchedRange.objects.create(symbol=symbol, start_date=start_date, end_date=fetched_until)
+            _merge_fetched_ranges(symbol)
+
+    # Cached histories only have fetched dates, which are not fetched again, so this only
+    # drops histories when their bars are replaced on import. Other processes drop theirs
+    # when the version of the history is bumped, see 'import_stock_history'.
+    history_cache().discard(symbol, start_date, end_date)
+
+
+def _merge_fetched_ranges(symbol: str) -> None:
+    """Combine overlapping and adjacent fetched ranges of a stock into one."""
+
+    fetched_ranges = list(models.FetchedRange.objects.filter(symbol=symbol).order_by("start_date"))
+
+    merged = []
+    for fetched in fetched_ranges:
+        if merged and fetched.start_date <= merged[-1].end_date + ONE_DAY:
+            merged[-1].end_date = max(merged[-1].end_date, fetched.end_date)
+        else:
+            merged.append(models.FetchedRange(symbol=symbol, start_date=fetched.start_date, end_date=fetched.end_date))
+
+    if len(merged) != len(fetched_ranges):
+        models.FetchedRange.objects.filter(symbol=symbol).delete()
+        models.FetchedRange.objects.bulk_create(merged)
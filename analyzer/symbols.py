@@ -0,0 +1,57 @@
+"""Stock symbol index for the autocomplete of the search form."""
+
+import json
+import os
+import threading
+
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import List, Optional
+
+
+STOCK_SYMBOLS_FILE = Path(__file__).resolve().parent / "static" / "analyzer" / "json" / "stocks.json"
+
+
+class SymbolIndex:
+    """Sorted stock symbols from a JSON list for bisect-based prefix lookups.
+    The file is read again if it has been modified since the last load.
+    """
+
+    def __init__(self, path: "Path"):
+        self.path = path
+        self._symbols: List[str] = []
+        self._modified: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        """Load the symbols, unless they are up to date with the file."""
+
+        modified = os.stat(self.path).st_mtime_ns
+        if modified == self._modified:
+            return
+
+        with self._lock:
+            if modified == self._modified:
+                return  # loaded by another thread
+
+            with open(self.path, "r") as f:
+                symbols = sorted(json.load(f))
+
+            self._symbols, self._modified = symbols, modified
+
+    def startswith(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        """Symbols starting with the given prefix in alphabetical order, at most 'limit' of them."""
+
+        self.load()
+        symbols = self._symbols
+
+        start = bisect_left(symbols, prefix)
+        end = bisect_right(symbols, prefix + chr(0x10FFFF), lo=start)
+
+        if limit is not None:
+            end = min(end, start + limit)
+
+        return symbols[start:end]
+
+
+stock_symbols = SymbolIndex(STOCK_SYMBOLS_FILE)
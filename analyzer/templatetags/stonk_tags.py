@@ -1,18 +1,42 @@
 """Create your template tags here."""
 
-import pandas as pd
 from django import template
+from django.conf import settings
+from django.urls import reverse
+
+from ..lazy import LazyModule
+
+# Imported on first use, see 'analyzer.lazy'
+pd = LazyModule("pandas")
 
 register = template.Library()
 
 
-@register.inclusion_tag("analyzer/snippets/stock_data_table.html")
-def pandas_table(table: "pd.DataFrame", title: str, table_id: str):
+@register.inclusion_tag("analyzer/snippets/stock_data_table.html", takes_context=True)
+def pandas_table(context, table: "pd.DataFrame", title: str, table_id: str, name: str = None):
+    """Render a table. If the table is part of a cached analysis (context has 'analysis_id'),
+    and its name in the analysis is given, only the first page of rows is rendered,
+    and the rest are loaded on demand. Rows are loaded with the search query of the
+    analysis (context has 'analysis_query'), so that it can be analyzed again if needed.
+    """
+
+    rows_url = None
+    analysis_id = context.get("analysis_id")
+
+    if analysis_id is not None and name is not None:
+        rows_url = reverse("analyzer:analysis_table", args=[analysis_id, name])
+        if context.get("analysis_query"):
+            rows_url += "?" + context["analysis_query"]
+        table_page = table.head(settings.ANALYSIS_TABLE_PAGE_SIZE)
+    else:
+        table_page = table
+
     return {
-        "table": table.to_dict("split"),
+        "table": table_page.to_dict("split"),
         "title": title,
         "table_id": table_id,
-        "rows": len(table.index)
+        "rows": len(table.index),
+        "rows_url": rows_url,
     }
 
 
@@ -0,0 +1,170 @@
+"""Per-stage timing of requests.
+
+Stages are timed with 'stage', and the timings of a request are sent in its
+Server-Timing header by 'server_timing_middleware'. Timings are also aggregated
+to per-stage histograms for percentiles (see 'snapshot'). Stages outside of
+a timed request, or when the 'STAGE_TIMING' setting is off, are not timed.
+"""
+
+import asyncio
+import bisect
+import threading
+import time
+
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Dict, Optional, Sequence
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.decorators import sync_and_async_middleware
+
+
+# Seconds spent in each stage of the current request
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+
+_not_timed = nullcontext()
+
+
+class _Stage:
+    __slots__ = ("name", "timings", "start")
+
+    def __init__(self, name: str, timings: Dict[str, float]):
+        self.name = name
+        self.timings = timings
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.timings[self.name] = self.timings.get(self.name, 0.0) + time.perf_counter() - self.start
+
+
+def stage(name: str):
+    """Context manager timing a stage of the current request. Repeated stages are summed."""
+
+    timings = _timings.get()
+    if timings is None:
+        return _not_timed
+    return _Stage(name, timings)
+
+
+class Histogram:
+    """Counts of durations in exponentially growing buckets, for estimating percentiles
+    with bounded memory. Estimates are the upper bounds of buckets, so at most ~10 % high.
+    """
+
+    # Bucket upper bounds in seconds: 10 µs to ~170 s, each 10 % larger than the previous
+    BOUNDS = [1e-5 * 1.1 ** i for i in range(176)]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        index = bisect.bisect_left(self.BOUNDS, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Estimate for the q:th percentile (0-100) in seconds. None if there are no durations."""
+
+        with self._lock:
+            if self.count == 0:
+                return None
+
+            rank = q / 100 * self.count
+            cumulative = 0
+            for index, count in enumerate(self.counts):
+                cumulative += count
+                if cumulative >= rank and count:
+                    return self.BOUNDS[min(index, len(self.BOUNDS) - 1)]
+
+
+_histograms: Dict[str, Histogram] = {}
+_histograms_lock = threading.Lock()
+
+
+def record(name: str, seconds: float) -> None:
+    """Add a duration of a stage to its histogram."""
+
+    histogram = _histograms.get(name)
+    if histogram is None:
+        with _histograms_lock:
+            histogram = _histograms.setdefault(name, Histogram())
+    histogram.add(seconds)
+
+
+def snapshot(percentiles: Sequence[float] = (50, 95, 99)) -> Dict[str, dict]:
+    """Count, mean and percentiles in milliseconds of each stage timed by this process."""
+
+    return {
+        name: {
+            "count": histogram.count,
+            "mean": histogram.total / histogram.count * 1000,
+            **{f"p{q}": histogram.percentile(q) * 1000 for q in percentiles},
+        }
+        for name, histogram in sorted(_histograms.items())
+        if histogram.count
+    }
+
+
+def reset() -> None:
+    """Forget all recorded durations."""
+
+    with _histograms_lock:
+        _histograms.clear()
+
+
+@sync_and_async_middleware
+def server_timing_middleware(get_response):
+    """Time requests and their stages, and add the timings to the Server-Timing response header.
+    Not used at all when the 'STAGE_TIMING' setting is off.
+    """
+
+    if not settings.STAGE_TIMING:
+        raise MiddlewareNotUsed
+
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            timings = {}
+            token = _timings.set(timings)
+            start = time.perf_counter()
+
+            try:
+                response = await get_response(request)
+            finally:
+                _timings.reset(token)
+
+            return _add_server_timing(response, timings, start)
+
+    else:
+        def middleware(request):
+            timings = {}
+            token = _timings.set(timings)
+            start = time.perf_counter()
+
+            try:
+                response = get_response(request)
+            finally:
+                _timings.reset(token)
+
+            return _add_server_timing(response, timings, start)
+
+    return middleware
+
+
+def _add_server_timing(response, timings: Dict[str, float], start: float):
+    timings["total"] = time.perf_counter() - start
+
+    for name, seconds in timings.items():
+        record(name, seconds)
+
+    response["Server-Timing"] = ", ".join(
+        f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items()
+    )
+
+    return response
@@ -0,0 +1 @@
+"""Unit tests for the analyzer app. These do not need a browser, unlike the functional tests."""
@@ -0,0 +1,89 @@
+"""Test the analysis registry here."""
+
+from unittest import mock
+from django.test import SimpleTestCase
+
+from analyzer import analyses
+from analyzer import utils
+from .test_utils import HISTORICAL_QUOTES
+
+
+class TestAnalyses(SimpleTestCase):
+    """Test running analyses with shared intermediates."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.data = utils.stock_data_from_csv(HISTORICAL_QUOTES)
+
+    def test_same_as_utils(self):
+        result = analyses.run(self.data, dateformat="%d.%m.%Y", moving_average="EMA20")
+
+        self.assertEqual(list(result), ["longest_bullish", "history_by_volume", "best_opening_price"])
+        self.assertEqual(result["longest_bullish"], utils.longest_bullish_streak(self.data))
+        self.assertTrue(result["history_by_volume"].equals(
+            utils.history_by_volume_and_price_delta(self.data, "%d.%m.%Y")
+        ))
+        self.assertTrue(result["best_opening_price"].equals(
+            utils.best_opening_price_compared_to_moving_average(self.data, "%d.%m.%Y", "EMA20")
+        ))
+
+    def test_limit(self):
+        full = analyses.run(self.data, dateformat=None, moving_average="SMA5")
+
+        with mock.patch.object(utils, "_volume_and_price_change_order", wraps=utils._volume_and_price_change_order) \
+                as order:
+            result = analyses.run(self.data, dateformat=None, moving_average="SMA5", limit=10)
+
+        self.assertEqual(order.call_args.args[-1], 10)
+        self.assertTrue(result["history_by_volume"].equals(full["history_by_volume"].head(10)))
+
+    def test_limit_formats_selected_dates(self):
+        full = analyses.run(self.data, ["history_by_volume"], dateformat="%d.%m.%Y")
+
+        with mock.patch.object(utils, "format_dates", wraps=utils.format_dates) as format_dates:
+            result = analyses.run(self.data, ["history_by_volume"], dateformat="%d.%m.%Y", limit=10)
+
+        self.assertEqual([len(call.args[0]) for call in format_dates.call_args_list], [10])
+        self.assertTrue(result["history_by_volume"].equals(full["history_by_volume"].head(10)))
+
+    def test_intermediates_computed_once(self):
+        with mock.patch.object(utils, "format_dates", wraps=utils.format_dates) as format_dates:
+            analyses.run(self.data, dateformat="%d.%m.%Y", moving_average="SMA5")
+
+        format_dates.assert_called_once()
+
+    def test_register(self):
+        self.addCleanup(analyses.ANALYSES.pop, "volume_total")
+
+        @analyses.analysis("volume_total", requires=["volume"])
+        def volume_total(volume):
+            return int(volume.sum())
+
+        result = analyses.run(self.data, ["volume_total"])
+
+        self.assertEqual(result, {"volume_total": int(self.data["Volume"].sum())})
+
+    def test_read_only(self):
+        self.addCleanup(analyses.ANALYSES.pop, "change_data")
+
+        @analyses.analysis("change_data", requires=["close"])
+        def change_data(close):
+            close[0] = 0
+
+        with self.assertRaises(ValueError):
+            analyses.run(self.data, ["change_data"])
+
+        self.assertNotEqual(self.data["Close/Last"][0], 0)
+
+    def test_unknown_intermediate(self):
+        with self.assertRaises(KeyError):
+            analyses.Intermediates(self.data)["nope"]
+
+    def test_default_options(self):
+        result = analyses.run(self.data)
+
+        self.assertTrue(result["best_opening_price"].equals(
+            utils.best_opening_price_compared_to_moving_average(self.data, None, utils.DEFAULT_MOVING_AVERAGE)
+        ))
+        self.assertTrue(result["history_by_volume"].equals(utils.history_by_volume_and_price_delta(self.data)))
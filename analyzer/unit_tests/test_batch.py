@@ -0,0 +1,76 @@
+"""Test analyzing many stocks at once here."""
+
+import datetime
+from unittest import mock
+from django.test import TransactionTestCase, override_settings
+
+from analyzer import batch
+from analyzer.benchmarks.standin import NasdaqStandIn
+from .testcases import StoreTestMixin
+from .test_utils import HISTORICAL_QUOTES
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"], BATCH_FETCH_WORKERS=2, BATCH_ANALYSIS_WORKERS=2)
+class TestBatchAnalysis(StoreTestMixin, TransactionTestCase):
+    """Test batch analysis with per stock errors."""
+
+    def setUp(self):
+        super().setUp()
+        self.server = NasdaqStandIn(body=HISTORICAL_QUOTES.read_text())
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+
+        self.empty_server = NasdaqStandIn(body="")
+        self.empty_server.__enter__()
+        self.addCleanup(self.empty_server.__exit__, None, None, None)
+
+    def url(self, stock_symbol, start_date, end_date):
+        server = self.empty_server if stock_symbol == "NOPE" else self.server
+        return server.url(stock_symbol, start_date, end_date)
+
+    def test_analyze_stocks(self):
+        with self.settings(NASDAQ_HISTORICAL_API_URL=self.url):
+            results = batch.analyze_stocks(
+                ["AAPL", "NOPE", "MSFT"],
+                start_date=datetime.date(2020, 3, 1),
+                end_date=datetime.date(2020, 12, 31),
+                language="en",
+            )
+
+        self.assertEqual(list(results), ["AAPL", "NOPE", "MSFT"])
+        self.assertEqual(results["AAPL"]["longest_bullish"], 8)
+        self.assertEqual(results["MSFT"]["longest_bullish"], 8)
+        self.assertEqual(list(results["AAPL"]["history_by_volume"].columns), ["Date", "Volume", "Price Change (%)"])
+        self.assertIn("error", results["NOPE"])
+
+    def test_unexpected_fetch_error(self):
+        stock_history = batch.store.stock_history
+
+        def fail_for_nope(stock_symbol, *args, **kwargs):
+            if stock_symbol == "NOPE":
+                raise ValueError("Unexpected")
+            return stock_history(stock_symbol, *args, **kwargs)
+
+        with self.settings(NASDAQ_HISTORICAL_API_URL=self.url), \
+                mock.patch.object(batch.store, "stock_history", side_effect=fail_for_nope):
+            results = batch.analyze_stocks(["NOPE", "AAPL"], start_date=datetime.date(2020, 3, 1))
+
+        self.assertEqual(results["NOPE"], {"error": "Unexpected"})
+        self.assertEqual(results["AAPL"]["longest_bullish"], 8)
+
+    def test_batch_api(self):
+        with self.settings(NASDAQ_HISTORICAL_API_URL=self.url):
+            response = self.client.get("/api/batch/", {
+                "stock_symbols": "aapl, NOPE,AAPL",
+                "start_date": "2020-03-01",
+                "end_date": "2020-12-31",
+                "fields": "longest_bullish",
+            })
+
+        results = response.json()["results"]
+        self.assertEqual(results["AAPL"], {"moving_average": "SMA5", "longest_bullish": 8})
+        self.assertEqual(list(results["NOPE"]), ["error"])
+
+    def test_batch_api_invalid(self):
+        response = self.client.get("/api/batch/", {"stock_symbols": " , ", "start_date": "2020-03-01"})
+        self.assertEqual(response.status_code, 400)
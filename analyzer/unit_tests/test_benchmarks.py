@@ -0,0 +1,73 @@
+"""Test the benchmark suite here, so that it keeps working as the pipeline changes."""
+
+import io
+from django.test import SimpleTestCase
+
+from analyzer import utils
+from analyzer.benchmarks import data, memory, startup, suite
+
+
+class TestBenchmarkSuite(SimpleTestCase):
+    """Test synthetic data and comparing results to baselines."""
+
+    def test_synthetic_history(self):
+        history = utils.stock_data_from_csv(io.StringIO(data.synthetic_history_csv(500)))
+
+        self.assertEqual(len(history.index), 500)
+        self.assertTrue(history["Date"].is_monotonic_increasing)
+        self.assertTrue((history["Low"] <= history["High"]).all())
+
+    def test_run(self):
+        results = suite.run(sizes=[100], repeat=1)
+
+        self.assertIn("index_view", results)
+        self.assertTrue(all(list(timings) == ["100"] for timings in results.values()))
+
+    def test_compare(self):
+        baselines = {"format_stock_data": {"1000": 1.0, "10000": 2.0}}
+        results = {"format_stock_data": {"1000": 1.2, "10000": 2.6, "100000": 9.0}}
+
+        regressions = suite.compare(results, baselines, threshold=0.25)
+
+        self.assertEqual(regressions, [suite.Regression("format_stock_data", 10000, 2.6, 2.0)])
+
+
+class TestMemoryProfile(SimpleTestCase):
+    """Test the memory use report of the pipeline stages."""
+
+    def test_memory_profile(self):
+        stages = {stage.stage: stage for stage in memory.memory_profile(1000)}
+
+        self.assertEqual(list(stages), [
+            "parse", "format", "compact", "longest_bullish", "history_by_volume", "best_opening_price", "render",
+        ])
+        self.assertTrue(all(stage.peak_bytes > 0 for stage in stages.values()))
+        self.assertLess(stages["compact"].retained_bytes, stages["format"].retained_bytes)
+
+    def test_without_compact(self):
+        stages = [stage.stage for stage in memory.memory_profile(100, compact=False)]
+        self.assertNotIn("compact", stages)
+
+
+class TestStartup(SimpleTestCase):
+    """Test that heavy dependencies are not imported when the app starts."""
+
+    def test_heavy_modules_not_imported(self):
+        times, total = startup.startup_import_times()
+        imported = {time.module for time in times}
+
+        self.assertIn("analyzer.views", imported)
+        self.assertEqual([module for module in startup.HEAVY_MODULES if module in imported], [])
+        self.assertGreater(total, 0)
+
+    def test_parse_import_times(self):
+        output = (
+            "import time: self [us] | cumulative | imported package\n"
+            "import time:       466 |      36260 |     numpy.__config__\n"
+            "import time:      2057 |      72302 |   numpy\n"
+        )
+
+        self.assertEqual(startup.parse_import_times(output), [
+            startup.ImportTime("numpy.__config__", 0.000466, 0.03626, 2),
+            startup.ImportTime("numpy", 0.002057, 0.072302, 1),
+        ])
@@ -0,0 +1,199 @@
+"""Test importing many stock history files at once here."""
+
+import datetime
+import io
+import shutil
+import tempfile
+import zipfile
+import pandas as pd
+
+from pathlib import Path
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.utils import translation
+
+from analyzer import bulk_import
+from analyzer import models
+from analyzer import store
+from analyzer import utils
+from .testcases import StoreTestMixin
+from .test_utils import HISTORICAL_QUOTES
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"], BATCH_ANALYSIS_WORKERS=2)
+class TestBulkImport(StoreTestMixin, TestCase):
+    """Test importing files to the store with per file errors."""
+
+    def setUp(self):
+        super().setUp()
+
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+
+        shutil.copy(HISTORICAL_QUOTES, self.directory / "aapl.csv")
+        shutil.copy(HISTORICAL_QUOTES, self.directory / "MSFT.csv")
+        (self.directory / "BAD.csv").write_text("Date, Close/Last, Volume, Open, High, Low\n01/20/2021, x, 1, 1, 1, 1\n")
+        (self.directory / "EMPTY.csv").write_text("Date, Close/Last, Volume, Open, High, Low\n")
+        (self.directory / "notes.txt").write_text("Not imported")
+
+    def assertStored(self, symbol):
+        data = store.load_stock_history(symbol, datetime.date(2020, 1, 1), datetime.date(2021, 1, 31))
+        self.assertEqual(len(data.index), 253)
+
+    def test_import_directory(self):
+        results = bulk_import.import_directory(self.directory)
+
+        self.assertEqual([(result.name, result.symbol, result.rows) for result in results], [
+            ("BAD.csv", "BAD", 0), ("EMPTY.csv", "EMPTY", 0), ("MSFT.csv", "MSFT", 253), ("aapl.csv", "AAPL", 253),
+        ])
+        self.assertEqual([result.error is None for result in results], [False, False, True, True])
+        self.assertTrue(all(result.parse_seconds > 0 for result in results))
+        self.assertGreater(results[-1].store_seconds, 0)
+
+        self.assertStored("AAPL")
+        self.assertStored("MSFT")
+        self.assertEqual(
+            list(models.FetchedRange.objects.filter(symbol="AAPL").values_list("start_date", "end_date")),
+            [(datetime.date(2020, 1, 21), datetime.date(2021, 1, 20))],
+        )
+
+    def test_missing_days_not_fetched(self):
+        """Days missing from a file are left to be fetched from the Nasdaq API."""
+
+        lines = HISTORICAL_QUOTES.read_text().splitlines(keepends=True)
+        (self.directory / "AAPL.csv").write_text("".join(line for line in lines if not line.startswith("06/")))
+
+        bulk_import.import_directory(self.directory, pattern="AAPL.csv")
+
+        self.assertEqual(store.missing_ranges("AAPL", datetime.date(2020, 1, 21), datetime.date(2021, 1, 20)), [
+            (datetime.date(2020, 5, 30), datetime.date(2020, 6, 30)),
+        ])
+
+    def test_history_version(self):
+        self.assertEqual(store.history_version("AAPL").generation, 0)
+
+        bulk_import.import_directory(self.directory, pattern="aapl.csv")
+        bulk_import.import_directory(self.directory, pattern="aapl.csv")
+
+        version = store.history_version("aapl")
+        self.assertEqual(version.generation, 2)
+        self.assertIsNotNone(version.modified)
+        self.assertEqual(store.history_version("MSFT").generation, 0)
+
+    def test_repeated_dates(self):
+        lines = HISTORICAL_QUOTES.read_text().splitlines(keepends=True)
+        (self.directory / "AAPL.csv").write_text("".join(lines[:3] + lines[2:4]))
+
+        with translation.override("en"):
+            results = bulk_import.import_directory(self.directory, pattern="AAPL.csv")
+
+        self.assertEqual((results[0].rows, results[0].error), (0, "File has more than one row for the same date."))
+        self.assertFalse(models.DailyBar.objects.exists())
+
+    def test_too_long_symbol(self):
+        shutil.copy(HISTORICAL_QUOTES, self.directory / "historicalquotes.csv")
+
+        with translation.override("en"):
+            results = bulk_import.import_directory(self.directory, pattern="[ah]*.csv")
+
+        self.assertEqual([(result.symbol, result.error) for result in results], [
+            ("AAPL", None), ("HISTORICALQUOTES", "Stock symbols can be at most 10 characters long."),
+        ])
+        self.assertFalse(models.DailyBar.objects.filter(symbol="HISTORICALQUOTES").exists())
+
+    def test_store_error(self):
+        def fail_for_msft(symbol, data):
+            if symbol == "MSFT":
+                raise IntegrityError("UNIQUE constraint failed")
+            return import_stock_history(symbol, data)
+
+        import_stock_history = store.import_stock_history
+        with mock.patch.object(store, "import_stock_history", side_effect=fail_for_msft):
+            results = bulk_import.import_directory(self.directory, pattern="[aM]*.csv")
+
+        self.assertEqual([(result.symbol, result.error) for result in results], [
+            ("MSFT", "UNIQUE constraint failed"), ("AAPL", None),
+        ])
+        self.assertStored("AAPL")
+
+    def test_store_raises_on_repeated_dates(self):
+        data = utils.stock_data_from_csv(HISTORICAL_QUOTES)
+
+        with self.assertRaises(IntegrityError):
+            store.import_stock_history("AAPL", pd.concat([data.head(2), data.head(2)]).sort_values("Date"))
+
+        self.assertFalse(models.DailyBar.objects.exists())
+        self.assertFalse(models.FetchedRange.objects.exists())
+        self.assertEqual(store.history_version("AAPL").generation, 0)
+
+    def test_dedicated_workers(self):
+        results = bulk_import.import_directory(self.directory, pattern="MSFT.csv", workers=1)
+
+        self.assertEqual([(result.symbol, result.rows, result.error) for result in results], [("MSFT", 253, None)])
+
+    def test_replaces_cached_history(self):
+        store.history_cache().put("AAPL", datetime.date(2020, 6, 1), datetime.date(2020, 6, 30), None)
+
+        bulk_import.import_directory(self.directory, pattern="aapl.csv")
+
+        self.assertIsNone(store.history_cache().get("AAPL"))
+
+    def test_import_zip(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as file:
+            file.write(HISTORICAL_QUOTES, "dump/AAPL.csv")
+            file.write(HISTORICAL_QUOTES, "__MACOSX/dump/._AAPL.csv")
+            file.writestr("dump/README", "Not imported")
+        archive.seek(0)
+
+        results = bulk_import.import_zip(archive)
+
+        self.assertEqual([(result.name, result.symbol, result.rows) for result in results], [("dump/AAPL.csv", "AAPL", 253)])
+        self.assertStored("AAPL")
+
+    def test_invalid_zip(self):
+        with self.assertRaises(ValueError):
+            bulk_import.import_zip(io.BytesIO(b"Not a zip archive"))
+
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as file:
+            file.writestr("AAPL.csv", "")
+            file.writestr("MSFT.csv", "")
+
+        with self.settings(BULK_IMPORT_MAX_FILES=1), self.assertRaises(ValueError):
+            bulk_import.import_zip(archive)
+
+    def test_api(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as file:
+            file.write(HISTORICAL_QUOTES, "AAPL.csv")
+
+        def post():
+            return self.client.post("/api/import/", {"file": SimpleUploadedFile("dump.zip", archive.getvalue())})
+
+        self.assertEqual(post().status_code, 403)
+        self.client.force_login(User.objects.create_user("user"))
+        self.assertEqual(post().status_code, 403)
+        self.assertFalse(models.DailyBar.objects.exists())
+
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+        response = post()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["rows"], 253)
+        self.assertEqual(self.client.post("/api/import/").status_code, 400)
+        self.assertEqual(self.client.get("/api/import/").status_code, 405)
+
+    def test_command(self):
+        output = io.StringIO()
+
+        with self.assertRaises(CommandError):
+            call_command("import_histories", str(self.directory), stdout=output, stderr=io.StringIO())
+
+        self.assertIn("Imported 2 of 4 files.", output.getvalue())
+
+        call_command("import_histories", str(self.directory), pattern="[Aa]*.csv", stdout=output)
@@ -0,0 +1,66 @@
+"""Test the analysis result cache here."""
+
+import datetime
+from unittest import mock
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+
+from analyzer import cache
+from analyzer import utils
+from analyzer.views import IndexView
+from .test_utils import HISTORICAL_QUOTES
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class TestAnalysisCache(SimpleTestCase):
+    """Test caching analysis results."""
+
+    def setUp(self):
+        caches["analysis"].clear()
+
+    def test_search_key(self):
+        """Search key is normalized, and missing end date is today."""
+
+        today = utils.market_today()
+        start_date = today - datetime.timedelta(days=30)
+
+        self.assertEqual(cache.search_key(" aapl", start_date), cache.search_key("AAPL", start_date, today))
+        self.assertNotEqual(cache.search_key("AAPL", start_date), cache.search_key("MSFT", start_date))
+
+    def test_file_key(self):
+        """Files with the same contents have the same key, and can still be read afterwards."""
+
+        file = SimpleUploadedFile("a.csv", b"Date, Close/Last")
+        key = cache.file_key(file)
+
+        self.assertEqual(key, cache.file_key(SimpleUploadedFile("b.csv", b"Date, Close/Last")))
+        self.assertNotEqual(key, cache.file_key(SimpleUploadedFile("a.csv", b"Date, Volume")))
+        self.assertEqual(file.read(), b"Date, Close/Last")
+
+    def test_search_timeout(self):
+        today = datetime.date.today()
+
+        with self.settings(ANALYSIS_CACHE_TIMEOUT_HISTORICAL=100, ANALYSIS_CACHE_TIMEOUT_CURRENT=10):
+            self.assertEqual(cache.search_timeout(today - datetime.timedelta(days=2)), 100)
+            self.assertEqual(cache.search_timeout(today), 10)
+            self.assertEqual(cache.search_timeout(None), 10)
+
+    def test_historical(self):
+        """Days are historical once they have ended in New York, hours after they have ended here."""
+
+        with mock.patch.object(utils, "market_today", return_value=datetime.date(2021, 1, 5)):
+            self.assertTrue(cache.is_historical(datetime.date(2021, 1, 4)))
+            self.assertFalse(cache.is_historical(datetime.date(2021, 1, 5)))
+            self.assertFalse(cache.is_historical(None))
+
+    def test_upload_analyzed_once(self):
+        """Same CSV uploaded twice is analyzed only once."""
+
+        with mock.patch.object(IndexView, "analyze_stock_data", wraps=IndexView.analyze_stock_data) as analyze:
+            for _ in range(2):
+                file = SimpleUploadedFile("HistoricalQuotes.csv", HISTORICAL_QUOTES.read_bytes())
+                response = self.client.post("/", {"file": file})
+                self.assertContains(response, "id_longest_bullish")
+
+        self.assertEqual(analyze.call_count, 1)
@@ -0,0 +1,83 @@
+"""Test the columnar binary stock history files here."""
+
+import io
+import stat
+import tempfile
+import numpy as np
+from pathlib import Path
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from analyzer import columnar
+from analyzer import utils
+from .test_utils import HISTORICAL_QUOTES
+
+
+class TestColumnarHistory(SimpleTestCase):
+    """Test writing and memory mapping stock history files."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "AAPL.stonks"
+        self.data = utils.stock_data_from_csv(HISTORICAL_QUOTES)
+
+    def test_round_trip(self):
+        columnar.write_history(self.path, self.data)
+        history = columnar.read_history(self.path)
+
+        self.assertEqual(len(history), 253)
+        self.assertTrue(history.to_frame().equals(self.data))
+
+    def test_file_mode(self):
+        """History files get the mode of other new files, not that of the temporary file."""
+
+        other = self.path.with_name("other")
+        other.touch()
+        columnar.write_history(self.path, self.data)
+
+        self.assertEqual(stat.S_IMODE(self.path.stat().st_mode), stat.S_IMODE(other.stat().st_mode))
+
+    def test_missing_volume(self):
+        data = self.data.astype({"Volume": np.float64})
+        data.loc[3, "Volume"] = np.nan
+
+        columnar.write_history(self.path, data)
+        history = columnar.read_history(self.path)
+
+        self.assertEqual(history.volume[3], columnar.MISSING_VOLUME)
+        self.assertTrue(history.to_frame().equals(data))
+
+    def test_zero_copy(self):
+        columnar.write_history(self.path, self.data)
+        history = columnar.read_history(self.path)
+        intermediates = history.intermediates()
+
+        for column in ("close", "open", "high", "low", "volume"):
+            self.assertIsInstance(intermediates[column].base, np.memmap)
+            self.assertFalse(intermediates[column].flags.writeable)
+
+    def test_analyze(self):
+        columnar.write_history(self.path, self.data)
+        history = columnar.read_history(self.path)
+
+        result = history.analyze(dateformat="%d.%m.%Y", moving_average="SMA20")
+
+        self.assertEqual(result["longest_bullish"], utils.longest_bullish_streak(self.data))
+        self.assertTrue(result["history_by_volume"].equals(
+            utils.history_by_volume_and_price_delta(self.data, "%d.%m.%Y")
+        ))
+        self.assertTrue(result["best_opening_price"].equals(
+            utils.best_opening_price_compared_to_moving_average(self.data, "%d.%m.%Y", "SMA20")
+        ))
+
+    def test_not_a_history_file(self):
+        self.path.write_bytes(b"Date, Close/Last, Volume, Open, High, Low\n")
+
+        with self.assertRaises(ValueError):
+            columnar.read_history(self.path)
+
+    def test_export_command(self):
+        call_command("export_history", str(self.path), csv=str(HISTORICAL_QUOTES), stdout=io.StringIO())
+
+        self.assertTrue(columnar.read_history(self.path).to_frame().equals(self.data))
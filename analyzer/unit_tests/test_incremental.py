@@ -0,0 +1,105 @@
+"""Test the incrementally updated analyses here."""
+
+import io
+
+import numpy as np
+
+from django.test import SimpleTestCase
+
+from analyzer import incremental
+from analyzer import utils
+from analyzer.benchmarks.data import synthetic_history_csv
+from analyzer.views import IndexView
+from .test_utils import HISTORICAL_QUOTES
+
+
+class TestIncrementalAnalysis(SimpleTestCase):
+    """Test that incremental analyses match the batch analyses."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.data = utils.stock_data_from_csv(HISTORICAL_QUOTES)
+
+        # Many equal price changes and volumes, and some missing volumes
+        cls.synthetic = utils.stock_data_from_csv(io.StringIO(synthetic_history_csv(2000, seed=5)))
+        cls.synthetic["Volume"] = (cls.synthetic["Volume"] // 10 ** 6 * 10 ** 6).astype(np.float64)
+        cls.synthetic.loc[::97, "Volume"] = np.nan
+
+    def assertSameAsBatch(self, data, moving_average, dateformat=None):
+        analysis = incremental.IncrementalAnalysis(moving_average)
+        analysis.extend(data)
+
+        result = analysis.result(dateformat)
+        expected = IndexView.analyze_stock_data(data, dateformat=dateformat, moving_average=moving_average)
+
+        self.assertEqual(result["longest_bullish"], expected["longest_bullish"])
+        self.assertTrue(result["history_by_volume"].equals(expected["history_by_volume"]))
+        self.assertTrue(result["best_opening_price"].equals(expected["best_opening_price"]))
+
+    def test_same_as_batch(self):
+        for moving_average in ("SMA5", "SMA20", "SMA200"):
+            with self.subTest(moving_average=moving_average):
+                self.assertSameAsBatch(self.data, moving_average, "%d.%m.%Y")
+                self.assertSameAsBatch(self.synthetic, moving_average)
+
+    def test_updated_after_restore(self):
+        analysis = incremental.IncrementalAnalysis("SMA20")
+        analysis.extend(self.data.iloc[:200])
+
+        analysis = incremental.loads(incremental.dumps(analysis))
+        for row in self.data.iloc[200:].itertuples(index=False):
+            analysis.append(*row)
+
+        expected = IndexView.analyze_stock_data(self.data, dateformat=None, moving_average="SMA20")
+
+        self.assertEqual(len(analysis), len(self.data))
+        self.assertTrue(analysis.result()["best_opening_price"].equals(expected["best_opening_price"]))
+        self.assertTrue(analysis.result()["history_by_volume"].equals(expected["history_by_volume"]))
+
+    def test_longest_bullish_streak(self):
+        for closes in ([], [5], [5, 4, 3], [1, 2, 3, 1, 2, 3], [3, 1, 2, 3, 4, 2, 3]):
+            streak = incremental.LongestBullishStreak()
+            for close in closes:
+                streak.append(close)
+
+            expected = utils.bullish_streaks([np.array(closes, dtype=np.int64)])
+
+            with self.subTest(closes=closes):
+                self.assertEqual(
+                    (streak.streak, streak.start, streak.end),
+                    (expected.streak[0], expected.start[0], expected.end[0]),
+                )
+
+    def test_volume_ranking_limit(self):
+        ranking = incremental.VolumeRanking()
+        for row in self.synthetic.itertuples(index=False):
+            ranking.append(row.Date, row.Volume, row.High, row.Low)
+
+        self.assertTrue(ranking.result("%Y-%m-%d", limit=7).equals(
+            utils.history_by_volume_and_price_delta(self.synthetic, "%Y-%m-%d", limit=7)
+        ))
+
+    def test_volume_ranking_read_between_appends(self):
+        """Same ranking when read after each appended day, also for bars with high below low."""
+
+        data = self.data.iloc[:40].copy()
+        data.loc[data.index[::3], ["High", "Low"]] = data.loc[data.index[::3], ["Low", "High"]].to_numpy()
+
+        ranking = incremental.VolumeRanking()
+        for end, row in enumerate(data.itertuples(index=False), start=1):
+            ranking.append(row.Date, row.Volume, row.High, row.Low)
+
+            with self.subTest(days=end):
+                self.assertTrue(ranking.result().equals(utils.history_by_volume_and_price_delta(data.iloc[:end])))
+
+    def test_dates_in_order(self):
+        analysis = incremental.IncrementalAnalysis()
+        analysis.extend(self.data.iloc[:10])
+
+        with self.assertRaises(ValueError):
+            analysis.append(*self.data.iloc[5])
+
+    def test_exponential_moving_average(self):
+        with self.assertRaises(ValueError):
+            incremental.IncrementalAnalysis("EMA20")
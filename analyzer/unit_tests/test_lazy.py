@@ -0,0 +1,34 @@
+"""Test deferred imports here."""
+
+import importlib
+
+from unittest import mock
+from django.test import SimpleTestCase
+
+from analyzer.lazy import LazyModule
+
+
+class TestLazyModule(SimpleTestCase):
+    """Test importing a module on first attribute access."""
+
+    def test_imported_once(self):
+        module = LazyModule("json")
+
+        with mock.patch.object(importlib, "import_module", wraps=importlib.import_module) as import_module:
+            module.dumps
+            module.loads
+            module.dumps
+
+        import_module.assert_called_once_with("json")
+
+    def test_attribute_kept(self):
+        import json
+
+        module = LazyModule("json")
+
+        self.assertIs(module.dumps, json.dumps)
+        self.assertIs(vars(module)["dumps"], json.dumps)
+
+    def test_missing_attribute(self):
+        with self.assertRaises(AttributeError):
+            LazyModule("json").nope
@@ -0,0 +1,128 @@
+"""Test retries and the circuit breaker of Nasdaq API calls."""
+
+import asyncio
+import datetime
+import time
+
+from django.test import SimpleTestCase, override_settings
+
+from analyzer import nasdaq
+from analyzer import utils
+from analyzer.benchmarks.standin import NasdaqStandIn
+from .test_utils import HISTORICAL_QUOTES
+
+
+START_DATE = datetime.date(2020, 3, 1)
+END_DATE = datetime.date(2020, 12, 31)
+
+
+@override_settings(NASDAQ_RETRIES=2, NASDAQ_RETRY_BACKOFF=0, NASDAQ_CIRCUIT_FAILURES=2,
+                   NASDAQ_CIRCUIT_RESET_TIMEOUT=0.2)
+class TestNasdaq(SimpleTestCase):
+
+    def setUp(self):
+        # Created with the settings of the test
+        for reset in (nasdaq._reset_session, nasdaq._reset_circuit_breaker):
+            reset()
+            self.addCleanup(reset)
+
+    def fetch(self, server):
+        with self.settings(NASDAQ_HISTORICAL_API_URL=server.url):
+            return utils.fetch_stock_history("AAPL", START_DATE, END_DATE)
+
+    def test_retry(self):
+        with NasdaqStandIn(body=HISTORICAL_QUOTES.read_text(), failures=2) as server:
+            data = self.fetch(server)
+
+        self.assertEqual(len(server.requests), 3)
+        self.assertEqual(len(data.index), 253)
+
+    def test_retries_exhausted(self):
+        with NasdaqStandIn(body=HISTORICAL_QUOTES.read_text(), failures=3) as server:
+            with self.assertRaises(utils.FetchError):
+                self.fetch(server)
+
+        self.assertEqual(len(server.requests), 3)
+
+    def fetch_async(self, server):
+        with self.settings(NASDAQ_HISTORICAL_API_URL=server.url):
+            return asyncio.run(utils.fetch_stock_history_async("AAPL", START_DATE, END_DATE))
+
+    def test_retry_async(self):
+        with NasdaqStandIn(body=HISTORICAL_QUOTES.read_text(), failures=2) as server:
+            data = self.fetch_async(server)
+
+        self.assertEqual(len(server.requests), 3)
+        self.assertEqual(len(data.index), 253)
+
+    def test_retries_exhausted_async(self):
+        with NasdaqStandIn(body=HISTORICAL_QUOTES.read_text(), failures=3) as server:
+            with self.assertRaises(utils.FetchError):
+                self.fetch_async(server)
+
+        self.assertEqual(len(server.requests), 3)
+
+    def test_async_client_per_event_loop(self):
+        async def clients():
+            return nasdaq.async_client(), nasdaq.async_client()
+
+        first, second = asyncio.run(clients())
+        other, _other = asyncio.run(clients())
+
+        self.assertIs(first, second)
+        self.assertIsNot(first, other)
+
+    @override_settings(NASDAQ_RETRIES=0)
+    def test_circuit_breaker(self):
+        with NasdaqStandIn(body=HISTORICAL_QUOTES.read_text(), failures=2) as server:
+            for _ in range(2):
+                with self.assertRaises(utils.FetchError):
+                    self.fetch(server)
+
+            # Fails fast without calling the API
+            with self.assertRaises(utils.FetchError):
+                self.fetch(server)
+            self.assertEqual(len(server.requests), 2)
+
+            # Trial call after the reset timeout closes the circuit again
+            time.sleep(0.2)
+            self.fetch(server)
+            self.fetch(server)
+            self.assertEqual(len(server.requests), 4)
+
+    @override_settings(NASDAQ_RETRIES=0)
+    def test_trial_without_stock_data(self):
+        """Trial call answered without stock data closes the circuit, since the API responded."""
+
+        with NasdaqStandIn(body="", failures=2) as server:
+            for _ in range(2):
+                with self.assertRaises(utils.FetchError):
+                    self.fetch(server)
+
+            time.sleep(0.2)
+            with self.assertRaises(utils.NoStockDataError):
+                self.fetch(server)
+
+            self.assertFalse(nasdaq.circuit_breaker().is_open)
+
+
+class TestCircuitBreaker(SimpleTestCase):
+
+    def test_consecutive_failures(self):
+        breaker = nasdaq.CircuitBreaker(failures=2, reset_timeout=60)
+
+        breaker.failure()
+        breaker.success()
+        breaker.failure()
+        self.assertTrue(breaker.allow())
+
+        breaker.failure()
+        self.assertFalse(breaker.allow())
+
+    def test_failed_trial(self):
+        breaker = nasdaq.CircuitBreaker(failures=1, reset_timeout=0)
+        breaker.failure()
+
+        self.assertTrue(breaker.allow())
+        breaker.failure()
+        self.assertTrue(breaker.is_open)
@@ -0,0 +1,31 @@
+"""Test the fixed-point price representation here."""
+
+import pandas as pd
+from django.test import SimpleTestCase
+
+from analyzer import prices
+
+
+class TestPriceTicks(SimpleTestCase):
+    """Test conversion between dollar amounts and fixed-point ticks."""
+
+    def test_dollar_strings(self):
+        ticks = prices.to_price_ticks(pd.Series(["$132.03", "$126.938", "$127", "$130.2242"]))
+        self.assertEqual(ticks.dtype, "int64")
+        self.assertEqual(ticks.tolist(), [1320300, 1269380, 1270000, 1302242])
+
+    def test_thousands_separator(self):
+        ticks = prices.to_price_ticks(pd.Series(["$1,234.5", "$2.25"]))
+        self.assertEqual(ticks.tolist(), [12345000, 22500])
+
+    def test_numeric(self):
+        ticks = prices.to_price_ticks(pd.Series([132.03, 0.0001]))
+        self.assertEqual(ticks.tolist(), [1320300, 1])
+
+    def test_invalid(self):
+        for values in (["$1.23456"], ["$1.2", None], ["abc"]):
+            with self.subTest(values=values), self.assertRaises(ValueError):
+                prices.to_price_ticks(pd.Series(values))
+
+    def test_to_dollars(self):
+        self.assertEqual(prices.to_dollars(pd.Series([1320300, 1])).tolist(), [132.03, 0.0001])
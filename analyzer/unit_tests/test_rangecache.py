@@ -0,0 +1,110 @@
+"""Test the range-aware stock history cache here."""
+
+import datetime
+
+import numpy as np
+
+from django.test import SimpleTestCase
+
+from analyzer import rangecache
+from analyzer import utils
+from .test_utils import HISTORICAL_QUOTES
+
+
+def date(month: int, day: int) -> "datetime.date":
+    return datetime.date(2020, month, day)
+
+
+class TestRangeCache(SimpleTestCase):
+    """Test serving ranges from a cached wider range."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.data = utils.stock_data_from_csv(HISTORICAL_QUOTES)
+
+    def setUp(self):
+        self.cache = rangecache.RangeCache(max_symbols=2)
+        self.loads = []
+
+    def load(self, symbol, start_date, end_date):
+        self.loads.append((symbol, start_date, end_date))
+        return self.expected(start_date, end_date)
+
+    def expected(self, start_date, end_date):
+        return self.data[self.data["Date"].between(str(start_date), str(end_date))].reset_index(drop=True)
+
+    def history(self, start_date, end_date, symbol="AAPL", final_until=date(12, 31)):
+        return self.cache.history(symbol, start_date, end_date, self.load, final_until)
+
+    def test_slice(self):
+        self.history(date(3, 1), date(10, 31))
+        data = self.history(date(6, 15), date(7, 15))
+
+        self.assertEqual(self.loads, [("AAPL", date(3, 1), date(10, 31))])
+        self.assertTrue(data.equals(self.expected(date(6, 15), date(7, 15))))
+
+    def test_extend(self):
+        self.history(date(6, 1), date(6, 30))
+        data = self.history(date(5, 1), date(7, 31))
+
+        self.assertEqual(self.loads[1:], [("AAPL", date(5, 1), date(5, 31)), ("AAPL", date(7, 1), date(7, 31))])
+        self.assertTrue(data.equals(self.expected(date(5, 1), date(7, 31))))
+
+        cached = self.cache.get("AAPL")
+        self.assertEqual((cached.start_date, cached.end_date), (date(5, 1), date(7, 31)))
+        self.assertTrue(cached.data.equals(data))
+
+    def test_final_until(self):
+        """Dates after 'final_until' are always loaded."""
+
+        self.history(date(6, 1), date(7, 31), final_until=date(6, 30))
+        data = self.history(date(6, 15), date(7, 15), final_until=date(6, 30))
+
+        self.assertEqual(self.loads[1:], [("AAPL", date(7, 1), date(7, 15))])
+        self.assertEqual(self.cache.get("AAPL").end_date, date(6, 30))
+        self.assertTrue(data.equals(self.expected(date(6, 15), date(7, 15))))
+
+    def test_widest_range_kept(self):
+        self.history(date(3, 1), date(5, 31))
+        self.history(date(9, 1), date(9, 30))
+        self.assertEqual(self.cache.get("AAPL").start_date, date(3, 1))
+
+        self.history(date(8, 1), date(12, 31))
+        self.assertEqual(self.cache.get("AAPL").start_date, date(8, 1))
+
+    def test_version(self):
+        """Cached range of another version of the history is replaced."""
+
+        self.cache.history("AAPL", date(3, 1), date(10, 31), self.load, date(12, 31), version=1)
+        self.cache.history("AAPL", date(6, 1), date(6, 30), self.load, date(12, 31), version=2)
+
+        self.assertEqual(len(self.loads), 2)
+        cached = self.cache.get("AAPL")
+        self.assertEqual((cached.start_date, cached.version), (date(6, 1), 2))
+
+    def test_least_recently_used(self):
+        for symbol in ("AAPL", "MSFT", "AAPL", "TSLA"):
+            self.history(date(6, 1), date(6, 30), symbol=symbol)
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self.cache.get("MSFT"))
+
+    def test_copies(self):
+        self.history(date(3, 1), date(10, 31))
+        data = self.history(date(6, 1), date(6, 30))
+
+        data.loc[:, "Close/Last"] = 0
+
+        self.assertTrue(self.history(date(6, 1), date(6, 30)).equals(self.expected(date(6, 1), date(6, 30))))
+
+    def test_missing_volume(self):
+        """Volumes are integers again in ranges without missing volumes."""
+
+        self.data = self.data.copy()
+        self.data.loc[self.data["Date"] == "2020-03-02", "Volume"] = np.nan
+
+        self.history(date(3, 1), date(10, 31))
+        data = self.history(date(6, 1), date(6, 30))
+
+        self.assertEqual(data["Volume"].dtype, np.int64)
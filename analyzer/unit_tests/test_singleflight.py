@@ -0,0 +1,124 @@
+"""Test coalescing of concurrent identical fetches."""
+
+import asyncio
+import datetime
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from analyzer import singleflight
+from analyzer import utils
+from analyzer.benchmarks.standin import NasdaqStandIn
+from .test_utils import HISTORICAL_QUOTES
+
+
+START_DATE = datetime.date(2020, 3, 1)
+END_DATE = datetime.date(2020, 12, 31)
+
+
+class TestSingleFlight(SimpleTestCase):
+
+    def setUp(self):
+        self.server = NasdaqStandIn(body=HISTORICAL_QUOTES.read_text(), delay=0.5)
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+
+    def test_threads(self):
+        with self.settings(NASDAQ_HISTORICAL_API_URL=self.server.url):
+            with ThreadPoolExecutor(max_workers=5) as pool:
+                futures = [pool.submit(utils.fetch_stock_history, "AAPL", START_DATE, END_DATE) for _ in range(5)]
+                results = [future.result() for future in futures]
+
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_coroutines(self):
+        async def fetch_all():
+            return await asyncio.gather(*(
+                utils.fetch_stock_history_async("AAPL", START_DATE, END_DATE) for _ in range(5)
+            ))
+
+        with self.settings(NASDAQ_HISTORICAL_API_URL=self.server.url):
+            results = asyncio.run(fetch_all())
+
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_different_fetches(self):
+        with self.settings(NASDAQ_HISTORICAL_API_URL=self.server.url):
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                list(pool.map(utils.fetch_stock_history, ["AAPL", "MSFT"], [START_DATE] * 2, [END_DATE] * 2))
+
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_shared_error(self):
+        flight = singleflight.SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def fail():
+            started.set()
+            release.wait()
+            raise utils.FetchError("Nasdaq API did not respond.")
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            leader = pool.submit(flight.call, "key", fail)
+            started.wait()
+            waiter = pool.submit(flight.call, "key", fail)
+            release.set()
+
+            for future in (leader, waiter):
+                with self.assertRaises(utils.FetchError):
+                    future.result()
+
+        # Not remembered after the call
+        self.assertEqual(flight.call("key", lambda: 1), 1)
+
+
+@override_settings(FETCH_COALESCE_CACHE="default", FETCH_COALESCE_TIMEOUT=5)
+class TestAcrossProcesses(SimpleTestCase):
+
+    def setUp(self):
+        caches["default"].clear()
+
+    @staticmethod
+    def finish(key, token, result):
+        # What the process holding the lock does when its call is done
+        shared = caches["default"]
+        shared.set(singleflight._result_key(key, token), result)
+        shared.delete(singleflight.LOCK_PREFIX + key)
+
+    def test_wait_for_other_process(self):
+        shared = caches["default"]
+        shared.add(singleflight.LOCK_PREFIX + "key", "other process")
+        threading.Timer(0.2, self.finish, ("key", "other process", "result")).start()
+
+        self.assertEqual(singleflight.across_processes("key", self.fail), "result")
+
+    def test_call_and_share(self):
+        shared = caches["default"]
+
+        self.assertEqual(singleflight.across_processes("key", lambda: "result"), "result")
+        self.assertIsNone(shared.get(singleflight.LOCK_PREFIX + "key"))
+
+        # The result is only for the processes that waited for the call, not a cache
+        self.assertEqual(singleflight.across_processes("key", lambda: "again"), "again")
+
+    def test_other_process_failed(self):
+        shared = caches["default"]
+        shared.add(singleflight.LOCK_PREFIX + "key", "other process")
+        threading.Timer(0.2, shared.delete, (singleflight.LOCK_PREFIX + "key",)).start()
+
+        self.assertEqual(singleflight.across_processes("key", lambda: "result"), "result")
+
+    def test_async(self):
+        shared = caches["default"]
+        shared.add(singleflight.LOCK_PREFIX + "key", "other process")
+        threading.Timer(0.2, self.finish, ("key", "other process", "result")).start()
+
+        async def call():
+            return await singleflight.across_processes_async("key", self.fail)
+
+        self.assertEqual(asyncio.run(call()), "result")
@@ -0,0 +1,91 @@
+"""Test the local stock history store here."""
+
+import datetime
+from unittest import mock
+from django.test import TestCase, override_settings
+
+from analyzer import models
+from analyzer import store
+from analyzer import utils
+from analyzer.benchmarks.standin import NasdaqStandIn
+from .testcases import StoreTestMixin
+from .test_utils import HISTORICAL_QUOTES
+
+
+class TestStockHistoryStore(StoreTestMixin, TestCase):
+    """Test serving stock history from the store and fetching only the missing ranges."""
+
+    def setUp(self):
+        super().setUp()
+        self.server = NasdaqStandIn(body=HISTORICAL_QUOTES.read_text())
+        self.server.__enter__()
+        self.settings = override_settings(NASDAQ_HISTORICAL_API_URL=self.server.url)
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        self.server.__exit__(None, None, None)
+
+    def test_fetch_once(self):
+        """Range fetched once is served from the store afterwards."""
+
+        start_date, end_date = datetime.date(2020, 6, 1), datetime.date(2020, 6, 30)
+        fetched = utils.fetch_stock_history("AAPL", start_date, end_date)
+
+        first = store.stock_history("aapl", start_date, end_date)
+        second = store.stock_history("AAPL", start_date, end_date)
+
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(len(first.index), 22)
+        self.assertTrue(first.equals(second))
+        self.assertTrue(first.equals(fetched[fetched["Date"].between("2020-06-01", "2020-06-30")].reset_index(drop=True)))
+
+    def test_fill_gaps(self):
+        """Only the dates before and after the stored range are fetched."""
+
+        fetched = utils.fetch_stock_history("AAPL", datetime.date(2020, 5, 1), datetime.date(2020, 7, 31))
+        fetched = fetched[fetched["Date"].between("2020-05-01", "2020-07-31")].reset_index(drop=True)
+
+        store.stock_history("AAPL", datetime.date(2020, 6, 1), datetime.date(2020, 6, 30))
+        data = store.stock_history("AAPL", datetime.date(2020, 5, 1), datetime.date(2020, 7, 31))
+
+        self.assertEqual(self.server.requests[2:], [
+            "/api/v1/historical/AAPL/stocks/2020-05-01/2020-05-31",
+            "/api/v1/historical/AAPL/stocks/2020-07-01/2020-07-31",
+        ])
+        self.assertTrue(data.equals(fetched))
+
+        fetched_ranges = models.FetchedRange.objects.values_list("start_date", "end_date")
+        self.assertEqual(list(fetched_ranges), [(datetime.date(2020, 5, 1), datetime.date(2020, 7, 31))])
+
+    def test_no_data(self):
+        """Range without any trading days is an error, but is not fetched again."""
+
+        for _ in range(2):
+            with self.assertRaises(utils.NoStockDataError):
+                store.stock_history("AAPL", datetime.date(2019, 1, 1), datetime.date(2019, 1, 31))
+
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_sub_range_from_memory(self):
+        """Range within a loaded range is not loaded from the store again."""
+
+        wide = store.stock_history("AAPL", datetime.date(2020, 3, 1), datetime.date(2020, 10, 31))
+
+        with mock.patch.object(store, "load_stock_history", wraps=store.load_stock_history) as load:
+            data = store.stock_history("AAPL", datetime.date(2020, 6, 1), datetime.date(2020, 6, 30))
+            compact = store.stock_history("AAPL", datetime.date(2020, 6, 1), datetime.date(2020, 6, 30), compact=True)
+
+        load.assert_not_called()
+        self.assertTrue(data.equals(wide[wide["Date"].between("2020-06-01", "2020-06-30")].reset_index(drop=True)))
+        self.assertTrue(compact.equals(utils.compact_stock_data(data)))
+
+    def test_today_in_new_york(self):
+        """The day that has not ended in New York yet is not stored as fetched, though it has ended here."""
+
+        with mock.patch.object(utils, "market_today", return_value=datetime.date(2020, 6, 30)):
+            store.stock_history("AAPL", datetime.date(2020, 6, 1), datetime.date(2020, 7, 1))
+
+        fetched_ranges = models.FetchedRange.objects.values_list("start_date", "end_date")
+        self.assertEqual(list(fetched_ranges), [(datetime.date(2020, 6, 1), datetime.date(2020, 6, 29))])
+        self.assertEqual(store.history_cache().get("AAPL").end_date, datetime.date(2020, 6, 29))
@@ -0,0 +1,42 @@
+"""Test the stock symbol index here."""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from django.test import SimpleTestCase
+
+from analyzer.symbols import SymbolIndex
+
+
+class TestSymbolIndex(SimpleTestCase):
+    """Test prefix lookups from the stock symbol index."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "stocks.json"
+        self.path.write_text(json.dumps(["AAPL", "A", "AMZN", "AA", "MSFT", "AAL"]))
+        self.index = SymbolIndex(self.path)
+
+    def test_startswith(self):
+        self.assertEqual(self.index.startswith("AA"), ["AA", "AAL", "AAPL"])
+        self.assertEqual(self.index.startswith("A", limit=2), ["A", "AA"])
+        self.assertEqual(self.index.startswith("B"), [])
+        self.assertEqual(len(self.index.startswith("")), 6)
+
+    def test_reload_on_change(self):
+        self.assertEqual(self.index.startswith("G"), [])
+
+        self.path.write_text(json.dumps(["GOOG", "GOOGL"]))
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+        self.assertEqual(self.index.startswith("G"), ["GOOG", "GOOGL"])
+
+    def test_filter_stocks_view(self):
+        response = self.client.get("/filter-stocks/", {"q": "aapl", "limit": "1"}, HTTP_HOST="localhost")
+        self.assertEqual(response.json(), ["AAPL"])
+
+        response = self.client.get("/filter-stocks/", {"q": "aap", "limit": "x"}, HTTP_HOST="localhost")
+        self.assertEqual(response.status_code, 400)
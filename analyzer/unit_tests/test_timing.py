@@ -0,0 +1,90 @@
+"""Test per-stage timing of requests."""
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from analyzer import timing
+from analyzer.benchmarks.standin import NasdaqStandIn
+from .testcases import StoreTestMixin
+from .test_utils import HISTORICAL_QUOTES
+
+
+def server_timing(response) -> dict:
+    entries = (entry.split(";dur=") for entry in response["Server-Timing"].split(", "))
+    return {name: float(duration) for name, duration in entries}
+
+
+class TestHistogram(SimpleTestCase):
+
+    def test_percentiles(self):
+        histogram = timing.Histogram()
+        for ms in range(1, 101):
+            histogram.add(ms / 1000)
+
+        # Estimates are at most one bucket (10 %) above the real values
+        for q in (50, 95, 99):
+            self.assertGreaterEqual(histogram.percentile(q), q / 1000)
+            self.assertLessEqual(histogram.percentile(q), q / 1000 * 1.1)
+
+    def test_empty(self):
+        self.assertIsNone(timing.Histogram().percentile(50))
+
+    def test_outside_request(self):
+        with timing.stage("parse"):
+            pass
+
+        self.assertIs(timing.stage("parse"), timing._not_timed)
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"], STAGE_TIMING=True)
+class TestServerTiming(StoreTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        caches["analysis"].clear()
+        timing.reset()
+
+    def test_file_stages(self):
+        file = SimpleUploadedFile("HistoricalQuotes.csv", HISTORICAL_QUOTES.read_bytes())
+        response = self.client.post("/", {"file": file})
+
+        stages = server_timing(response)
+        self.assertEqual(
+            sorted(stages),
+            ["best_opening_price", "history_by_volume", "longest_bullish", "parse", "render", "total"],
+        )
+        self.assertLessEqual(stages["parse"], stages["total"])
+
+    def test_search_stages(self):
+        search = {"stock_symbol": "AAPL", "start_date": "01.01.2020", "end_date": "31.12.2020"}
+
+        with NasdaqStandIn(body=HISTORICAL_QUOTES.read_text()) as server:
+            with self.settings(NASDAQ_HISTORICAL_API_URL=server.url):
+                response = self.client.get("/", search)
+
+        self.assertTrue({"nasdaq", "parse", "format", "store", "render"} <= set(server_timing(response)))
+
+    def test_metrics(self):
+        self.assertEqual(self.client.get("/metrics/").status_code, 403)
+
+        for _ in range(3):
+            self.client.get("/filter-stocks/", {"q": "AAPL"})
+
+        self.client.force_login(User.objects.create_user("staff", is_staff=True))
+        metrics = self.client.get("/metrics/").json()
+
+        # The requests before this one, including the one without staff access
+        self.assertEqual(metrics["total"]["count"], 4)
+        self.assertLessEqual(metrics["total"]["p50"], metrics["total"]["p99"])
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"], STAGE_TIMING=False)
+class TestServerTimingDisabled(SimpleTestCase):
+
+    def test_disabled(self):
+        response = self.client.get("/filter-stocks/", {"q": "AAPL"})
+
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(self.client.get("/metrics/").status_code, 404)
@@ -0,0 +1,236 @@
+"""Test your utility functions here."""
+
+import io
+import datetime
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from django.test import SimpleTestCase, override_settings
+
+from analyzer import utils
+from analyzer.benchmarks.standin import NasdaqStandIn
+
+
+HISTORICAL_QUOTES = Path(__file__).resolve().parent.parent / "functional_tests" / "HistoricalQuotes.csv"
+
+
+class TestFetchStockHistory(SimpleTestCase):
+    """Test fetching and parsing stock history from the (stand-in) Nasdaq API."""
+
+    def test_parse_response(self):
+        """Response body is parsed to a typed DataFrame in ascending date order."""
+
+        body = HISTORICAL_QUOTES.read_text()
+
+        with NasdaqStandIn(body=body) as server:
+            with override_settings(NASDAQ_HISTORICAL_API_URL=server.url):
+                data = utils.fetch_stock_history("AAPL", datetime.date(2020, 1, 21), datetime.date(2021, 1, 20))
+
+        self.assertEqual(server.requests, ["/api/v1/historical/AAPL/stocks/2020-01-21/2021-01-20"])
+        self.assertEqual(list(data.columns), ["Date", "Close/Last", "Volume", "Open", "High", "Low"])
+        self.assertEqual(len(data.index), 253)
+        self.assertTrue(data["Date"].is_monotonic_increasing)
+        self.assertEqual(data["Volume"].iloc[-1], 104319500)
+
+    def test_empty_response(self):
+        """Empty response body means that there is no data for the stock."""
+
+        with NasdaqStandIn(body="\n") as server:
+            with override_settings(NASDAQ_HISTORICAL_API_URL=server.url):
+                with self.assertRaises(utils.FetchError):
+                    utils.fetch_stock_history("NOPE", datetime.date(2020, 1, 21))
+
+
+class TestBullishStreaks(SimpleTestCase):
+    """Test the longest bullish streak kernel."""
+
+    def test_longest_bullish_streak(self):
+        data = utils.stock_data_from_csv(HISTORICAL_QUOTES)
+        self.assertEqual(utils.longest_bullish_streak(data), 8)
+
+    def test_ragged_batch(self):
+        closes = [
+            np.array([1, 2, 3, 1, 2]),
+            np.array([]),
+            np.array([3, 2, 1]),
+            np.array([5, 6, 1, 2, 3, 4, 0]),
+        ]
+        dates = [np.datetime64("2021-01-01") + np.arange(len(c)) for c in closes]
+
+        result = utils.bullish_streaks(closes, dates=dates)
+
+        self.assertEqual(result.streak.tolist(), [3, 0, 0, 4])
+        self.assertEqual(result.start.tolist(), [0, -1, -1, 2])
+        self.assertEqual(result.end.tolist(), [2, -1, -1, 5])
+        self.assertEqual(result.start_date[3], np.datetime64("2021-01-03"))
+        self.assertTrue(np.isnat(result.end_date[1]))
+
+    def test_padded_batch(self):
+        closes = np.array([
+            [1, 2, 3, 4, 0],
+            [4, 3, 5, 9, 9],
+        ])
+
+        result = utils.bullish_streaks(closes, lengths=[3, 5])
+
+        self.assertEqual(result.streak.tolist(), [3, 3])
+        self.assertEqual(result.start.tolist(), [0, 1])
+        self.assertEqual(result.end.tolist(), [2, 3])
+
+
+class TestMovingAverages(SimpleTestCase):
+    """Test the moving average engine and the opening price comparison."""
+
+    def test_moving_averages(self):
+        close = np.array([10, 20, 30, 40, 50, 60])
+
+        averages = utils.moving_averages(close, ["SMA2", "SMA5", "SMA7", "EMA3"])
+
+        np.testing.assert_array_equal(averages["SMA2"], [np.nan, 15, 25, 35, 45, 55])
+        np.testing.assert_array_equal(averages["SMA5"], [np.nan] * 4 + [30, 40])
+        self.assertTrue(np.isnan(averages["SMA7"]).all())
+        np.testing.assert_array_equal(averages["EMA3"], [np.nan, np.nan, 22.5, 31.25, 40.625, 50.3125])
+
+    def test_compact_prices_summed_as_int64(self):
+        """Sums of compact int32 price ticks don't overflow, regardless of the platform integer."""
+
+        close = np.full(5000, 2_000_000, dtype=np.int32)  # $200 for 5000 days
+
+        averages = utils.moving_averages(close, ["SMA200"])
+
+        self.assertEqual(utils._window_sums(close, [5])[5].dtype, np.int64)
+        np.testing.assert_array_equal(averages["SMA200"][199:], 2_000_000)
+
+    def test_unknown_moving_average(self):
+        with self.assertRaises(ValueError):
+            utils.moving_averages(np.array([1, 2, 3]), ["WMA5"])
+
+    def test_best_opening_price(self):
+        data = utils.stock_data_from_csv(HISTORICAL_QUOTES)
+
+        result = utils.best_opening_price_compared_to_moving_average(data, "%Y-%m-%d", "SMA5")
+
+        self.assertTrue(result.equals(utils.best_opening_price_compared_to_five_day_SMA(data, "%Y-%m-%d")))
+        self.assertEqual(result.iloc[0].tolist(), ["2020-04-07", 8.39])
+        self.assertEqual(result.iloc[:, 1].isna().sum(), 4)
+
+
+class TestHistoryByVolume(SimpleTestCase):
+    """Test ordering stock history by volume and price change."""
+
+    def test_order(self):
+        data = pd.DataFrame({
+            "Date": pd.date_range("2021-01-01", periods=5),
+            "Volume": [100, 300, 100, 300, 200],
+            "High": [50000, 20000, 40000, 20000, 10000],
+            "Low": [10000, 10000, 10000, 15000, 10000],
+        })
+
+        result = utils.history_by_volume_and_price_delta(data, "%Y-%m-%d")
+
+        self.assertEqual(result.iloc[:, 0].tolist(), ["2021-01-02", "2021-01-04", "2021-01-05", "2021-01-01", "2021-01-03"])
+        self.assertEqual(result.iloc[:, 2].tolist(), [1.0, 0.5, 0.0, 4.0, 3.0])
+
+    def test_top_rows(self):
+        data = utils.stock_data_from_csv(HISTORICAL_QUOTES)
+
+        full = utils.history_by_volume_and_price_delta(data)
+
+        for limit in (0, 1, 10, 253, 300):
+            with self.subTest(limit=limit):
+                top = utils.history_by_volume_and_price_delta(data, limit=limit)
+                self.assertTrue(top.equals(full.head(limit)))
+
+
+class TestStockDataFromCSV(SimpleTestCase):
+    """Test reading stock data from CSV files in chunks."""
+
+    def test_chunks(self):
+        """Result does not depend on the chunk size."""
+
+        data = utils.stock_data_from_csv(HISTORICAL_QUOTES)
+        chunked = utils.stock_data_from_csv(HISTORICAL_QUOTES, chunksize=10)
+
+        self.assertTrue(data.equals(chunked))
+        self.assertEqual(len(list(utils.iter_stock_data_from_csv(HISTORICAL_QUOTES, chunksize=100))), 3)
+
+    def test_date_order(self):
+        """Files newest first, oldest first or unordered give the same history in ascending date order."""
+
+        header, *rows = HISTORICAL_QUOTES.read_text().splitlines(keepends=True)
+        expected = utils.stock_data_from_csv(HISTORICAL_QUOTES, chunksize=10)
+
+        for order in (rows[::-1], rows[::2] + rows[1::2]):
+            data = utils.stock_data_from_csv(io.StringIO(header + "".join(order)), chunksize=10)
+
+            self.assertTrue(data.equals(expected))
+
+        self.assertTrue(expected["Date"].is_monotonic_increasing)
+        self.assertTrue(expected.index.equals(pd.RangeIndex(len(rows))))
+
+    def test_whitespace_and_extra_columns(self):
+        file = io.StringIO(
+            "Symbol, Date , Close/Last, Volume, Open, High, Low\n"
+            "AAPL, 01/20/2021 , $132.03 , 104319500, $128.66, $132.49, $128.55\n"
+        )
+
+        data = utils.stock_data_from_csv(file)
+
+        self.assertEqual(list(data.columns), utils.STOCK_DATA_COLUMNS)
+        self.assertEqual(data["Close/Last"].tolist(), [1320300])
+
+    def test_empty_file(self):
+        with self.assertRaises(utils.FetchError):
+            utils.stock_data_from_csv(io.StringIO(""))
+
+
+class TestCompactStockData(SimpleTestCase):
+    """Test the compact representation of stock data."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.data = utils.stock_data_from_csv(HISTORICAL_QUOTES)
+
+    def test_types(self):
+        compact = utils.compact_stock_data(self.data)
+
+        self.assertEqual(list(compact.columns), utils.STOCK_DATA_COLUMNS)
+        self.assertEqual(compact.dtypes.tolist(), [np.int32, np.int32, np.uint32, np.int32, np.int32, np.int32])
+        self.assertTrue(utils.is_compact(compact))
+        self.assertTrue((utils.stock_dates(compact) == self.data["Date"].to_numpy()).all())
+
+        # Half of the formatted data, and no index data
+        self.assertEqual(compact.memory_usage(index=False).sum(), 24 * len(self.data))
+        self.assertEqual(self.data.memory_usage(index=False).sum(), 48 * len(self.data))
+
+    def test_wide_types(self):
+        data = self.data.copy()
+        data.loc[0, "High"] = 2 ** 31
+        data.loc[1, "Volume"] = np.nan
+
+        compact = utils.compact_stock_data(data)
+
+        self.assertEqual(compact["High"].dtype, np.int64)
+        self.assertEqual(compact["Close/Last"].dtype, np.int64)
+        self.assertEqual(compact["Volume"].dtype, np.float64)
+
+    def test_same_analyses(self):
+        compact = utils.compact_stock_data(self.data)
+
+        self.assertEqual(utils.longest_bullish_streak(compact), utils.longest_bullish_streak(self.data))
+        self.assertTrue(utils.history_by_volume_and_price_delta(compact, "%d.%m.%Y").equals(
+            utils.history_by_volume_and_price_delta(self.data, "%d.%m.%Y")
+        ))
+        self.assertTrue(utils.history_by_volume_and_price_delta(compact).equals(
+            utils.history_by_volume_and_price_delta(self.data)
+        ))
+        for moving_average in ("SMA200", "EMA5"):
+            with self.subTest(moving_average=moving_average):
+                self.assertTrue(utils.best_opening_price_compared_to_moving_average(compact, None, moving_average).equals(
+                    utils.best_opening_price_compared_to_moving_average(self.data, None, moving_average)
+                ))
+
+    def test_from_csv(self):
+        compact = utils.stock_data_from_csv(HISTORICAL_QUOTES, chunksize=100, compact=True)
+        self.assertTrue(compact.equals(utils.compact_stock_data(self.data)))
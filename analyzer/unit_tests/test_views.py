@@ -0,0 +1,239 @@
+"""Test your views here."""
+
+import re
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from html import unescape as html_unescape
+from datetime import datetime, timezone
+from unittest import mock
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from analyzer import batch
+from analyzer import models
+from analyzer import nasdaq
+from analyzer import serialization
+from analyzer.benchmarks.standin import NasdaqStandIn
+from .testcases import StoreTestMixin
+from .test_utils import HISTORICAL_QUOTES
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"], ANALYSIS_TABLE_PAGE_SIZE=10)
+class TestAnalysisTable(SimpleTestCase):
+    """Test loading table rows from a cached analysis on demand."""
+
+    def setUp(self):
+        caches["analysis"].clear()
+
+        file = SimpleUploadedFile("HistoricalQuotes.csv", HISTORICAL_QUOTES.read_bytes())
+        response = self.client.post("/", {"file": file})
+        self.html = response.content.decode()
+        self.urls = dict(re.findall(r'data-url="(/table/\w+/(\w+)/)"', self.html))
+
+    def test_first_page_rendered(self):
+        self.assertEqual(self.html.count("<tr>"), 2 * (1 + 10))  # headers and first pages
+        self.assertEqual(sorted(self.urls.values()), ["best_opening_price", "history_by_volume"])
+
+    def test_rows(self):
+        url = next(url for url, name in self.urls.items() if name == "history_by_volume")
+
+        result = self.client.get(url, {"offset": 10, "limit": 2}).json()
+
+        self.assertEqual(result["offset"], 10)
+        self.assertEqual(result["total"], 253)
+        self.assertEqual(len(result["data"]), 2)
+        self.assertEqual(len(result["columns"]), 3)
+
+    def test_sorted_rows(self):
+        url = next(url for url, name in self.urls.items() if name == "best_opening_price")
+
+        result = self.client.get(url, {"sort": 1, "order": "desc"}).json()
+
+        self.assertEqual(len(result["data"]), 253)
+        self.assertEqual(result["data"][0][1], 8.39)
+        self.assertIsNone(result["data"][-1][1])  # NaN for the first days without full window
+
+    def test_errors(self):
+        url = next(iter(self.urls))
+
+        self.assertEqual(self.client.get(url, {"offset": "x"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"sort": 9}).status_code, 400)
+        self.assertEqual(self.client.get("/table/0123/history_by_volume/").status_code, 404)
+
+    def test_small_page(self):
+        file = SimpleUploadedFile("HistoricalQuotes.csv", HISTORICAL_QUOTES.read_bytes())
+
+        with self.settings(ANALYSIS_TABLE_PAGE_SIZE=3):
+            html = self.client.post("/", {"file": file}).content.decode()
+
+        self.assertEqual(html.count("<tr>"), 2 * (1 + 3))
+        self.assertEqual(html.count('data-offset="3"'), 2)
+
+    def test_not_cached(self):
+        """All rows are rendered if the analysis can't be loaded from the cache."""
+
+        file = SimpleUploadedFile("HistoricalQuotes.csv", HISTORICAL_QUOTES.read_bytes())
+        dummy = {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+
+        with self.settings(CACHES=settings.CACHES | {"analysis": dummy}):
+            html = self.client.post("/", {"file": file}).content.decode()
+
+        self.assertEqual(html.count("<tr>"), 2 * (1 + 253))
+        self.assertNotIn("data-url", html)
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"], ANALYSIS_TABLE_PAGE_SIZE=10)
+class TestAnalysisTableSearch(StoreTestMixin, TestCase):
+    """Test loading table rows of a search that is not cached anymore."""
+
+    search = {"stock_symbol": "AAPL", "start_date": "2020-03-01", "end_date": "2020-12-31"}
+
+    def setUp(self):
+        super().setUp()
+        caches["analysis"].clear()
+        self.server = NasdaqStandIn(body=HISTORICAL_QUOTES.read_text())
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+
+    def test_search_again(self):
+        with self.settings(NASDAQ_HISTORICAL_API_URL=self.server.url):
+            html = self.client.get("/", self.search).content.decode()
+            url = html_unescape(re.search(r'data-url="([^"]+history_by_volume[^"]+)"', html).group(1))
+
+            caches["analysis"].clear()
+            result = self.client.get(url + "&offset=10").json()
+
+        self.assertEqual(result["offset"], 10)
+        self.assertEqual(result["total"], 213)
+        self.assertEqual(len(result["data"]), 203)
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"])
+class TestAnalysisAPI(StoreTestMixin, TestCase):
+    """Test the JSON analysis API."""
+
+    search = {"stock_symbol": "AAPL", "start_date": "2020-03-01", "end_date": "2020-12-31"}
+
+    def setUp(self):
+        super().setUp()
+        caches["analysis"].clear()
+        self.server = NasdaqStandIn(body=HISTORICAL_QUOTES.read_text())
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+
+    def get(self, **params):
+        with self.settings(NASDAQ_HISTORICAL_API_URL=self.server.url):
+            return self.client.get("/api/analysis/", self.search | params)
+
+    def test_columnar(self):
+        result = self.get(limit=3).json()
+
+        self.assertEqual(result["longest_bullish"], 8)
+        self.assertEqual(result["moving_average"], "SMA5")
+        self.assertEqual(result["history_by_volume"]["columns"], ["Date", "Volume", "Price Change (%)"])
+        self.assertEqual(result["history_by_volume"]["data"]["Date"], ["2020-03-12", "2020-03-20", "2020-07-31"])
+        self.assertEqual(result["best_opening_price"]["data"]["Price Change ($)"], [8.39, 8.27, 7.29])
+
+    def test_fields(self):
+        self.assertEqual(self.get(fields="longest_bullish").json(), {"moving_average": "SMA5", "longest_bullish": 8})
+        self.assertEqual(self.get(fields="longest_bullish,nope").status_code, 400)
+
+    def test_without_orjson(self):
+        with mock.patch.object(serialization, "orjson", None):
+            result = self.get(fields="best_opening_price", moving_average="SMA200").json()
+
+        self.assertIsNone(result["best_opening_price"]["data"]["Price Change ($)"][-1])
+
+    def test_invalid_search(self):
+        self.assertEqual(self.get(start_date="").status_code, 400)
+
+    def test_timeout(self):
+        self.addCleanup(nasdaq._reset_circuit_breaker)
+
+        with NasdaqStandIn(body=HISTORICAL_QUOTES.read_text(), delay=1) as server:
+            with self.settings(NASDAQ_HISTORICAL_API_URL=server.url, NASDAQ_READ_TIMEOUT=0.1):
+                response = self.client.get("/api/analysis/", self.search)
+
+        self.assertEqual(response.status_code, 502)
+
+    def test_analysis_process_died(self):
+        broken = Future()
+        broken.set_exception(BrokenProcessPool("A process in the process pool was terminated abruptly."))
+
+        with mock.patch.object(batch, "submit_analysis", return_value=broken), \
+                mock.patch.object(batch, "_reset_analysis_pool") as reset:
+            response = self.get()
+
+        self.assertEqual(response.status_code, 502)
+        self.assertIn("terminated abruptly", response.json()["error"])
+        reset.assert_called_once()
+
+
+@override_settings(ALLOWED_HOSTS=["testserver"], SEARCH_MAX_AGE_HISTORICAL=1000, SEARCH_MAX_AGE_CURRENT=10)
+class TestConditionalSearch(StoreTestMixin, TestCase):
+    """Test HTTP caching of search results."""
+
+    search = {"stock_symbol": "AAPL", "start_date": "2020-03-01", "end_date": "2020-12-31"}
+
+    def setUp(self):
+        super().setUp()
+        caches["analysis"].clear()
+        self.server = NasdaqStandIn(body=HISTORICAL_QUOTES.read_text())
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+
+    def get(self, search, **headers):
+        with self.settings(NASDAQ_HISTORICAL_API_URL=self.server.url):
+            return self.client.get("/", search, **headers)
+
+    def test_historical(self):
+        response = self.get(self.search)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("max-age=1000", response["Cache-Control"])
+        self.assertEqual(response["Last-Modified"], "Fri, 01 Jan 2021 05:00:00 GMT")  # midnight in New York
+        self.assertNotEqual(response["ETag"], self.get(self.search | {"moving_average": "EMA20"})["ETag"])
+
+    def test_not_modified(self):
+        etag = self.get(self.search)["ETag"]
+
+        with mock.patch("analyzer.views.IndexView.search_analysis") as search_analysis:
+            by_etag = self.get(self.search, HTTP_IF_NONE_MATCH=etag)
+            by_date = self.get(self.search, HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2021 05:00:00 GMT")
+
+        search_analysis.assert_not_called()
+        self.assertEqual(by_etag.status_code, 304)
+        self.assertEqual(by_etag["ETag"], etag)
+        self.assertIn("max-age=1000", by_etag["Cache-Control"])
+        self.assertEqual(by_date.status_code, 304)
+
+    def test_imported(self):
+        """Search results change when the stock history is imported."""
+
+        etag = self.get(self.search)["ETag"]
+        imported = datetime(2021, 2, 1, tzinfo=timezone.utc)
+        models.HistoryVersion.objects.create(symbol="AAPL", generation=1, modified=imported)
+
+        response = self.get(self.search, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response["Last-Modified"], "Mon, 01 Feb 2021 00:00:00 GMT")
+
+    def test_current(self):
+        response = self.get(self.search | {"end_date": ""}, HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("max-age=10", response["Cache-Control"])
+        self.assertFalse(response.has_header("ETag"))
+        self.assertFalse(response.has_header("Last-Modified"))
+
+    def test_error_not_cached(self):
+        with NasdaqStandIn(body="\n") as server, self.settings(NASDAQ_HISTORICAL_API_URL=server.url):
+            response = self.client.get("/", self.search | {"stock_symbol": "NOPE"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("ETag"))
+        self.assertFalse(response.has_header("Cache-Control"))
@@ -0,0 +1,15 @@
+"""Shared setup of test cases."""
+
+from analyzer import store
+
+
+class StoreTestMixin:
+    """For test cases that load stock histories through the local store.
+    Histories kept in memory (see 'store.history_cache') outlive the database
+    rolled back after each test, so they are dropped before and after each test.
+    """
+
+    def setUp(self):
+        super().setUp()
+        store._reset_history_cache()
+        self.addCleanup(store._reset_history_cache)
@@ -10,5 +10,10 @@ app_name = "analyzer"
 
 urlpatterns = [
     path("", analyzer_views.IndexView.as_view(), name="index"),
-    path("filter-stocks/", analyzer_views.filter_stocks, name="filter_stocks")
+    path("filter-stocks/", analyzer_views.filter_stocks, name="filter_stocks"),
+    path("api/analysis/", analyzer_views.analysis_api, name="analysis_api"),
+    path("api/batch/", analyzer_views.batch_analysis_api, name="batch_analysis_api"),
+    path("api/import/", analyzer_views.bulk_import_api, name="bulk_import_api"),
+    path("metrics/", analyzer_views.stage_metrics, name="stage_metrics"),
+    path("table/<slug:analysis_id>/<slug:table>/", analyzer_views.analysis_table, name="analysis_table"),
 ]
@@ -1,15 +1,26 @@
 """Create your utility functions here."""
 
-import re
-import requests
+import io
 import datetime
-import pandas as pd
-import numpy as np
+import pytz
+
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
 
-from decimal import Decimal
 from django.conf import settings
 from django.utils.translation import gettext as _
 
+from . import nasdaq
+from . import prices
+from . import singleflight
+from . import timing
+from .lazy import LazyModule
+
+# Imported on first use, see 'analyzer.lazy'
+np = LazyModule("numpy")
+pd = LazyModule("pandas")
+requests = LazyModule("requests")
+urllib3 = LazyModule("urllib3")
+
 
 class FetchError(Exception):
     """"""
@@ -18,12 +29,85 @@ class FetchError(Exception):
         super(FetchError, self).__init__(message)
 
 
+class NoStockDataError(FetchError):
+    """Nasdaq API returned no data for the given stock and date range."""
+
+
+# Daily bars are of US trading sessions, which may not be final until the session's day has ended
+# in New York, hours after midnight here
+MARKET_TIME_ZONE = pytz.timezone("America/New_York")
+
+# Columns of stock data, in the order of the Nasdaq API
+STOCK_DATA_COLUMNS = ["Date", "Close/Last", "Volume", "Open", "High", "Low"]
+
+# Rows per chunk when reading CSV files. Raw chunks are rows of python strings, which take about
+# ten times the memory of the formatted rows, so they dominate the peak memory use of reading.
+CSV_CHUNK_SIZE = 10_000
+
+
+def market_today() -> "datetime.date":
+    """Today in New York. Daily bars of earlier days are final."""
+    return datetime.datetime.now(MARKET_TIME_ZONE).date()
+
+
 def format_stock_data(data: "pd.DataFrame") -> "pd.DataFrame":
     """Format stock data with correct types and order by date (ascending)."""
 
     # Copied so that formatted data can be separated from unformatted if wanted
     data = data.copy()
 
+    _format_columns(data)
+
+    # Sorted to a new RangeIndex directly, instead of copying the data again to reset the index
+    return data.sort_values(by="Date", ignore_index=True)
+
+
+def compact_stock_data(data: "pd.DataFrame") -> "pd.DataFrame":
+    """Formatted stock data (see 'format_stock_data') in its compact representation: dates as int32 days
+    since 1970-01-01, prices as int32 ticks (see 'analyzer.prices') if all of them fit, otherwise int64,
+    and volumes in the smallest integer type holding them (float64 if some are missing).
+    Analyses accept both representations.
+    """
+
+    if is_compact(data):
+        return data
+
+    volume = data["Volume"]
+    if not volume.isna().any():
+        volume = pd.to_numeric(volume.astype(np.int64), downcast="unsigned" if (volume >= 0).all() else "integer")
+
+    # All prices have the same type, so that they are kept in a single block
+    limits = np.iinfo(np.int32)
+    price_type = np.int32 if all(
+        data[column].empty or (data[column].min() >= limits.min and data[column].max() <= limits.max)
+        for column in prices.PRICE_COLUMNS
+    ) else np.int64
+
+    return pd.DataFrame({
+        "Date": data["Date"].to_numpy().astype("datetime64[D]").astype(np.int32),
+        "Close/Last": data["Close/Last"].to_numpy(dtype=price_type),
+        "Volume": volume.to_numpy(),
+        "Open": data["Open"].to_numpy(dtype=price_type),
+        "High": data["High"].to_numpy(dtype=price_type),
+        "Low": data["Low"].to_numpy(dtype=price_type),
+    }, copy=False)
+
+
+def is_compact(data: "pd.DataFrame") -> bool:
+    """Is formatted stock data in the compact representation, see 'compact_stock_data'."""
+    return data["Date"].dtype.kind in "iu"
+
+
+def stock_dates(data: "pd.DataFrame") -> "np.ndarray":
+    """Dates of formatted stock data as datetime64, in either representation (see 'compact_stock_data')."""
+
+    dates = data["Date"].to_numpy()
+    return dates.astype("datetime64[D]") if dates.dtype.kind in "iu" else dates
+
+
+def _format_columns(data: "pd.DataFrame") -> None:
+    """Convert stock data columns to correct types in place."""
+
     try:
         data.replace(to_replace="N/A", value=np.nan, inplace=True)
 
@@ -31,15 +115,14 @@ def format_stock_data(data: "pd.DataFrame") -> "pd.DataFrame":
         data["Date"] = pd.to_datetime(data['Date'], format='%m/%d/%Y')
         data["Volume"] = pd.to_numeric(data["Volume"])
 
-        for column in ["Open", "Close/Last", "High", "Low"]:
-            data[column] = data[column].apply(lambda x: Decimal(re.sub(r"[^\d.,]", "", x)))
-
-        data = data.sort_values(by="Date").reset_index(drop=True)
+        # Prices as fixed-point integers, see 'analyzer.prices'
+        for column in prices.PRICE_COLUMNS:
+            data[column] = prices.to_price_ticks(data[column])
 
     # One of the values for a column was not wat expected.
     # "Date" -column values should be in format '%m/%d/%Y'
     # "Volume" -column values should be integers
-    # "Open", "Close/Last", "High" and "Low" -columns should be dollar amounts ($xx.yy)
+    # "Open", "Close/Last", "High" and "Low" -columns should be dollar amounts ($xx.yy) with at most 4 decimals
     except ValueError as error:
         raise FetchError(_(f"Formatting failed: A value for a column was not what expected. {error}."))
 
@@ -49,62 +132,214 @@ def format_stock_data(data: "pd.DataFrame") -> "pd.DataFrame":
     except KeyError as key:
         raise FetchError(_(f"Formatting failed: A column with key {key} was not found."))
 
-    return data
+
+# required headers for nasdaq.com API CORS policy
+NASDAQ_HEADERS = {
+    "Accept-Encoding": "deflate",
+    "Connection": "keep-alive",
+    "User-Agent": "Script"
+}
+
+
+# Fetches in flight, so that concurrent identical fetches are made only once
+_fetches = singleflight.SingleFlight()
 
 
 def fetch_stock_history(stock_symbol: str, start_date: "datetime.date", end_date: datetime.date = None) -> "pd.DataFrame":
+    """Fetch formatted stock history from the Nasdaq API. Concurrent fetches of the same history
+    share one API call and its result (see 'analyzer.singleflight'), so it should not be modified in place.
+    """
 
-    start_date = start_date.strftime("%Y-%m-%d")
+    key = _fetch_key(stock_symbol, start_date, end_date)
+    return _fetches.call(key, singleflight.across_processes, key, _fetch_stock_history, stock_symbol, start_date, end_date)
 
+
+async def fetch_stock_history_async(stock_symbol: str, start_date: "datetime.date",
+                                    end_date: datetime.date = None) -> "pd.DataFrame":
+    """Like 'fetch_stock_history', but waits for the Nasdaq API without blocking the event loop.
+    Parsing and formatting are CPU-bound, so they are run in a worker thread.
+    """
+
+    key = _fetch_key(stock_symbol, start_date, end_date)
+    return await _fetches.call_async(
+        key, singleflight.across_processes_async, key, _fetch_stock_history_async, stock_symbol, start_date, end_date
+    )
+
+
+def _fetch_key(stock_symbol: str, start_date: "datetime.date", end_date: Optional["datetime.date"]) -> str:
     if end_date is None:
-        end_date = datetime.date.today().strftime("%Y-%m-%d")
-    else:
-        end_date = end_date.strftime("%Y-%m-%d")
+        end_date = market_today()
 
-    # required headers for nasdaq.com API CORS policy
-    headers = {
-        "Accept-Encoding": "deflate",
-        "Connection": "keep-alive",
-        "User-Agent": "Script"
-    }
+    return f"{stock_symbol.upper()}:{start_date.isoformat()}:{end_date.isoformat()}"
+
+
+def _fetch_stock_history(stock_symbol: str, start_date: "datetime.date",
+                         end_date: Optional["datetime.date"]) -> "pd.DataFrame":
+    breaker = _nasdaq_circuit_breaker()
 
     try:
-        data = requests.get(settings.NASDAQ_HISTORICAL_API_URL(stock_symbol, start_date, end_date), headers=headers)
+        # Streamed so that the body can be parsed straight from the socket.
+        # Failed connections and error responses are retried by the session.
+        with timing.stage("nasdaq"):
+            response = nasdaq.session().get(
+                _nasdaq_url(stock_symbol, start_date, end_date),
+                headers=NASDAQ_HEADERS,
+                stream=True,
+                timeout=(settings.NASDAQ_CONNECT_TIMEOUT, settings.NASDAQ_READ_TIMEOUT),
+            )
     except requests.RequestException as e:
+        breaker.failure()
+        raise FetchError(_(f"Nasdaq API did not respond. {e}."))
+
+    with response:
+        # Let urllib3 undo the 'deflate' content encoding while reading
+        response.raw.decode_content = True
+
+        try:
+            data = _stock_history_from_csv(response.raw, stock_symbol)
+        except urllib3.exceptions.HTTPError as e:
+            # Reading the streamed body timed out or the connection broke
+            breaker.failure()
+            raise FetchError(_(f"Nasdaq API did not respond. {e}."))
+        except Exception:
+            # The API responded, only without stock data or with unexpected data
+            breaker.success()
+            raise
+
+    breaker.success()
+    return data
+
+
+async def _fetch_stock_history_async(stock_symbol: str, start_date: "datetime.date",
+                                     end_date: Optional["datetime.date"]) -> "pd.DataFrame":
+    # Only needed by the async views
+    import httpx
+    from asgiref.sync import sync_to_async
+
+    breaker = _nasdaq_circuit_breaker()
+
+    try:
+        # Failed connections and error responses are retried like in the session
+        with timing.stage("nasdaq"):
+            response = await nasdaq.get_async(_nasdaq_url(stock_symbol, start_date, end_date), NASDAQ_HEADERS)
+    except httpx.HTTPError as e:
+        breaker.failure()
         raise FetchError(_(f"Nasdaq API did not respond. {e}."))
 
-    if not data.text.strip():
-        raise FetchError(_(f"No stock data for stock '{stock_symbol}'."))
+    if response.status_code in nasdaq.RETRY_STATUSES:
+        breaker.failure()
+        raise FetchError(_(f"Nasdaq API did not respond. Status {response.status_code}."))
+
+    breaker.success()
+
+    parse = sync_to_async(_stock_history_from_csv, thread_sensitive=False)
+    return await parse(io.BytesIO(response.content), stock_symbol)
+
 
-    data_rows = data.text.strip().split("\n")
-    data_columns = data_rows.pop(0).split(", ")
+def _nasdaq_circuit_breaker() -> "nasdaq.CircuitBreaker":
+    breaker = nasdaq.circuit_breaker()
+    if not breaker.allow():
+        raise FetchError(_("Nasdaq API is not responding. Please try again later."))
+    return breaker
 
-    stock_df = pd.DataFrame(columns=data_columns)
 
-    for i, row in enumerate(data_rows):
-        stock_df.loc[i] = row.split(", ")
+def _nasdaq_url(stock_symbol: str, start_date: "datetime.date", end_date: Optional["datetime.date"]) -> str:
+    if end_date is None:
+        end_date = market_today()
+
+    return settings.NASDAQ_HISTORICAL_API_URL(
+        stock_symbol, start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+    )
+
+
+def _stock_history_from_csv(source, stock_symbol: str) -> "pd.DataFrame":
+    try:
+        # Includes reading the body, when it is streamed from the socket
+        with timing.stage("parse"):
+            stock_df = read_stock_csv(source)
+    except pd.errors.EmptyDataError:
+        raise NoStockDataError(_(f"No stock data for stock '{stock_symbol}'."))
 
-    return format_stock_data(stock_df)
+    with timing.stage("format"):
+        return format_stock_data(stock_df)
 
 
-def stock_data_from_csv(file: str) -> "pd.DataFrame":
+def read_stock_csv(source) -> "pd.DataFrame":
+    """Parse stock history CSV (as returned by the Nasdaq API) in a single pass.
+    Values in the Nasdaq format are separated by ", ", so leading whitespace is skipped
+    instead of using a multi-character separator, which would force the slow python parser.
+    """
+
+    return pd.read_csv(source, skipinitialspace=True)
+
+
+def stock_data_from_csv(file: str, chunksize: int = CSV_CHUNK_SIZE, compact: bool = False) -> "pd.DataFrame":
+    """Read stock data from a CSV file, formatted and ordered by date (ascending).
+    The file is read in chunks of rows, and each chunk is formatted before reading the next one,
+    so that the raw text of only one chunk is in memory at a time. With 'compact', chunks are also
+    converted to the compact representation (see 'compact_stock_data').
+
+    The analyses rank all days of the history, so the whole formatted history is kept in memory:
+    at most the formatted chunks and the history concatenated from them at the same time. Files
+    newest first, like those of the Nasdaq API, are concatenated in reverse instead of sorted.
+    """
+
+    chunks = iter_stock_data_from_csv(file, chunksize)
+    if compact:
+        chunks = map(compact_stock_data, chunks)
+
+    chunks = list(chunks)
+
+    if _newest_first(chunks):
+        # Reversed views of the chunks, so that concatenating them is the only copy
+        chunks = [chunk.iloc[::-1] for chunk in reversed(chunks)]
+        data = pd.concat(chunks, ignore_index=True)
+    else:
+        # Chunks are indexed by their rows in the file
+        data = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+    del chunks
+
+    if not data["Date"].is_monotonic_increasing:
+        data = data.sort_values(by="Date", ignore_index=True)
+
+    return data
+
+
+def _newest_first(chunks: List["pd.DataFrame"]) -> bool:
+    dates = np.concatenate([stock_dates(chunk) for chunk in chunks])
+    return len(dates) > 1 and bool(np.all(dates[1:] < dates[:-1]))
+
+
+def iter_stock_data_from_csv(file: str, chunksize: int = CSV_CHUNK_SIZE) -> Iterator["pd.DataFrame"]:
+    """Read stock data from a CSV file in formatted chunks of at most 'chunksize' rows,
+    in the order of the file. Columns other than the stock data columns are not read at all.
+    """
 
     try:
-        data = pd.read_csv(file)
+        reader = pd.read_csv(
+            file,
+            # Whitespace around column headers and values
+            skipinitialspace=True,
+            usecols=lambda column: column.strip() in STOCK_DATA_COLUMNS,
+            chunksize=chunksize,
+        )
     except FileNotFoundError:
         raise FetchError(_(f"File '{file}' not found."))
+    except pd.errors.EmptyDataError:
+        raise FetchError(_(f"File '{file}' is empty."))
 
-    # Strip whitespace from column headers
-    data.rename(columns=lambda x: x.strip(), inplace=True)
+    with reader:
+        for chunk in reader:
+            chunk.rename(columns=lambda x: x.strip(), inplace=True)
 
-    # Strip whitespace from data values
-    for column in data.columns:
-        try:
-            data[column] = data[column].str.strip()
-        except AttributeError:
-            pass  # if numeric dtype
+            # Leading whitespace was skipped already
+            for column in chunk.columns:
+                if chunk[column].dtype == object:
+                    chunk[column] = chunk[column].str.rstrip()
 
-    return format_stock_data(data)
+            _format_columns(chunk)
+            yield chunk
 
 
 def longest_bullish_streak(data: "pd.DataFrame") -> int:
@@ -112,77 +347,283 @@ def longest_bullish_streak(data: "pd.DataFrame") -> int:
     Both start and end date are included to the date range.
     """
 
-    longest_streak = 0
-    current_streak = 1  # start day shall be included
-    last_price = data["Close/Last"][0]
+    return int(bullish_streaks([data["Close/Last"].to_numpy()]).streak[0])
 
-    for current_price in data["Close/Last"]:
-        if current_price > last_price:
-            current_streak += 1
-            if current_streak > longest_streak:
-                longest_streak = current_streak
-        else:
-            current_streak = 1
-        last_price = current_price
 
-    return longest_streak
+class BullishStreaks(NamedTuple):
+    """Longest bullish streak of each series given to 'bullish_streaks'.
+    Series without a single upward day have streak 0, start and end -1, and NaT dates.
+    """
+
+    streak: "np.ndarray"
+    """Days in the longest streak, both start and end day included."""
+    start: "np.ndarray"
+    """Index of the first day of the streak in its series."""
+    end: "np.ndarray"
+    """Index of the last day of the streak in its series."""
+    start_date: Optional["np.ndarray"] = None
+    """Date of the first day of the streak, if dates were given."""
+    end_date: Optional["np.ndarray"] = None
+    """Date of the last day of the streak, if dates were given."""
+
+
+def _flatten_series(series, lengths: Optional[Sequence[int]] = None) -> Tuple["np.ndarray", "np.ndarray"]:
+    """Concatenate ragged series (a sequence of 1D arrays) or the valid parts of padded series
+    (a 2D array with the first 'lengths[i]' values of row i valid) into a single array.
+    Returns the concatenated values and the offset of each series in them.
+    """
+
+    if isinstance(series, np.ndarray) and series.ndim == 2:
+        if lengths is None:
+            lengths = np.full(series.shape[0], series.shape[1])
+        lengths = np.asarray(lengths, dtype=np.int64)
+        values = series[np.arange(series.shape[1]) < lengths[:, np.newaxis]]
+    else:
+        series = [np.asarray(values) for values in series]
+        lengths = np.array([len(values) for values in series], dtype=np.int64)
+        values = np.concatenate(series) if series else np.empty(0)
+
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    return values, offsets
+
+
+def bullish_streaks(closes, lengths: Optional[Sequence[int]] = None, dates=None) -> BullishStreaks:
+    """Find the longest bullish streak of many series of closing prices at once.
+
+    :param closes: Closing prices in ascending date order, either a sequence of 1D arrays
+                   of any length, or a 2D array with one (padded) series per row.
+    :param lengths: Number of valid values on each row of a padded 2D array. All if not given.
+    :param dates: Dates matching 'closes' in the same layout. Optional.
+    """
+
+    values, offsets = _flatten_series(closes, lengths)
+    count = len(offsets) - 1
+
+    # Upward day-pairs (i, i + 1), excluding the pairs that would cross from one series to the next
+    upward = values[1:] > values[:-1]
+    boundaries = offsets[1:-1] - 1
+    upward[boundaries[(boundaries >= 0) & (boundaries < len(upward))]] = False
+
+    # Run lengths of consecutive upward pairs
+    edges = np.diff(np.concatenate(([0], upward.view(np.int8), [0])))
+    run_starts = np.flatnonzero(edges == 1)
+    run_ends = np.flatnonzero(edges == -1)  # index of the last day of the run
+    run_series = np.searchsorted(offsets, run_starts, side="right") - 1
+
+    # Longest run per series, the earliest one on ties
+    order = np.lexsort((run_starts, run_starts - run_ends, run_series))
+    first = order[np.diff(run_series[order], prepend=-1) != 0]
+    series = run_series[first]
+
+    streak = np.zeros(count, dtype=np.int64)
+    start = np.full(count, -1, dtype=np.int64)
+    end = np.full(count, -1, dtype=np.int64)
+
+    streak[series] = run_ends[first] - run_starts[first] + 1  # start day included
+    start[series] = run_starts[first] - offsets[series]
+    end[series] = run_ends[first] - offsets[series]
+
+    if dates is None:
+        return BullishStreaks(streak, start, end)
+
+    dates, _offsets = _flatten_series(dates, lengths)
+    start_date = np.full(count, np.datetime64("NaT"), dtype="datetime64[ns]")
+    end_date = start_date.copy()
+    start_date[series] = dates[run_starts[first]]
+    end_date[series] = dates[run_ends[first]]
 
+    return BullishStreaks(streak, start, end, start_date, end_date)
 
-def history_by_volume_and_price_delta(data: "pd.DataFrame", dateformat: str = None) -> "pd.DataFrame":
+
+def history_by_volume_and_price_delta(data: "pd.DataFrame", dateformat: str = None,
+                                      limit: int = None) -> "pd.DataFrame":
     """Sort stock history by the highest trading volume and the most significant stock price change within a day.
     If two dates have the same volume, the one with the more significant price change should come first.
+    If limit is given, only that many of the top rows are selected and sorted.
     """
 
-    # Prevent changes to original
-    data = data.copy()
+    table = history_by_volume_table(
+        stock_dates(data),
+        data["Volume"].to_numpy(),
+        price_range(data["High"].to_numpy(), data["Low"].to_numpy()),
+        limit,
+    )
+
+    # Only the selected rows are formatted
+    if dateformat is not None:
+        table[_("Date")] = table[_("Date")].dt.strftime(dateformat)
+
+    return table
+
+
+def price_range(high: "np.ndarray", low: "np.ndarray") -> "np.ndarray":
+    """Difference between the highest and lowest price of each day."""
 
     # Drops in stock price are equally significant as increaces -> abs
-    data["Price_change"] = (data["High"] - data["Low"]).abs()
-    data.drop(columns=["Close/Last", "Open", "High", "Low"], inplace=True)
+    return np.abs(high - low)
 
-    if dateformat is not None:
-        data["Date"] = data["Date"].dt.strftime(dateformat)
 
-    # Mergesort should be used so that the effects of price delta sort are maintained after volume sort
-    data.sort_values(by="Price_change", ascending=False, kind="mergesort", inplace=True)
-    data.sort_values(by="Volume", ascending=False, kind="mergesort", inplace=True)
-    data.reset_index(drop=True, inplace=True)
+def history_by_volume_table(dates: "np.ndarray", volume: "np.ndarray", price_range: "np.ndarray",
+                            limit: int = None, order: "np.ndarray" = None) -> "pd.DataFrame":
+    """Table for 'history_by_volume_and_price_delta' from its columns. Dates are used as is.
+    The row order is computed unless given, e.g. from 'incremental.VolumeRanking'.
+    Volumes are shown as int64 (float64 if some are missing), even if they were downcast.
+    """
 
-    data.rename(columns={
-        "Volume": _("Volume"),
-        "Date": _("Date"),
-        "Price_change": _("Price Change (%)")
-    }, inplace=True)
+    # Only the selected rows are materialized
+    if order is None:
+        order = _volume_and_price_change_order(volume, price_range, limit)
 
-    return data
+    volume = volume[order]
+    if volume.dtype.kind in "iu":
+        volume = volume.astype(np.int64, copy=False)
 
+    return pd.DataFrame({
+        _("Date"): dates[order],
+        _("Volume"): volume,
+        _("Price Change (%)"): prices.to_dollars(price_range[order]),
+    })
 
-def best_opening_price_compared_to_five_day_SMA(data: "pd.DataFrame", dateformat: str = None) -> "pd.DataFrame":
-    """Sort stock history by the best opening price compared to 5 days simple moving average (SMA)."""
 
-    # Prevent changes to original
-    data = data.copy()
+def _volume_and_price_change_order(volume: "np.ndarray", price_change: "np.ndarray",
+                                   limit: int = None) -> "np.ndarray":
+    """Indices ordering rows by volume (descending), then price change (descending), then by position.
+    Missing volumes come last. If limit is given, only the indices of the top rows are returned.
+    """
 
-    data["SMA"] = data["Close/Last"].rolling(window=5).mean()
-    data["SMA"] = data["SMA"].apply(lambda x: Decimal(x))  # no rounding for accuracy
+    # Ascending sort key for volume, missing volumes last
+    volume_key = -volume.astype(np.float64)
+    volume_key[np.isnan(volume_key)] = np.inf
 
-    # Calculate with Decimals and convert to numeric for sorting
-    data["Price_change"] = (data["Open"] / data["SMA"]) * Decimal(100) - Decimal(100)
-    data["Price_change"] = pd.to_numeric(data["Price_change"], errors="coerce")
-    data["Price_change"] = np.round(data["Price_change"], decimals=2)
+    if limit is None or limit >= len(volume):
+        # Lexsort is stable, so rows equal in both keys remain in date order
+        return np.lexsort((-price_change, volume_key))
 
-    data.drop(columns=["Close/Last", "Volume", "Open", "High", "Low", "SMA"], inplace=True)
+    if limit <= 0:
+        return np.empty(0, dtype=np.int64)
 
-    if dateformat is not None:
-        data["Date"] = data["Date"].dt.strftime(dateformat)
+    # Rows with the same volume as the limit:th row can still make it to the top by their price change,
+    # so partition by volume alone and sort only the candidates with a composite key.
+    threshold = np.partition(volume_key, limit - 1)[limit - 1]
+    candidates = np.flatnonzero(volume_key <= threshold)
+    order = np.lexsort((-price_change[candidates], volume_key[candidates]))
 
-    data.sort_values(by="Price_change", ascending=False, inplace=True)
-    data.reset_index(drop=True, inplace=True)
+    return candidates[order[:limit]]
 
-    data.rename(columns={
-        "Date": _("Date"),
-        "Price_change": _("Price Change ($)")
-    }, inplace=True)
 
-    return data
+# Moving averages that can be selected for comparison, named by type and window in days
+MOVING_AVERAGE_WINDOWS = [5, 20, 50, 200]
+MOVING_AVERAGES = [f"{kind}{window}" for kind in ("SMA", "EMA") for window in MOVING_AVERAGE_WINDOWS]
+DEFAULT_MOVING_AVERAGE = "SMA5"
+
+
+def _parse_moving_average(name: str) -> Tuple[str, int]:
+    """Split moving average name like 'SMA5' or 'EMA200' to its type and window."""
+
+    kind, window = name[:3], name[3:]
+    if kind not in ("SMA", "EMA") or not window.isdigit() or int(window) < 1:
+        raise ValueError(f"Unknown moving average '{name}'")
+    return kind, int(window)
 
+
+def _window_sums(values: "np.ndarray", windows: Iterable[int]) -> Dict[int, "np.ndarray"]:
+    """Sums of all full trailing windows of the given sizes, from a single cumulative sum pass.
+    Sums for window 'w' start from the w:th value. Sums of integers (e.g. price ticks) are exact.
+    """
+
+    # Integers are summed as int64, since numpy sums compact int32 prices as the platform integer,
+    # which is int32 on Windows with numpy < 2 and would overflow
+    dtype = np.int64 if values.dtype.kind in "iu" else np.float64
+    cumulative = np.concatenate(([0], np.cumsum(values, dtype=dtype)))
+    return {window: cumulative[window:] - cumulative[:max(len(cumulative) - window, 0)] for window in windows}
+
+
+def moving_averages(close: "np.ndarray", names: Sequence[str] = None) -> Dict[str, "np.ndarray"]:
+    """Compute several moving averages (see MOVING_AVERAGES) of the closing prices at once.
+    Simple moving averages share one cumulative sum pass. Values before the first full window are NaN.
+    """
+
+    if names is None:
+        names = MOVING_AVERAGES
+
+    parsed = {name: _parse_moving_average(name) for name in names}
+    sums = _window_sums(close, {window for kind, window in parsed.values() if kind == "SMA"})
+
+    averages = {}
+    for name, (kind, window) in parsed.items():
+        if kind == "SMA":
+            averages[name] = np.full(len(close), np.nan)
+            averages[name][window - 1:] = sums[window] / window
+        else:
+            averages[name] = pd.Series(close, dtype=np.float64) \
+                .ewm(span=window, adjust=False, min_periods=window).mean().to_numpy()
+
+    return averages
+
+
+def best_opening_price_compared_to_moving_average(data: "pd.DataFrame", dateformat: str = None,
+                                                  moving_average: str = DEFAULT_MOVING_AVERAGE) -> "pd.DataFrame":
+    """Sort stock history by the best opening price compared to the given moving average,
+    e.g. 'SMA5' for 5 days simple moving average or 'EMA20' for 20 days exponential moving average.
+    """
+
+    price_change = opening_price_change(data["Close/Last"].to_numpy(), data["Open"].to_numpy(), moving_average)
+
+    return best_opening_price_table(format_dates(stock_dates(data), dateformat), price_change)
+
+
+def opening_price_change(close: "np.ndarray", opening: "np.ndarray", moving_average: str) -> "np.ndarray":
+    """Change (%) from the moving average of closing prices to the opening price, rounded to two decimals."""
+
+    kind, window = _parse_moving_average(moving_average)
+
+    if kind == "SMA":
+        price_change = np.full(len(close), np.nan)
+        window_sum = _window_sums(close, [window])[window]
+
+        # Open / SMA * 100 - 100 == 100 * (window * Open - window_sum) / window_sum,
+        # which keeps the numerator exact and leaves a single division to floating point.
+        # Compact int32 prices would overflow when multiplied by the window.
+        window_opening = window * opening[window - 1:].astype(np.int64, copy=False)
+        price_change[window - 1:] = 100 * (window_opening - window_sum) / window_sum
+    else:
+        average = moving_averages(close, [moving_average])[moving_average]
+        price_change = 100 * (opening - average) / average
+
+    return np.round(price_change, decimals=2)
+
+
+def best_opening_price_table(dates: "np.ndarray", price_change: "np.ndarray",
+                             order: "np.ndarray" = None) -> "pd.DataFrame":
+    """Table for 'best_opening_price_compared_to_moving_average' from its columns. Dates are used as is.
+    The row order is computed unless given, e.g. from 'incremental.OpeningPriceRanking'.
+    """
+
+    if order is None:
+        order = _price_change_order(price_change)
+
+    return pd.DataFrame({
+        _("Date"): dates[order],
+        _("Price Change ($)"): price_change[order],
+    })
+
+
+def _price_change_order(price_change: "np.ndarray") -> "np.ndarray":
+    """Indices ordering rows by price change (descending), then by position. Missing price changes come last."""
+
+    # Stable, so rows with equal price changes remain in date order, and NaN sorts last
+    return np.argsort(-price_change, kind="stable")
+
+
+def format_dates(dates: "np.ndarray", dateformat: str = None) -> "np.ndarray":
+    """Format datetime64 dates to strings. Dates are returned as is, if dateformat is not given."""
+
+    if dateformat is None:
+        return dates
+
+    return pd.Series(dates).dt.strftime(dateformat).to_numpy()
+
+
+def best_opening_price_compared_to_five_day_SMA(data: "pd.DataFrame", dateformat: str = None) -> "pd.DataFrame":
+    """Sort stock history by the best opening price compared to 5 days simple moving average (SMA)."""
+    return best_opening_price_compared_to_moving_average(data, dateformat, moving_average="SMA5")
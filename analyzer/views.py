@@ -1,20 +1,38 @@
 """Create your views here."""
 
-import json
-import pandas as pd
+import asyncio
+from concurrent.futures.process import BrokenProcessPool
 from functools import wraps
+from typing import Optional, Tuple
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.shortcuts import render
 from django.urls import reverse_lazy
 
 from django.views import generic as generic_views
 
+from django.utils import translation
+from django.utils.cache import get_conditional_response, patch_response_headers
+from django.utils.http import http_date
 from django.utils.translation import gettext_lazy as _
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_POST
 
+from . import analyses
+from . import batch
+from . import bulk_import
+from . import cache
 from . import forms as analyzer_forms
+from . import serialization
+from . import store
+from . import symbols
+from . import timing
 from . import utils
+from .lazy import LazyModule
+
+# Imported on first use, see 'analyzer.lazy'
+pd = LazyModule("pandas")
 
 
 def render_with_error_in_context_on_fail(func):
@@ -47,16 +65,51 @@ class IndexView(generic_views.FormView):
     @render_with_error_in_context_on_fail
     def post(self, request, *args, **kwargs):
         """Data added from file."""
-        data = utils.stock_data_from_csv(file=request.FILES.get("file"))
-        analysis = self.analyze_stock_data(data)
-        return self.render_to_response(self.get_context_data(data=analysis))
+        file = request.FILES.get("file")
+        key = cache.file_key(file)
+        analysis = cache.cached_analysis(
+            key=key,
+            analyze=lambda: self.analyze_stock_data(self.stock_data_from_file(file)),
+            timeout=settings.ANALYSIS_CACHE_TIMEOUT_HISTORICAL,
+        )
+
+        # Uploaded files can't be analyzed again for loading table rows, so rows are only
+        # loaded on demand if the analysis was cached, e.g. not with a dummy cache backend
+        analysis_id = cache.analysis_id(key)
+        if analysis_id is not None and cache.get_analysis(analysis_id) is None:
+            analysis_id = None
+
+        return self.render_to_response(self.get_context_data(data=analysis, analysis_id=analysis_id))
 
     @render_with_error_in_context_on_fail
     def form_valid(self, form):
-        cleaned_data = form.cleaned_data
-        data = utils.fetch_stock_history(**cleaned_data)
-        analysis = self.analyze_stock_data(data)
-        return self.render_to_response(self.get_context_data(data=analysis))
+        end_date = form.cleaned_data["end_date"]
+        version = store.history_version(form.cleaned_data["stock_symbol"])
+        key = self.search_key(form.cleaned_data, version=version.generation)
+
+        historical = cache.is_historical(end_date)
+        etag = cache.search_etag(key) if historical else None
+        last_modified = cache.search_last_modified(end_date, version.modified) if historical else None
+
+        # Checked before fetching or analyzing anything, so that revalidating a search is cheap
+        response = get_conditional_response(self.request, etag=etag, last_modified=last_modified)
+
+        if response is None:
+            analysis, key = self.search_analysis(form.cleaned_data, key=key)
+            # The search is repeated for loading table rows, if the analysis is not cached anymore
+            response = self.render_to_response(self.get_context_data(
+                data=analysis, analysis_id=cache.analysis_id(key), analysis_query=self.request.GET.urlencode(),
+            ))
+
+        # Errors are rendered without these, so that they are not cached
+        if historical:
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+            patch_response_headers(response, settings.SEARCH_MAX_AGE_HISTORICAL)
+        else:
+            patch_response_headers(response, settings.SEARCH_MAX_AGE_CURRENT)
+
+        return response
 
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
@@ -72,25 +125,285 @@ class IndexView(generic_views.FormView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        return {"error": None, "data": None} | context
+        return {"error": None, "data": None, "analysis_id": None, "analysis_query": None} | context
+
+    def render_to_response(self, context, **response_kwargs):
+        # Rendered here instead of lazily by the handler, so that rendering can be timed
+        response = super().render_to_response(context, **response_kwargs)
+        with timing.stage("render"):
+            return response.render()
+
+    @staticmethod
+    def stock_data_from_file(file) -> "pd.DataFrame":
+        # Reading and formatting are done chunk by chunk, so they are timed together
+        with timing.stage("parse"):
+            return utils.stock_data_from_csv(file=file, compact=settings.COMPACT_STOCK_DATA)
+
+    @staticmethod
+    def search_key(cleaned_data: dict, dateformat: str = "%d.%m.%Y", version: int = None, limit: int = None) -> str:
+        """Cache key for the analysis of the cleaned data of a search form, for the given version
+        of the stock history (see 'store.history_version'), or its current version if not given.
+        """
+
+        if version is None:
+            version = store.history_version(cleaned_data["stock_symbol"]).generation
+
+        cleaned_data = cleaned_data.copy()
+        moving_average = cleaned_data.pop("moving_average") or utils.DEFAULT_MOVING_AVERAGE
+        return cache.search_key(
+            **cleaned_data, moving_average=moving_average, dateformat=dateformat, version=version, limit=limit,
+        )
+
+    @classmethod
+    def search_analysis(cls, cleaned_data: dict, dateformat: str = "%d.%m.%Y", key: str = None) -> Tuple[dict, str]:
+        """Analysis for the cleaned data of a search form, from the cache if available.
+        Returns the analysis and its cache key, which is 'search_key' if not given.
+        """
+
+        if key is None:
+            key = cls.search_key(cleaned_data, dateformat)
+        cleaned_data = cleaned_data.copy()
+        moving_average = cleaned_data.pop("moving_average") or utils.DEFAULT_MOVING_AVERAGE
+        analysis = cache.cached_analysis(
+            key=key,
+            analyze=lambda: cls.analyze_stock_data(
+                store.stock_history(**cleaned_data, compact=settings.COMPACT_STOCK_DATA),
+                dateformat=dateformat,
+                moving_average=moving_average,
+            ),
+            timeout=cache.search_timeout(cleaned_data["end_date"]),
+        )
+        return analysis, key
+
+    @classmethod
+    async def search_analysis_async(cls, cleaned_data: dict, dateformat: str = "%d.%m.%Y",
+                                    limit: int = None) -> Tuple[dict, str]:
+        """Like 'search_analysis', but fetches without blocking the event loop
+        and analyzes in the analysis process pool, see 'batch.analysis_pool'.
+        Ranking tables have at most 'limit' rows if given, see 'analyze_stock_data'.
+        Raises BrokenProcessPool if the analysis process died.
+        """
+
+        # The database is only used synchronously, see 'store.stock_history_async'
+        version = await sync_to_async(store.history_version)(cleaned_data["stock_symbol"])
+        key = cls.search_key(cleaned_data, dateformat, version.generation, limit)
+        cleaned_data = cleaned_data.copy()
+        moving_average = cleaned_data.pop("moving_average") or utils.DEFAULT_MOVING_AVERAGE
+
+        async def analyze():
+            data = await store.stock_history_async(**cleaned_data, compact=settings.COMPACT_STOCK_DATA)
+            future = batch.submit_analysis(data, translation.get_language(), dateformat, moving_average, limit)
+            try:
+                with timing.stage("analysis"):
+                    return await asyncio.wrap_future(future)
+            except BrokenProcessPool:
+                # A worker process died, so the next analysis starts a new pool (see 'batch.analyze_stocks')
+                batch._reset_analysis_pool()
+                raise
+
+        analysis = await cache.cached_analysis_async(
+            key=key,
+            analyze=analyze,
+            timeout=cache.search_timeout(cleaned_data["end_date"]),
+        )
+        return analysis, key
 
     @staticmethod
-    def analyze_stock_data(data: "pd.DataFrame", dateformat: str = "%d.%m.%Y"):
-        return {
-            "longest_bullish": utils.longest_bullish_streak(data),
-            "history_by_volume": utils.history_by_volume_and_price_delta(data, dateformat),
-            "best_opening_price": utils.best_opening_price_compared_to_five_day_SMA(data, dateformat),
-        }
+    def analyze_stock_data(data: "pd.DataFrame", dateformat: str = "%d.%m.%Y",
+                           moving_average: str = utils.DEFAULT_MOVING_AVERAGE, limit: int = None):
+        """All analyses of stock data. If 'limit' is given, only the top rows of the history
+        by volume are selected and sorted. Pages of the full tables are rendered by the index
+        view, and the rest of their rows loaded on demand, so it analyzes without a limit.
+        """
 
+        analysis = analyses.run(data, dateformat=dateformat, moving_average=moving_average, limit=limit)
+        analysis["moving_average"] = moving_average
+        return analysis
 
 
 def filter_stocks(request):
+    """Stock symbols starting with the query 'q', at most 'limit' of them if given."""
 
-    q = request.GET.get("q").upper()
+    q = request.GET.get("q", "").upper()
 
-    with open("analyzer/static/analyzer/json/stocks.json", "r") as f:
-        data = json.load(f)
+    try:
+        limit = request.GET.get("limit")
+        limit = max(int(limit), 0) if limit is not None else None
+    except ValueError:
+        return JsonResponse({"error": _("Limit must be an integer.")}, status=400)
 
-    data[:] = [stock for stock in data if stock.startswith(q)]
+    data = symbols.stock_symbols.startswith(q, limit=limit)
 
     return JsonResponse(data, safe=False)
+
+
+def stage_metrics(request):
+    """Count, mean and p50/p95/p99 in milliseconds of each timed stage, in this process. Only for staff."""
+
+    if not settings.STAGE_TIMING:
+        return JsonResponse({"error": _("Stage timing is not enabled.")}, status=404)
+
+    if not request.user.is_active or not request.user.is_staff:
+        return JsonResponse({"error": _("Only staff can see stage timings.")}, status=403)
+
+    return JsonResponse(timing.snapshot())
+
+
+def analysis_table(request, analysis_id, table):
+    """Rows of a table from a cached analysis, for loading them on demand.
+    Query parameters: 'offset' and 'limit' for the rows (default: all rows),
+    'sort' for the index of the column to sort by and 'order' ('asc' or 'desc').
+    If the analysis is not cached (anymore), it is analyzed again if the query
+    has the search form fields of the search it was made for.
+    """
+
+    analysis = cache.get_analysis(analysis_id)
+
+    if analysis is None and "stock_symbol" in request.GET:
+        form = analyzer_forms.SearchForm(request.GET)
+
+        try:
+            if form.is_valid():
+                analysis, _key = IndexView.search_analysis(form.cleaned_data)
+        except utils.FetchError as error:
+            return JsonResponse({"error": str(error)}, status=502)
+
+    if analysis is None or not isinstance(analysis.get(table), pd.DataFrame):
+        return JsonResponse({"error": _("Analysis not found. Please search again.")}, status=404)
+
+    data = analysis[table]
+
+    try:
+        offset = max(int(request.GET.get("offset", 0)), 0)
+        limit = request.GET.get("limit")
+        limit = max(int(limit), 0) if limit is not None else None
+        sort = request.GET.get("sort")
+        sort = int(sort) if sort is not None else None
+    except ValueError:
+        return JsonResponse({"error": _("Offset, limit and sort must be integers.")}, status=400)
+
+    if sort is not None:
+        if not 0 <= sort < len(data.columns):
+            return JsonResponse({"error": _("Sort column not found.")}, status=400)
+
+        ascending = request.GET.get("order", "asc") != "desc"
+        data = data.sort_values(by=data.columns[sort], ascending=ascending, kind="mergesort")
+
+    end = offset + limit if limit is not None else None
+    page = data.iloc[offset:end]
+
+    return JsonResponse({
+        "columns": list(page.columns),
+        # NaN is not valid JSON
+        "data": page.astype(object).where(page.notna(), None).values.tolist(),
+        "offset": offset,
+        "total": len(data.index),
+    })
+
+
+async def analysis_api(request):
+    """Analysis of a stock search as JSON, with tables as columnar arrays.
+    Async, so that under ASGI a worker can wait for many Nasdaq API calls at once.
+    Query parameters: the search form fields, 'fields' for a comma separated list
+    of 'serialization.ANALYSIS_FIELDS' to include (default: all) and 'limit' for the rows per table.
+    """
+
+    form = analyzer_forms.SearchForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+
+    try:
+        fields, limit = _api_options(request)
+    except ValueError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+
+    try:
+        # Column names in english, regardless of the site language
+        with translation.override("en"):
+            analysis, key = await IndexView.search_analysis_async(form.cleaned_data, dateformat="%Y-%m-%d", limit=limit)
+    except utils.NoStockDataError as error:
+        return JsonResponse({"error": str(error)}, status=404)
+    except (utils.FetchError, BrokenProcessPool) as error:
+        return JsonResponse({"error": str(error)}, status=502)
+
+    return HttpResponse(
+        serialization.dumps(serialization.analysis_json(analysis, fields, limit)),
+        content_type="application/json",
+    )
+
+
+def batch_analysis_api(request):
+    """Analysis of many stocks over the same date range as JSON, see 'analysis_api'.
+    Stocks are given as a comma separated list in 'stock_symbols'. Stocks that could not
+    be fetched or analyzed have an error message instead of the analysis.
+    """
+
+    form = analyzer_forms.BatchSearchForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors}, status=400)
+
+    try:
+        fields, limit = _api_options(request)
+    except ValueError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+
+    cleaned_data = form.cleaned_data
+    analyses = batch.analyze_stocks(
+        cleaned_data["stock_symbols"],
+        start_date=cleaned_data["start_date"],
+        end_date=cleaned_data["end_date"],
+        dateformat="%Y-%m-%d",
+        moving_average=cleaned_data["moving_average"] or utils.DEFAULT_MOVING_AVERAGE,
+        language="en",
+        limit=limit,
+    )
+
+    results = {
+        stock_symbol: analysis if "error" in analysis else serialization.analysis_json(analysis, fields, limit)
+        for stock_symbol, analysis in analyses.items()
+    }
+
+    return HttpResponse(serialization.dumps({"results": results}), content_type="application/json")
+
+
+@require_POST
+def bulk_import_api(request):
+    """Import the stock history CSV files in an uploaded zip archive ('file') to the local store,
+    see 'bulk_import.import_zip'. Reports the rows and timings of each file, or why it failed.
+    Only for staff, since imported histories replace the stored ones served to everyone.
+    The files are imported before responding, which can take minutes for the largest archives
+    (see 'BULK_IMPORT_MAX_SIZE'); use the 'import_histories' command for larger imports.
+    """
+
+    if not request.user.is_active or not request.user.is_staff:
+        return JsonResponse({"error": _("Only staff can import stock histories.")}, status=403)
+
+    file = request.FILES.get("file")
+    if file is None:
+        return JsonResponse({"error": _("Upload a zip archive of CSV files.")}, status=400)
+
+    try:
+        results = bulk_import.import_zip(file)
+    except ValueError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+
+    return JsonResponse({"results": [result._asdict() for result in results]})
+
+
+def _api_options(request) -> Tuple[list, Optional[int]]:
+    """Parse 'fields' and 'limit' query parameters. Raises ValueError if they are invalid."""
+
+    fields = request.GET.get("fields")
+    fields = fields.split(",") if fields else serialization.ANALYSIS_FIELDS
+
+    if not set(fields).issubset(serialization.ANALYSIS_FIELDS):
+        raise ValueError(_("Unknown fields."))
+
+    try:
+        limit = request.GET.get("limit")
+        limit = max(int(limit), 0) if limit is not None else None
+    except ValueError:
+        raise ValueError(_("Limit must be an integer."))
+
+    return fields, limit
+